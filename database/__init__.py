@@ -1,7 +1,11 @@
 # database/__init__.py
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
 from sqlalchemy.exc import OperationalError
 
@@ -10,6 +14,11 @@ load_dotenv()
 # Declarative base disponible desde la importación para evitar problemas
 Base = declarative_base()
 
+# Cuánto tiempo se da por bueno el último resultado de probe_connection (segundos)
+CONNECTION_TTL_SECONDS = 30
+# Timeout de conexión del engine de la app (MySQL/MariaDB), para que un servidor caído falle pronto
+CONNECT_TIMEOUT_SECONDS = 5
+
 class _DB:
     def __init__(self):
         self.engine = None
@@ -18,6 +27,9 @@ class _DB:
         self.echo = False
         self._initialized = False
         self.connected = False
+        # último veredicto de probe_connection: (ok, error, instante monotonic)
+        self._connection_status = None
+        self._status_lock = threading.Lock()
 
     def init_app(self, db_url: str | None = None, echo: bool | None = None, **engine_kwargs):
         """
@@ -40,6 +52,7 @@ class _DB:
             self.echo = echo
             self._initialized = True
             self.connected = False
+            self.invalidate_connection_status()
             return
 
         # Si ya estaba inicializado con la misma URL, no la recreamos
@@ -48,6 +61,9 @@ class _DB:
             self._initialized = True
             return
 
+        if "connect_args" not in engine_kwargs and make_url(db_url).get_backend_name() in ("mysql", "mariadb"):
+            engine_kwargs["connect_args"] = {"connect_timeout": CONNECT_TIMEOUT_SECONDS}
+
         # Creamos engine (no intentamos conectar hasta que se haga check_connection)
         self.url = db_url
         self.echo = echo
@@ -57,12 +73,26 @@ class _DB:
         self._initialized = True
         # no asumimos connected hasta que check_connection lo confirme
         self.connected = False
+        self.invalidate_connection_status()
 
     def session(self):
         if self.SessionLocal is None:
             raise RuntimeError("DB no inicializado. Llama a db.init_app() primero o configura DATABASE_URL.")
         return self.SessionLocal()
 
+    @contextmanager
+    def session_scope(self):
+        """
+        Sesión propia del hilo actual (p.ej. un worker de QThreadPool): SessionLocal es
+        un scoped_session por hilo, así que no se comparte con la del hilo de la UI.
+        Al salir se cierra y se descarta.
+        """
+        session = self.session()
+        try:
+            yield session
+        finally:
+            self.SessionLocal.remove()
+
     def create_all(self):
         if self.engine is None:
             raise RuntimeError("DB no inicializado. Llama a db.init_app() primero.")
@@ -90,6 +120,39 @@ class _DB:
             # devolver el mensaje para mostrar en UI (no incluimos credenciales extra)
             return False, str(exc)
 
+    def probe_connection(self) -> tuple[bool, str | None]:
+        """
+        Comprueba la BD con un SELECT 1 sobre el pool del engine de la app (reutiliza una
+        conexión ya abierta: sin handshake TCP+auth nuevo) y guarda el resultado para
+        cached_connection_status. Puede tardar hasta el timeout: llamar desde un worker.
+        """
+        if self.engine is None:
+            ok, error = False, "No hay DATABASE_URL definida."
+        else:
+            try:
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                ok, error = True, None
+            except Exception as exc:
+                ok, error = False, str(exc)
+        with self._status_lock:
+            self._connection_status = (ok, error, time.monotonic())
+            self.connected = ok
+        return ok, error
+
+    def cached_connection_status(self, ttl_seconds: float = CONNECTION_TTL_SECONDS) -> tuple[bool, str | None] | None:
+        """(ok, error) del último probe_connection si tiene menos de ttl_seconds; si no, None."""
+        with self._status_lock:
+            estado = self._connection_status
+        if estado is None or time.monotonic() - estado[2] > ttl_seconds:
+            return None
+        return estado[0], estado[1]
+
+    def invalidate_connection_status(self):
+        """Olvida el último veredicto (p.ej. tras un error de consulta o al cambiar de URL)."""
+        with self._status_lock:
+            self._connection_status = None
+
     def close_all(self):
         """
         Cierra sesiones y engine (útil para reconfigurar).
@@ -109,6 +172,7 @@ class _DB:
         self.url = None
         self._initialized = False
         self.connected = False
+        self.invalidate_connection_status()
 
 # exportados por el paquete
 db = _DB()
@@ -31,9 +31,11 @@ CREATE TABLE IF NOT EXISTS transaction (
     descripcion VARCHAR(255) NOT NULL,
     monto DECIMAL(12, 2) NOT NULL,
     es_transferencia INTEGER DEFAULT 0 COMMENT '0=gasto/ingreso normal, 1=transferencia entre cuentas',
+    hash_contenido CHAR(64) NULL COMMENT 'Huella del contenido para detectar duplicados al importar',
     FOREIGN KEY (cuenta_id) REFERENCES account (id) ON DELETE CASCADE,
     INDEX idx_cuenta_fecha (cuenta_id, fecha),
-    INDEX idx_fecha (fecha)
+    INDEX idx_fecha (fecha),
+    UNIQUE INDEX uq_transaction_hash_contenido (hash_contenido)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Transacciones únicas (ingresos/gastos)';
 
 -- ========================================================================
@@ -162,11 +164,26 @@ CREATE TABLE IF NOT EXISTS simulation_variables (
     importe DECIMAL(15, 2) NOT NULL,
     frecuencia VARCHAR(50) NOT NULL COMMENT 'semanal, mensual, trimestral, semestral, anual',
     activo INTEGER DEFAULT 1 COMMENT '1=activa en simulaciones, 0=inactiva',
+    distribucion VARCHAR(20) NOT NULL DEFAULT 'fija' COMMENT 'Monte Carlo: fija, normal, historica',
+    desviacion DECIMAL(15, 2) NULL COMMENT 'Desviación típica del importe (distribución normal)',
+    patron_historico VARCHAR(255) NULL COMMENT 'Texto de las transacciones a remuestrear (distribución historica)',
     FOREIGN KEY (cuenta_id) REFERENCES account (id) ON DELETE CASCADE,
     INDEX idx_cuenta (cuenta_id),
     INDEX idx_activo (activo)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Variables hipotéticas para simulación de saldos';
 
+-- ========================================================================
+-- TABLA: balance_checkpoint (Saldos precalculados)
+-- ========================================================================
+CREATE TABLE IF NOT EXISTS balance_checkpoint (
+    id INTEGER PRIMARY KEY AUTO_INCREMENT,
+    cuenta_id INTEGER NOT NULL,
+    fecha DATE NOT NULL COMMENT 'Normalmente fin de mes',
+    saldo DECIMAL(18, 6) NOT NULL COMMENT 'Saldo de la cuenta al final de esa fecha',
+    FOREIGN KEY (cuenta_id) REFERENCES account (id) ON DELETE CASCADE,
+    UNIQUE KEY uq_checkpoint_cuenta_fecha (cuenta_id, fecha)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Caché de saldos; se invalida al modificar movimientos';
+
 -- ========================================================================
 -- DATOS DE EJEMPLO (OPCIONAL - Comentar si no se desea)
 -- ========================================================================
@@ -0,0 +1,4 @@
+# finanzas/__init__.py
+"""
+Punto de entrada sin interfaz gráfica: python -m finanzas <subcomando> (ver finanzas/cli.py).
+"""
@@ -0,0 +1,7 @@
+# finanzas/__main__.py
+import sys
+
+from finanzas.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+# finanzas/cli.py
+"""
+Línea de comandos sin interfaz gráfica, para tareas programadas (cron) e informes:
+
+    python -m finanzas import FICHERO... --cuenta ID
+    python -m finanzas import-folder CARPETA [--mapa "patrón=ID"]... [--procesos N]
+    python -m finanzas balances [--fecha AAAA-MM-DD]
+    python -m finanzas audit --cuenta ID --desde AAAA-MM-DD --hasta AAAA-MM-DD
+    python -m finanzas simulate --desde AAAA-MM-DD --hasta AAAA-MM-DD [--intervalo 30] [--cuentas 1,2] [--caminos N]
+    python -m finanzas export --cuenta ID [--desde ...] [--hasta ...]
+    python -m finanzas refresh-prices
+
+Los datos salen por stdout en CSV (por defecto) o JSON (--formato json); avisos, errores
+y mensajes de depuración, por stderr. Usa la misma BD que la aplicación (DATABASE_URL
+del .env, o --db-url) y la misma lógica (utils/importer, utils/reconciler,
+utils/simulation), pero no importa PySide6 ni Matplotlib: cada subcomando carga solo
+lo que necesita.
+
+Código de salida: 0 si todo fue bien, 1 si algo falló, 2 si no hay BD configurada.
+"""
+import argparse
+import csv
+import json
+import sys
+from contextlib import redirect_stdout
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List
+
+from database import db
+from utils.money import a_decimal
+
+# Filas que se traen de la BD en cada lote al exportar
+FILAS_POR_LOTE = 1000
+
+
+def _fecha(texto: str) -> date:
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha no válida (AAAA-MM-DD): {texto}")
+
+
+def _ids(texto: str) -> List[int]:
+    try:
+        return [int(x) for x in texto.split(",") if x.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de ids no válida (p.ej. 1,2,5): {texto}")
+
+
+def _json_default(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def emitir(filas: Iterable[dict], columnas: List[str], formato: str = "csv", salida=None):
+    """
+    Escribe las filas (dicts) en `salida` (stdout) según van llegando, sin acumularlas:
+    CSV con cabecera o un array JSON. Fechas en ISO e importes con punto decimal.
+    """
+    salida = salida or sys.stdout
+    if formato == "json":
+        salida.write("[")
+        for i, fila in enumerate(filas):
+            salida.write(("," if i else "") + "\n" + json.dumps(fila, default=_json_default, ensure_ascii=False))
+        salida.write("\n]\n")
+        return
+    writer = csv.DictWriter(salida, fieldnames=columnas, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for fila in filas:
+        writer.writerow({k: v.isoformat() if isinstance(v, date) else v for k, v in fila.items()})
+
+
+def _aviso(mensaje: str):
+    print(mensaje, file=sys.stderr)
+
+
+def _cuenta_existe(session, cuenta_id: int) -> bool:
+    from models.account import Account
+    if session.get(Account, cuenta_id) is None:
+        _aviso(f"ERROR: cuenta {cuenta_id} no encontrada")
+        return False
+    return True
+
+
+# -------------------------------------------------------------
+# Subcomandos: cada uno recibe (session, args) y devuelve el código de salida
+# -------------------------------------------------------------
+def cmd_import(session, args) -> int:
+    """Importa uno o varios extractos CSV/TSV en una cuenta (utils/importer.importar_csv)."""
+    from utils.importer import importar_csv
+
+    if not _cuenta_existe(session, args.cuenta):
+        return 1
+    filas, codigo = [], 0
+    for ruta in args.ficheros:
+        try:
+            r = importar_csv(session, ruta, args.cuenta)
+        except Exception as e:
+            _aviso(f"ERROR importando {ruta}: {e}")
+            codigo = 1
+            continue
+        filas.append({"fichero": ruta, "leidas": r["leidas"], "insertadas": r["insertadas"],
+                      "duplicadas": r["duplicadas"], "ignoradas": r["ignoradas"],
+                      "fichero_errores": r["fichero_errores"] or ""})
+    emitir(filas, ["fichero", "leidas", "insertadas", "duplicadas", "ignoradas", "fichero_errores"], args.formato, args.salida)
+    return codigo
+
+
+def cmd_import_folder(session, args) -> int:
+    """
+    Importa todos los extractos de una carpeta, cada uno en su cuenta según los patrones
+    de nombre (--mapa, o IMPORT_PATTERNS del .env), parseándolos en paralelo
+    (utils/importer.importar_ficheros). Los ficheros sin cuenta se saltan con un aviso.
+    """
+    import os
+    from models.account import Account
+    from utils.importer import ficheros_de_carpeta, leer_mapeo, asignar_cuentas, importar_ficheros
+
+    if not os.path.isdir(args.carpeta):
+        _aviso(f"ERROR: no existe la carpeta {args.carpeta}")
+        return 1
+    rutas = ficheros_de_carpeta(args.carpeta)
+    mapeo = leer_mapeo("; ".join(args.mapa) if args.mapa else os.environ.get("IMPORT_PATTERNS"))
+    cuentas = dict(session.query(Account.id, Account.nombre).all())
+    asignacion = {}
+    for ruta, cuenta_id in asignar_cuentas(rutas, mapeo, cuentas).items():
+        if cuenta_id is None:
+            _aviso(f"⚠️ {os.path.basename(ruta)}: sin cuenta asignada, no se importa")
+        else:
+            asignacion[ruta] = cuenta_id
+    if not asignacion:
+        _aviso("ERROR: ningún fichero de la carpeta tiene cuenta asignada")
+        return 1
+
+    r = importar_ficheros(session, asignacion, procesos=args.procesos)
+    if r["sin_deteccion_duplicados"]:
+        _aviso("⚠️ Sin detección de duplicados: ejecuta migrations/add_hash_contenido_to_transaction.py")
+    for f in r["ficheros"]:
+        if f["error"]:
+            _aviso(f"ERROR importando {f['fichero']}: {f['error']}")
+    emitir(({**f, "fichero_errores": f["fichero_errores"] or "", "error": f["error"] or ""} for f in r["ficheros"]),
+           ["fichero", "cuenta_id", "leidas", "insertadas", "duplicadas", "ignoradas", "fichero_errores", "error"],
+           args.formato, args.salida)
+    return 1 if any(f["error"] for f in r["ficheros"]) else 0
+
+
+def cmd_balances(session, args) -> int:
+    """Saldo de todas las cuentas a una fecha (reconciler.calcular_saldos_todas_cuentas)."""
+    from models.account import Account
+    from utils.reconciler import calcular_saldos_todas_cuentas
+    from utils.money import a_centimos
+
+    fecha = args.fecha or date.today()
+    saldos = calcular_saldos_todas_cuentas(session, fecha)
+    cuentas = session.query(Account.id, Account.nombre).order_by(Account.id).all()
+    emitir(
+        ({"cuenta_id": cid, "nombre": nombre, "fecha": fecha, "saldo": a_decimal(a_centimos(saldos.get(cid, 0)))}
+         for cid, nombre in cuentas),
+        ["cuenta_id", "nombre", "fecha", "saldo"], args.formato, args.salida,
+    )
+    return 0
+
+
+def cmd_audit(session, args) -> int:
+    """Movimientos de una cuenta en un rango con su saldo acumulado (reconciler.auditar_rango)."""
+    from utils.reconciler import auditar_rango
+    from utils.ledger import TIPO_FIJO, TIPO_TRANSACCION, TIPO_AJUSTE
+
+    if not _cuenta_existe(session, args.cuenta):
+        return 1
+    # en un mismo día: fijo, luego puntual, luego ajuste (igual que la auditoría de la UI)
+    informe = auditar_rango(session, args.cuenta, args.desde, args.hasta,
+                            orden_tipos={TIPO_FIJO: 0, TIPO_TRANSACCION: 1, TIPO_AJUSTE: 2})
+    nombres = {TIPO_FIJO: "fijo", TIPO_TRANSACCION: "puntual", TIPO_AJUSTE: "ajuste"}
+    ledger = informe["ledger"]
+    _aviso(f"Saldo inicial: {informe['saldo_inicial']:.2f}  Saldo final: {informe['saldo_final']:.2f}  "
+           f"({len(ledger)} movimientos)")
+
+    def filas():
+        columnas = zip(ledger.fechas.tolist(), ledger.tipos.tolist(), ledger.desc_idx.tolist(),
+                       ledger.centimos.tolist(), ledger.saldos.tolist())
+        for fecha, tipo, desc, centimos, saldo in columnas:
+            yield {"fecha": fecha, "tipo": nombres.get(tipo, ""), "concepto": ledger.descripciones[desc],
+                   "importe": a_decimal(centimos), "saldo": a_decimal(saldo)}
+
+    emitir(filas(), ["fecha", "tipo", "concepto", "importe", "saldo"], args.formato, args.salida)
+    return 0
+
+
+def cmd_simulate(session, args) -> int:
+    """Simulación de saldos con las variables activas (utils/simulation.simular_saldos)."""
+    from models.account import Account
+    from models.simulation_variable import SimulationVariable
+    from utils.simulation import simular_saldos
+    from utils.money import a_centimos
+
+    if args.desde >= args.hasta:
+        _aviso("ERROR: la fecha de inicio debe ser anterior a la fecha de fin")
+        return 1
+    consulta = session.query(Account).order_by(Account.nombre)
+    if args.cuentas:
+        consulta = consulta.filter(Account.id.in_(args.cuentas))
+    cuentas = consulta.all()
+    if not cuentas:
+        _aviso("ERROR: no hay cuentas que simular")
+        return 1
+    variables = [] if args.sin_variables else session.query(SimulationVariable).filter_by(activo=1).all()
+    if args.caminos:
+        return _simular_montecarlo(session, args, cuentas, variables)
+    resultados = simular_saldos(session, args.desde, args.hasta, args.intervalo, cuentas, variables)
+
+    def filas():
+        for r in resultados:
+            centimos = [a_centimos(r["saldos"].get(c.id, 0.0)) for c in cuentas]
+            fila = {"fecha": r["fecha"]}
+            fila.update((c.nombre, a_decimal(v)) for c, v in zip(cuentas, centimos))
+            fila["TOTAL"] = a_decimal(sum(centimos))
+            yield fila
+
+    emitir(filas(), ["fecha"] + [c.nombre for c in cuentas] + ["TOTAL"], args.formato, args.salida)
+    return 0
+
+
+def _simular_montecarlo(session, args, cuentas, variables) -> int:
+    """simulate --caminos N: percentiles P5/P50/P95 por cuenta y total (utils/montecarlo)."""
+    from models.simulation_variable import distribucion_disponible, cargar_distribuciones
+    from utils.montecarlo import preparar_montecarlo, simular_montecarlo
+
+    if not distribucion_disponible(session):
+        _aviso("ERROR: la BD no tiene las columnas de distribución de las variables; "
+               "ejecuta migrations/add_distribucion_migration.py")
+        return 1
+    cargar_distribuciones(session, variables)
+    fechas, base, aleatorias = preparar_montecarlo(session, args.desde, args.hasta, args.intervalo, cuentas, variables)
+    if not aleatorias:
+        _aviso("⚠️ Ninguna variable activa tiene distribución normal o histórica: los caminos son todos iguales")
+    r = simular_montecarlo(fechas, base, aleatorias, args.caminos, semilla=args.semilla)
+    nombres = [c.nombre for c in cuentas] + ["TOTAL"]
+    columnas = [f"{n} {p}" for n in nombres for p in ("P5", "P50", "P95")]
+    _aviso(f"{r['caminos']} caminos, semilla {r['semilla']}. Probabilidad de saldo negativo: "
+           + ", ".join(f"{n} {p:.1%}" for n, p in zip(nombres, r["prob_negativo"])))
+
+    def filas():
+        for i, fecha in enumerate(r["fechas"]):
+            fila = {"fecha": fecha}
+            valores = (a_decimal(round(m[j, i] * 100)) for j in range(len(nombres)) for m in (r["p5"], r["p50"], r["p95"]))
+            fila.update(zip(columnas, valores))
+            yield fila
+
+    emitir(filas(), ["fecha"] + columnas, args.formato, args.salida)
+    return 0
+
+
+def cmd_export(session, args) -> int:
+    """
+    Transacciones de una cuenta en streaming, en el formato que acepta `import`
+    (fecha, descripcion, monto), así que el fichero se puede volver a importar.
+    """
+    from sqlalchemy import select
+    from models.transaction import Transaction
+    from utils.money import a_centimos
+
+    if not _cuenta_existe(session, args.cuenta):
+        return 1
+    t = Transaction.__table__
+    consulta = (select(t.c.fecha, t.c.descripcion, t.c.monto, t.c.es_transferencia)
+                .where(t.c.cuenta_id == args.cuenta).order_by(t.c.fecha, t.c.id))
+    if args.desde:
+        consulta = consulta.where(t.c.fecha >= args.desde)
+    if args.hasta:
+        consulta = consulta.where(t.c.fecha <= args.hasta)
+    resultado = session.execute(consulta.execution_options(yield_per=FILAS_POR_LOTE))
+    emitir(
+        ({"fecha": fecha, "descripcion": descripcion, "monto": a_decimal(a_centimos(monto)),
+          "es_transferencia": int(es_transferencia or 0)}
+         for fecha, descripcion, monto, es_transferencia in resultado),
+        ["fecha", "descripcion", "monto", "es_transferencia"], args.formato, args.salida,
+    )
+    return 0
+
+
+def cmd_refresh_prices(session, args) -> int:
+    """Actualiza el último precio de todos los holdings (models.holding.update_prices_for_all_holdings)."""
+    from models.holding import Holding, update_prices_for_all_holdings
+
+    total = session.query(Holding).count()
+    precios = update_prices_for_all_holdings(session)
+    emitir(({"ticker": ticker, "precio": precio} for ticker, precio in precios), ["ticker", "precio"], args.formato, args.salida)
+    if len(precios) < total:
+        _aviso(f"⚠️ {total - len(precios)} de {total} holdings sin precio actualizado")
+        return 1
+    return 0
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    comunes = argparse.ArgumentParser(add_help=False)
+    comunes.add_argument("--formato", "-f", choices=("csv", "json"), default="csv", help="Formato de salida (por defecto csv)")
+    comunes.add_argument("--db-url", help="URL de la BD (por defecto DATABASE_URL del entorno o del .env)")
+
+    p = argparse.ArgumentParser(prog="python -m finanzas", description="Finanzas sin interfaz gráfica: importación, saldos, auditoría, simulación y exportación.")
+    sub = p.add_subparsers(dest="comando", required=True, metavar="subcomando")
+
+    s = sub.add_parser("import", parents=[comunes], help="Importar extractos CSV/TSV en una cuenta")
+    s.add_argument("ficheros", nargs="+", help="Ficheros a importar (Fecha, Descripcion, Monto)")
+    s.add_argument("--cuenta", "-c", type=int, required=True, help="ID de la cuenta destino")
+    s.set_defaults(funcion=cmd_import)
+
+    s = sub.add_parser("import-folder", parents=[comunes], help="Importar todos los extractos de una carpeta, cada uno en su cuenta")
+    s.add_argument("carpeta", help="Carpeta con los extractos (.csv, .tsv, .txt)")
+    s.add_argument("--mapa", "-m", action="append",
+                   help="patrón=ID de cuenta (repetible; por defecto IMPORT_PATTERNS del .env)")
+    s.add_argument("--procesos", "-p", type=int, help="Procesos para parsear (por defecto uno por núcleo)")
+    s.set_defaults(funcion=cmd_import_folder)
+
+    s = sub.add_parser("balances", parents=[comunes], help="Saldo de todas las cuentas a una fecha")
+    s.add_argument("--fecha", type=_fecha, help="Fecha (AAAA-MM-DD, por defecto hoy)")
+    s.set_defaults(funcion=cmd_balances)
+
+    s = sub.add_parser("audit", parents=[comunes], help="Movimientos de un rango con su saldo acumulado")
+    s.add_argument("--cuenta", "-c", type=int, required=True, help="ID de la cuenta")
+    s.add_argument("--desde", "-d", type=_fecha, required=True, help="Fecha desde (AAAA-MM-DD)")
+    s.add_argument("--hasta", "-a", type=_fecha, required=True, help="Fecha hasta (AAAA-MM-DD)")
+    s.set_defaults(funcion=cmd_audit)
+
+    s = sub.add_parser("simulate", parents=[comunes], help="Simulación de saldos con las variables activas")
+    s.add_argument("--desde", "-d", type=_fecha, default=date.today(), help="Fecha de inicio (AAAA-MM-DD, por defecto hoy)")
+    s.add_argument("--hasta", "-a", type=_fecha, required=True, help="Fecha de fin (AAAA-MM-DD)")
+    s.add_argument("--intervalo", "-i", type=int, default=30, help="Días entre fechas simuladas (por defecto 30)")
+    s.add_argument("--cuentas", type=_ids, help="IDs de las cuentas separados por comas (por defecto todas)")
+    s.add_argument("--sin-variables", action="store_true", help="No aplicar las variables de simulación")
+    s.add_argument("--caminos", type=int, default=0,
+                   help="Simulación Monte Carlo con N caminos: percentiles P5/P50/P95 (por defecto determinista)")
+    s.add_argument("--semilla", type=int, help="Semilla de la simulación Monte Carlo (para repetirla)")
+    s.set_defaults(funcion=cmd_simulate)
+
+    s = sub.add_parser("export", parents=[comunes], help="Exportar las transacciones de una cuenta (reimportables)")
+    s.add_argument("--cuenta", "-c", type=int, required=True, help="ID de la cuenta")
+    s.add_argument("--desde", "-d", type=_fecha, help="Fecha desde (AAAA-MM-DD)")
+    s.add_argument("--hasta", "-a", type=_fecha, help="Fecha hasta (AAAA-MM-DD)")
+    s.set_defaults(funcion=cmd_export)
+
+    s = sub.add_parser("refresh-prices", parents=[comunes], help="Actualizar el precio de los holdings (yfinance)")
+    s.set_defaults(funcion=cmd_refresh_prices)
+    return p
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = crear_parser().parse_args(argv)
+    if args.comando == "simulate" and args.intervalo < 1:
+        _aviso("ERROR: --intervalo debe ser al menos 1 día")
+        return 1
+    if args.comando == "simulate" and args.caminos < 0:
+        _aviso("ERROR: --caminos no puede ser negativo")
+        return 1
+
+    # las relaciones de Account se resuelven por nombre: registrar todos sus modelos
+    import models.account, models.adjustment, models.transaction, models.fixed_expense  # noqa: F401
+
+    db.init_app(args.db_url)
+    if db.engine is None:
+        _aviso("ERROR: no hay BD configurada (DATABASE_URL en el .env o --db-url)")
+        return 2
+    try:
+        # los print() de diagnóstico de la lógica compartida van a stderr: stdout solo lleva datos
+        args.salida = sys.stdout
+        with db.session_scope() as session, redirect_stdout(sys.stderr):
+            return args.funcion(session, args)
+    except BrokenPipeError:
+        # salida cortada (p.ej. | head): no es un error del comando
+        return 0
+    except Exception as e:
+        _aviso(f"ERROR en {args.comando}: {e}")
+        return 1
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script para ejecutar migración: Crear tabla balance_checkpoint
+
+Ejecutar: python migrations/add_balance_checkpoint_table.py
+"""
+
+import os
+import sys
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migration_helper import run_migration
+
+def main():
+    print("=" * 60)
+    print("  MIGRACIÓN: Crear tabla balance_checkpoint")
+    print("=" * 60)
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sql_file = os.path.join(script_dir, "add_balance_checkpoint_table.sql")
+    
+    print(f"\n🔍 Buscando archivo: {sql_file}")
+    
+    if not os.path.exists(sql_file):
+        print(f"❌ No se encuentra el archivo de migración")
+        sys.exit(1)
+    
+    print("\n⚠️  Esta migración creará la tabla 'balance_checkpoint' con:")
+    print("   - id (PRIMARY KEY)")
+    print("   - cuenta_id (FOREIGN KEY a account)")
+    print("   - fecha (DATE, única por cuenta)")
+    print("   - saldo (DECIMAL)")
+    print("\n   La tabla se rellena sola al calcular saldos; puede vaciarse sin perder datos.")
+    
+    respuesta = input("\n¿Continuar con la migración? (s/n): ").lower()
+    
+    if respuesta != 's':
+        print("❌ Migración cancelada")
+        sys.exit(0)
+    
+    print("\n🚀 Ejecutando migración...\n")
+    
+    success = run_migration(sql_file)
+    
+    if success:
+        print("\n" + "=" * 60)
+        print("  ✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print("\n💡 Los saldos se calcularán a partir de los checkpoints guardados")
+    else:
+        print("\n" + "=" * 60)
+        print("  ❌ MIGRACIÓN FALLIDA")
+        print("=" * 60)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
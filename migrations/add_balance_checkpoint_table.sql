@@ -0,0 +1,17 @@
+-- Migración: Crear tabla balance_checkpoint
+-- Fecha: 2026-10-18
+-- Descripción: Saldos precalculados por cuenta y fecha (fin de mes) para que
+--              calcular_balance_cuenta no tenga que recorrer todo el histórico.
+--              Es una caché: se rellena sola y se invalida al modificar movimientos.
+
+CREATE TABLE IF NOT EXISTS balance_checkpoint (
+    id INTEGER PRIMARY KEY AUTO_INCREMENT,
+    cuenta_id INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    saldo DECIMAL(18, 6) NOT NULL,
+    FOREIGN KEY (cuenta_id) REFERENCES account (id) ON DELETE CASCADE,
+    UNIQUE KEY uq_checkpoint_cuenta_fecha (cuenta_id, fecha)
+);
+
+-- Verificar creación
+SELECT 'Tabla balance_checkpoint creada correctamente' AS resultado;
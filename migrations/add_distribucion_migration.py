@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script para ejecutar migración: Añadir distribución a simulation_variables
+
+Ejecutar: python migrations/add_distribucion_migration.py
+"""
+
+import os
+import sys
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migration_helper import run_migration
+
+
+def main():
+    print("=" * 60)
+    print("  MIGRACIÓN: Añadir distribución a simulation_variables")
+    print("=" * 60)
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sql_file = os.path.join(script_dir, "add_distribucion_to_variables.sql")
+    
+    print(f"\n🔍 Buscando archivo: {sql_file}")
+    
+    if not os.path.exists(sql_file):
+        print(f"❌ No se encuentra el archivo de migración")
+        sys.exit(1)
+    
+    print("\n⚠️  Esta migración añadirá a la tabla 'simulation_variables':")
+    print("   - distribucion (VARCHAR(20), por defecto 'fija')")
+    print("   - desviacion (NUMERIC(15,2))")
+    print("   - patron_historico (VARCHAR(255))")
+    
+    respuesta = input("\n¿Continuar con la migración? (s/n): ").lower()
+    
+    if respuesta != 's':
+        print("❌ Migración cancelada")
+        sys.exit(0)
+    
+    print("\n🚀 Ejecutando migración...\n")
+    
+    success = run_migration(sql_file)
+    
+    if success:
+        print("\n" + "=" * 60)
+        print("  ✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print("\n💡 Las variables ya pueden tener distribución en la simulación Monte Carlo")
+    else:
+        print("\n" + "=" * 60)
+        print("  ❌ MIGRACIÓN FALLIDA")
+        print("=" * 60)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
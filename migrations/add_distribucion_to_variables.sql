@@ -0,0 +1,19 @@
+-- Migración: Añadir distribución a simulation_variables
+-- Fecha: 2026-10-18
+-- Descripción: Parámetros de la simulación Monte Carlo de cada variable:
+--              distribucion ('fija', 'normal' o 'historica'), desviacion (desviación
+--              típica del importe, para 'normal') y patron_historico (texto de las
+--              transacciones pasadas cuyos importes se remuestrean, para 'historica').
+--              Las variables existentes quedan como 'fija' (importe constante).
+
+ALTER TABLE simulation_variables
+ADD COLUMN distribucion VARCHAR(20) NOT NULL DEFAULT 'fija';
+
+ALTER TABLE simulation_variables
+ADD COLUMN desviacion NUMERIC(15, 2) NULL;
+
+ALTER TABLE simulation_variables
+ADD COLUMN patron_historico VARCHAR(255) NULL;
+
+-- Verificar cambios
+SELECT 'Columnas distribucion, desviacion y patron_historico añadidas correctamente' AS resultado;
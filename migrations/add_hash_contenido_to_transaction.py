@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script para ejecutar migración: Añadir hash_contenido a transaction
+
+Añade la columna y su índice único y después calcula la huella de las transacciones
+que ya existen (así un extracto ya importado no se vuelve a importar).
+
+Ejecutar: python migrations/add_hash_contenido_to_transaction.py
+"""
+
+import os
+import sys
+from collections import Counter
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, update, bindparam
+
+from migration_helper import run_migration
+from database import db
+from models.transaction import Transaction, hash_contenido, normalizar_descripcion
+from utils.money import a_centimos
+
+FILAS_POR_LOTE = 5000
+
+
+def rellenar_huellas():
+    """
+    Calcula hash_contenido de las transacciones que no lo tienen, con el ordinal de cada
+    contenido repetido según su orden de alta dentro del mismo día (mismo criterio que
+    el importador al comparar). Devuelve el nº de filas actualizadas.
+    """
+    tabla = Transaction.__table__
+    actualizar = (
+        update(tabla)
+        .where(tabla.c.id == bindparam("b_id"))
+        .values(hash_contenido=bindparam("b_hash"))
+    )
+    total = 0
+    with db.engine.begin() as conn:
+        cuentas = conn.execute(
+            select(tabla.c.cuenta_id).where(tabla.c.hash_contenido == None).distinct()
+        ).scalars().all()
+        # cuenta a cuenta (una sola conexión: lectura y escritura no se bloquean entre sí)
+        for cuenta_id in cuentas:
+            filas = conn.execute(
+                select(tabla.c.id, tabla.c.fecha, tabla.c.monto, tabla.c.descripcion)
+                .where(tabla.c.cuenta_id == cuenta_id, tabla.c.hash_contenido == None)
+                .order_by(tabla.c.fecha, tabla.c.id)
+            ).all()
+            ordinales = Counter()
+            lote = []
+            for id_, fecha, monto, descripcion in filas:
+                centimos = a_centimos(monto)
+                clave = (fecha, centimos, normalizar_descripcion(descripcion))
+                ordinales[clave] += 1
+                lote.append({"b_id": id_, "b_hash": hash_contenido(cuenta_id, fecha, centimos, descripcion, ordinales[clave])})
+                if len(lote) >= FILAS_POR_LOTE:
+                    conn.execute(actualizar, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                conn.execute(actualizar, lote)
+                total += len(lote)
+    return total
+
+
+def main():
+    print("=" * 60)
+    print("  MIGRACIÓN: Añadir hash_contenido a transaction")
+    print("=" * 60)
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sql_file = os.path.join(script_dir, "add_hash_contenido_to_transaction.sql")
+    
+    print(f"\n🔍 Buscando archivo: {sql_file}")
+    
+    if not os.path.exists(sql_file):
+        print(f"❌ No se encuentra el archivo de migración")
+        sys.exit(1)
+    
+    print("\n⚠️  Esta migración añadirá a la tabla 'transaction':")
+    print("   - hash_contenido (CHAR(64), índice único)")
+    print("\n   y calculará la huella de todas las transacciones existentes.")
+    
+    respuesta = input("\n¿Continuar con la migración? (s/n): ").lower()
+    
+    if respuesta != 's':
+        print("❌ Migración cancelada")
+        sys.exit(0)
+    
+    print("\n🚀 Ejecutando migración...\n")
+    
+    success = run_migration(sql_file)
+    if success:
+        try:
+            print("\n🔢 Calculando huellas de las transacciones existentes...")
+            print(f"   ✓ {rellenar_huellas()} transacciones actualizadas")
+        except Exception as e:
+            print(f"❌ Error calculando huellas: {e}")
+            success = False
+    
+    if success:
+        print("\n" + "=" * 60)
+        print("  ✅ MIGRACIÓN COMPLETADA")
+        print("=" * 60)
+        print("\n💡 Al importar extractos se saltarán los movimientos ya importados")
+    else:
+        print("\n" + "=" * 60)
+        print("  ❌ MIGRACIÓN FALLIDA")
+        print("=" * 60)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+-- Migración: Añadir huella de contenido a transaction
+-- Fecha: 2026-10-18
+-- Descripción: Columna hash_contenido (SHA-256 de cuenta, fecha, importe, descripción
+--              normalizada y ordinal) con índice único, para que reimportar un extracto
+--              solapado no duplique movimientos. Los movimientos creados a mano pueden
+--              dejarla a NULL (el índice único admite varios NULL).
+
+ALTER TABLE transaction
+ADD COLUMN hash_contenido CHAR(64) NULL;
+
+CREATE UNIQUE INDEX uq_transaction_hash_contenido ON transaction (hash_contenido);
+
+-- Verificar cambios
+SELECT 'Columna hash_contenido añadida correctamente' AS resultado;
@@ -30,8 +30,14 @@ def run_migration(sql_file_path):
         with open(sql_file_path, 'r', encoding='utf-8') as f:
             sql_content = f.read()
         
-        # Separar por punto y coma para ejecutar múltiples statements
-        statements = [s.strip() for s in sql_content.split(';') if s.strip() and not s.strip().startswith('--')]
+        # Separar por punto y coma para ejecutar múltiples statements; las líneas de
+        # comentario se quitan de cada uno (el primero suele ir detrás de la cabecera)
+        statements = []
+        for bloque in sql_content.split(';'):
+            lineas = [l for l in bloque.splitlines() if not l.strip().startswith('--')]
+            statement = "\n".join(lineas).strip()
+            if statement:
+                statements.append(statement)
         
         with db.engine.connect() as conn:
             for i, statement in enumerate(statements, 1):
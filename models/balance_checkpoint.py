@@ -0,0 +1,113 @@
+# models/balance_checkpoint.py
+from datetime import date
+
+from sqlalchemy import Column, Integer, Date, Numeric, ForeignKey, UniqueConstraint, event, delete, inspect
+from sqlalchemy.orm import Session
+from database import db
+
+
+class BalanceCheckpoint(db.Base):
+    """
+    Saldo de una cuenta ya calculado a una fecha (normalmente fin de mes).
+    Es una caché: calcular_balance_cuenta parte del checkpoint más cercano y solo
+    suma el delta. Se invalida automáticamente al escribir movimientos (ver abajo).
+    """
+    __tablename__ = "balance_checkpoint"
+    __table_args__ = (UniqueConstraint("cuenta_id", "fecha", name="uq_checkpoint_cuenta_fecha"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cuenta_id = Column(Integer, ForeignKey("account.id", ondelete="CASCADE"), nullable=False)
+    fecha = Column(Date, nullable=False)
+    saldo = Column(Numeric(18, 6), nullable=False)  # más decimales que 2: los ajustes son Float
+
+    def __repr__(self):
+        return f"<BalanceCheckpoint cuenta={self.cuenta_id} fecha={self.fecha} saldo={self.saldo}>"
+
+
+# -------------------------------------------------------------
+# Disponibilidad de la tabla (las BD antiguas pueden no tenerla aún)
+# -------------------------------------------------------------
+_tabla_por_engine = {}
+
+
+def checkpoints_disponibles(session) -> bool:
+    """True si la tabla balance_checkpoint existe en la BD de la sesión (se comprueba una vez por engine)."""
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    if engine not in _tabla_por_engine:
+        try:
+            _tabla_por_engine[engine] = inspect(engine).has_table(BalanceCheckpoint.__tablename__)
+        except Exception:
+            _tabla_por_engine[engine] = False
+    return _tabla_por_engine[engine]
+
+
+# -------------------------------------------------------------
+# Invalidación: al insertar/modificar/borrar movimientos se eliminan
+# los checkpoints de esa cuenta con fecha >= la fecha afectada
+# -------------------------------------------------------------
+def _valores(obj, nombre):
+    """Valores actuales y anteriores de un atributo (un update puede mover cuenta o fecha)."""
+    hist = inspect(obj).attrs[nombre].history
+    return [v for v in (*hist.added, *hist.unchanged, *hist.deleted) if v is not None]
+
+
+def fechas_afectadas(session) -> dict:
+    """Devuelve {cuenta_id: fecha_minima_afectada} para los cambios pendientes de la sesión."""
+    from models.account import Account
+    from models.transaction import Transaction
+    from models.adjustment import Adjustment
+    from models.fixed_expense import FixedExpense
+
+    campo_fecha = {Transaction: "fecha", Adjustment: "fecha", FixedExpense: "fecha_inicio"}
+    afectadas = {}
+
+    def marcar(cuenta_id, fecha):
+        if cuenta_id not in afectadas or fecha < afectadas[cuenta_id]:
+            afectadas[cuenta_id] = fecha
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Account):
+            # cambia saldo_inicial o se borra la cuenta: todos sus checkpoints
+            if obj.id is not None and obj not in session.new:
+                marcar(obj.id, date.min)
+            continue
+        nombre_fecha = campo_fecha.get(type(obj))
+        if nombre_fecha is None:
+            continue
+        fechas = _valores(obj, nombre_fecha)
+        cuentas = _valores(obj, "cuenta_id")
+        if not cuentas and getattr(obj, "cuenta", None) is not None:
+            # objeto nuevo asociado por relación: cuenta_id aún no está asignado
+            cuentas = [obj.cuenta.id]
+        for cuenta_id in cuentas:
+            marcar(cuenta_id, min(fechas) if fechas else date.min)
+    return afectadas
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidar_checkpoints(session, flush_context, instances):
+    if not checkpoints_disponibles(session):
+        return
+    afectadas = fechas_afectadas(session)
+    if not afectadas:
+        return
+    # mientras la transacción tenga cambios sin confirmar no se guardan checkpoints nuevos
+    session.info["checkpoints_pendientes"] = True
+    conn = session.connection()
+    for cuenta_id, fecha in afectadas.items():
+        conn.execute(
+            delete(BalanceCheckpoint.__table__).where(
+                BalanceCheckpoint.cuenta_id == cuenta_id,
+                BalanceCheckpoint.fecha >= fecha,
+            )
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _limpiar_marca_checkpoints(session, transaction):
+    # commit, rollback o close de la transacción principal (no de un savepoint)
+    if transaction.parent is None:
+        session.info.pop("checkpoints_pendientes", None)
@@ -4,7 +4,6 @@ from sqlalchemy.orm import relationship
 from database import db
 from datetime import datetime, timezone
 from decimal import Decimal
-import yfinance as yf
 from sqlalchemy import func
 
 
@@ -74,6 +73,7 @@ class PriceSnapshot(db.Base):
 def fetch_price_yfinance_float(ticker: str) -> float | None:
     """Usar yfinance y devolver float (ya tenías una función parecida)."""
     try:
+        import yfinance as yf  # diferido: solo se carga al refrescar precios
         t = yf.Ticker(ticker)
         hist = t.history(period="1d", interval="1m")
         if hist is None or hist.empty:
@@ -1,11 +1,19 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Date, inspect, select, update
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import date
 
+# Parámetros de la simulación Monte Carlo (migrations/add_distribucion_migration.py)
+COLUMNAS_MONTECARLO = ("distribucion", "desviacion", "patron_historico")
+
+
 class SimulationVariable(Base):
     __tablename__ = 'simulation_variables'
-    
+    # Las columnas Monte Carlo están en la tabla pero no en el mapeo ORM: las BD sin la
+    # migración siguen pudiendo leer y crear variables. Se leen con cargar_distribuciones()
+    # y se escriben con guardar_distribucion() (Core, si distribucion_disponible()).
+    __mapper_args__ = {"exclude_properties": list(COLUMNAS_MONTECARLO)}
+
     id = Column(Integer, primary_key=True)
     descripcion = Column(String(255), nullable=False)
     cuenta_id = Column(Integer, ForeignKey('account.id'), nullable=False)
@@ -13,9 +21,73 @@ class SimulationVariable(Base):
     frecuencia = Column(String(50), nullable=False)  # semanal, mensual, trimestral, semestral, anual
     fecha_inicio = Column(Date, nullable=True)  # fecha de inicio de la variable
     activo = Column(Integer, default=1)  # 0=inactivo, 1=activo
-    
+    distribucion = Column(String(20), nullable=False, server_default='fija')  # fija, normal, historica
+    desviacion = Column(Numeric(15, 2), nullable=True)  # desviación típica del importe ('normal')
+    patron_historico = Column(String(255), nullable=True)  # texto de las transacciones a remuestrear ('historica')
+
     # Relationship
     cuenta = relationship("Account", backref="simulation_variables")
-    
+
     def __repr__(self):
         return f"<SimulationVariable(id={self.id}, descripcion='{self.descripcion}', activo={self.activo})>"
+
+
+# Fuera del ORM son atributos Python normales: por defecto, importe fijo
+# (la Column de la clase ya está en la tabla y no se necesita aquí)
+SimulationVariable.distribucion = 'fija'
+SimulationVariable.desviacion = None
+SimulationVariable.patron_historico = None
+
+
+_montecarlo_por_engine = {}
+
+
+def distribucion_disponible(session) -> bool:
+    """True si la tabla simulation_variables ya tiene las columnas Monte Carlo (se comprueba una vez por engine)."""
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    if engine not in _montecarlo_por_engine:
+        try:
+            columnas = {c["name"] for c in inspect(engine).get_columns(SimulationVariable.__tablename__)}
+            _montecarlo_por_engine[engine] = set(COLUMNAS_MONTECARLO) <= columnas
+        except Exception:
+            _montecarlo_por_engine[engine] = False
+    return _montecarlo_por_engine[engine]
+
+
+def cargar_distribuciones(session, variables):
+    """
+    Copia distribucion, desviacion y patron_historico de la BD a cada variable (una
+    consulta). Sin la migración las variables se quedan con los valores por defecto ('fija').
+    """
+    if not variables or not distribucion_disponible(session):
+        return variables
+    tabla = SimulationVariable.__table__
+    filas = session.execute(
+        select(tabla.c.id, *(tabla.c[c] for c in COLUMNAS_MONTECARLO))
+        .where(tabla.c.id.in_([v.id for v in variables]))
+    ).all()
+    por_id = {fila[0]: fila[1:] for fila in filas}
+    for v in variables:
+        if v.id in por_id:
+            distribucion, v.desviacion, v.patron_historico = por_id[v.id]
+            v.distribucion = distribucion or 'fija'
+    return variables
+
+
+def guardar_distribucion(session, variable, distribucion='fija', desviacion=None, patron_historico=None):
+    """
+    Escribe los parámetros Monte Carlo de una variable ya insertada (tras flush) con un
+    UPDATE de Core. Sin la migración solo se admite 'fija'.
+    """
+    if not distribucion_disponible(session):
+        if distribucion != 'fija':
+            raise RuntimeError("La base de datos no tiene las columnas de Monte Carlo: "
+                               "ejecuta migrations/add_distribucion_migration.py")
+        return
+    tabla = SimulationVariable.__table__
+    session.execute(
+        update(tabla).where(tabla.c.id == variable.id)
+        .values(distribucion=distribucion, desviacion=desviacion, patron_historico=patron_historico)
+    )
+    variable.distribucion, variable.desviacion, variable.patron_historico = distribucion, desviacion, patron_historico
@@ -1,5 +1,6 @@
 # models/transaction.py
-from sqlalchemy import Column, Integer, ForeignKey, Date, String, Numeric, func, select
+import hashlib
+from sqlalchemy import Column, Integer, ForeignKey, Date, String, Numeric, Index, func, select, inspect
 from sqlalchemy.orm import relationship
 from database import db
 from datetime import date
@@ -8,6 +9,9 @@ from dateutil.relativedelta import relativedelta
 
 class Transaction(db.Base):
     __tablename__ = "transaction"
+    __table_args__ = (Index("uq_transaction_hash_contenido", "hash_contenido", unique=True),)
+    # hash_contenido está en la tabla pero no en el mapeo ORM (ver abajo)
+    __mapper_args__ = {"exclude_properties": ["hash_contenido"]}
 
     id = Column(Integer, primary_key=True)
     cuenta_id = Column(Integer, ForeignKey("account.id"), nullable=False)
@@ -15,6 +19,11 @@ class Transaction(db.Base):
     descripcion = Column(String(255), nullable=False)
     monto = Column(Numeric(12, 2), nullable=False)
     es_transferencia = Column(Integer, default=0)  # 0=no, 1=sí (Boolean como Integer para compatibilidad)
+    # Huella del contenido (ver hash_contenido()) para no importar dos veces el mismo
+    # movimiento; la escribe el importador con insert() de Core y queda NULL en los
+    # movimientos creados a mano. Fuera del ORM para que las BD sin la migración
+    # add_hash_contenido_to_transaction puedan seguir leyendo y creando transacciones.
+    hash_contenido = Column(String(64), nullable=True)
 
     # Relación con la cuenta
     cuenta = relationship("Account", backref="transactions")
@@ -33,6 +42,40 @@ class Transaction(db.Base):
         }
 
 
+# -------------------------------------------------------------
+# Huella de contenido (detección de duplicados al importar)
+# -------------------------------------------------------------
+def normalizar_descripcion(texto) -> str:
+    """Descripción comparable: sin mayúsculas ni espacios sobrantes."""
+    return " ".join(str(texto or "").casefold().split())
+
+
+def hash_contenido(cuenta_id: int, fecha: date, centimos: int, descripcion, ordinal: int) -> str:
+    """
+    SHA-256 de (cuenta, fecha, importe en céntimos, descripción normalizada, ordinal).
+    El ordinal (1, 2, ...) distingue movimientos idénticos legítimos del mismo día
+    (dos cafés de 1,50 €): es el nº de aparición de ese mismo contenido en el extracto.
+    """
+    clave = f"{int(cuenta_id)}|{fecha.isoformat()}|{int(centimos)}|{normalizar_descripcion(descripcion)}|{int(ordinal)}"
+    return hashlib.sha256(clave.encode("utf-8")).hexdigest()
+
+
+_hash_por_engine = {}
+
+
+def hash_disponible(session) -> bool:
+    """True si la tabla transaction ya tiene la columna hash_contenido (se comprueba una vez por engine)."""
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    if engine not in _hash_por_engine:
+        try:
+            columnas = inspect(engine).get_columns(Transaction.__tablename__)
+            _hash_por_engine[engine] = any(c["name"] == "hash_contenido" for c in columnas)
+        except Exception:
+            _hash_por_engine[engine] = False
+    return _hash_por_engine[engine]
+
+
 # -------------------------------------------------------------
 # Helper: obtener saldos de -2, -1, 0, +1 meses respecto a una fecha
 # -------------------------------------------------------------
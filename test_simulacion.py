@@ -10,7 +10,7 @@ from dateutil.relativedelta import relativedelta
 from database import db
 from models.account import Account
 from models.simulation_variable import SimulationVariable
-from utils.reconciler import calcular_balance_cuenta
+from utils.reconciler import calcular_balance_cuenta, calcular_saldos_todas_cuentas
 from decimal import Decimal
 
 def test_simulation():
@@ -33,8 +33,9 @@ def test_simulation():
         # 1. Mostrar cuentas disponibles
         print("\n📊 Cuentas disponibles:")
         cuentas = session.query(Account).order_by(Account.nombre).all()
+        saldos = calcular_saldos_todas_cuentas(session, date.today())
         for i, cuenta in enumerate(cuentas, 1):
-            saldo_actual = calcular_balance_cuenta(session, cuenta.id, date.today())
+            saldo_actual = saldos.get(cuenta.id, 0.0)
             print(f"  {i}. {cuenta.nombre}: {saldo_actual:,.2f} €")
         
         if not cuentas:
@@ -1,5 +1,5 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                               QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox,
+                               QHeaderView, QMessageBox, QLineEdit,
                                QFormLayout, QDateEdit, QGroupBox, QComboBox, QLabel,
                                QFileDialog)
 from PySide6.QtCore import Qt, QDate
@@ -15,8 +15,10 @@ from models.adjustment import Adjustment
 from models.fixed_expense import FixedExpense
 from models.simulation_variable import SimulationVariable
 from utils.reconciler import calcular_balance_cuenta
+from utils.money import a_centimos, a_decimal
 from sqlalchemy import select, or_
 from ui.variables_dialog import VariablesDialog
+from ui.table_models import Columna, ModeloColumnas, crear_vista_tabla, poner_modelo, filtrar, DERECHA, CENTRO
 
 
 class AccountSimulationWindow(QDialog):
@@ -93,9 +95,14 @@ class AccountSimulationWindow(QDialog):
         results_label = QLabel("Movimientos:")
         layout.addWidget(results_label)
         
-        self.results_table = QTableWidget()
-        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filtrar movimientos...")
+        layout.addWidget(self.filter_edit)
+        
+        # Tabla virtual (modelo + proxy para ordenar/filtrar)
+        self.results_table = crear_vista_tabla(self)
         self.results_table.setAlternatingRowColors(True)
+        self.filter_edit.textChanged.connect(lambda texto: filtrar(self.results_table, texto))
         layout.addWidget(self.results_table)
         
         # --- Botón cerrar ---
@@ -174,8 +181,10 @@ class AccountSimulationWindow(QDialog):
         
         # Calcular saldo inicial (un día antes de la fecha de inicio)
         dia_anterior = fecha_inicio_param - timedelta(days=1)
-        saldo_inicial = Decimal(str(calcular_balance_cuenta(self.session, cuenta_id, dia_anterior)))
+        saldo_inicial = a_centimos(calcular_balance_cuenta(self.session, cuenta_id, dia_anterior))
         
+        # Los importes se guardan en céntimos ("centimos") mientras se acumulan;
+        # al final se convierten a Decimal para mostrarlos
         movimientos = []
         
         # --- Ajustes en rango ---
@@ -191,7 +200,7 @@ class AccountSimulationWindow(QDialog):
             movimientos.append({
                 "fecha": adj.fecha,
                 "concepto": adj.descripcion or "Ajuste",
-                "importe": Decimal(str(adj.monto_ajuste)),
+                "centimos": a_centimos(adj.monto_ajuste),
                 "tipo": "ajuste",
                 "es_transferencia": 0
             })
@@ -209,7 +218,7 @@ class AccountSimulationWindow(QDialog):
             movimientos.append({
                 "fecha": t.fecha,
                 "concepto": t.descripcion or "Transacción",
-                "importe": Decimal(str(t.monto)),
+                "centimos": a_centimos(t.monto),
                 "tipo": "puntual",
                 "es_transferencia": getattr(t, 'es_transferencia', 0)
             })
@@ -237,7 +246,7 @@ class AccountSimulationWindow(QDialog):
                 movimientos.append({
                     "fecha": ocurrencia,
                     "concepto": f.descripcion or "Gasto/Ingreso Fijo",
-                    "importe": Decimal(str(f.monto)),
+                    "centimos": a_centimos(f.monto),
                     "tipo": "fijo",
                     "es_transferencia": getattr(f, 'es_transferencia', 0)
                 })
@@ -278,7 +287,7 @@ class AccountSimulationWindow(QDialog):
                 movimientos.append({
                     "fecha": fecha_var,
                     "concepto": f"[Variable] {variable.descripcion}",
-                    "importe": Decimal(str(variable.importe)),
+                    "centimos": a_centimos(variable.importe),
                     "tipo": "variable",
                     "es_transferencia": 0
                 })
@@ -304,13 +313,15 @@ class AccountSimulationWindow(QDialog):
         # Calcular saldo acumulado
         saldo_actual = saldo_inicial
         for mov in movimientos:
-            saldo_actual += mov["importe"]
-            mov["saldo"] = saldo_actual
+            centimos = mov.pop("centimos")
+            saldo_actual += centimos
+            mov["importe"] = a_decimal(centimos)
+            mov["saldo"] = a_decimal(saldo_actual)
         
         return {
-            "saldo_inicial": saldo_inicial,
+            "saldo_inicial": a_decimal(saldo_inicial),
             "detalle": movimientos,
-            "saldo_final": saldo_actual
+            "saldo_final": a_decimal(saldo_actual)
         }
     
     def run_simulation(self):
@@ -366,7 +377,7 @@ class AccountSimulationWindow(QDialog):
             cuenta: Account object
         """
         if not resultados or not resultados.get('detalle'):
-            self.results_table.setRowCount(0)
+            poner_modelo(self.results_table, ModeloColumnas(0, []))
             self.summary_label.setText("No hay movimientos en el rango seleccionado")
             return
         
@@ -381,61 +392,26 @@ class AccountSimulationWindow(QDialog):
                        f"Diferencia: {float(diferencia):+,.2f} €")
         self.summary_label.setText(summary_text)
         
-        # Configurar columnas: Fecha, Tipo, Descripción, Importe, Saldo, Es Transferencia
-        self.results_table.setColumnCount(6)
-        headers = ['Fecha', 'Tipo', 'Descripción', 'Importe', 'Saldo', 'Transferencia']
-        self.results_table.setHorizontalHeaderLabels(headers)
-        
-        # Llenar datos
+        # Columnas: Fecha, Tipo, Descripción, Importe, Saldo, Es Transferencia.
+        # El modelo lee cada movimiento solo cuando su fila se ve (texto y colores incluidos)
         movimientos = resultados['detalle']
-        self.results_table.setRowCount(len(movimientos))
-        
-        for row, mov in enumerate(movimientos):
-            # Fecha
-            fecha_str = mov['fecha'].strftime('%d/%m/%Y')
-            fecha_item = QTableWidgetItem(fecha_str)
-            self.results_table.setItem(row, 0, fecha_item)
-            
-            # Tipo
-            tipo_str = mov['tipo'].capitalize()
-            tipo_item = QTableWidgetItem(tipo_str)
-            self.results_table.setItem(row, 1, tipo_item)
-            
-            # Descripción
-            desc_item = QTableWidgetItem(mov['concepto'])
-            self.results_table.setItem(row, 2, desc_item)
-            
-            # Importe
-            importe = float(mov['importe'])
-            importe_item = QTableWidgetItem(f"{importe:,.2f}")
-            importe_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            
+        verde, rojo = QColor(0, 128, 0), QColor(200, 0, 0)
+        rojo_claro, lavanda = QColor(255, 220, 220), QColor(230, 230, 250)
+        columnas = [
+            Columna('Fecha', lambda i: movimientos[i]['fecha'], lambda f: f.strftime('%d/%m/%Y')),
+            Columna('Tipo', lambda i: movimientos[i]['tipo'], lambda t: t.capitalize()),
+            Columna('Descripción', lambda i: movimientos[i]['concepto']),
             # Colorear importe: verde si positivo, rojo si negativo
-            if importe > 0:
-                importe_item.setForeground(QColor(0, 128, 0))  # Verde
-            elif importe < 0:
-                importe_item.setForeground(QColor(200, 0, 0))  # Rojo
-            
-            self.results_table.setItem(row, 3, importe_item)
-            
-            # Saldo
-            saldo = float(mov['saldo'])
-            saldo_item = QTableWidgetItem(f"{saldo:,.2f}")
-            saldo_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            
+            Columna('Importe', lambda i: float(movimientos[i]['importe']), lambda v: f"{v:,.2f}", DERECHA,
+                    color=lambda i: verde if movimientos[i]['importe'] > 0 else (rojo if movimientos[i]['importe'] < 0 else None)),
             # Colorear saldo en rojo si es negativo
-            if saldo < 0:
-                saldo_item.setBackground(QColor(255, 220, 220))  # Rojo claro
-            
-            self.results_table.setItem(row, 4, saldo_item)
-            
-            # Es Transferencia
-            es_transferencia = mov.get('es_transferencia', 0)
-            transfer_item = QTableWidgetItem('✓' if es_transferencia else '')
-            transfer_item.setTextAlignment(Qt.AlignCenter)
-            if es_transferencia:
-                transfer_item.setBackground(QColor(230, 230, 250))  # Lavanda claro
-            self.results_table.setItem(row, 5, transfer_item)
+            Columna('Saldo', lambda i: float(movimientos[i]['saldo']), lambda v: f"{v:,.2f}", DERECHA,
+                    fondo=lambda i: rojo_claro if movimientos[i]['saldo'] < 0 else None),
+            Columna('Transferencia', lambda i: 1 if movimientos[i].get('es_transferencia', 0) else 0,
+                    lambda v: '✓' if v else '', CENTRO,
+                    fondo=lambda i: lavanda if movimientos[i].get('es_transferencia', 0) else None),
+        ]
+        poner_modelo(self.results_table, ModeloColumnas(len(movimientos), columnas))
         
         # Ajustar tamaño de columnas
         self.results_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Fecha
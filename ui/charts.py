@@ -0,0 +1,194 @@
+# ui/charts.py
+"""
+Capa de gráficos reutilizable sobre Matplotlib.
+
+En vez de hacer figure.clear() y reconstruir ejes, formateadores, leyenda y
+anotaciones en cada refresco, los ejes se crean una sola vez y los artistas
+(Line2D, barras, textos) se reutilizan: se actualizan con set_data / set_height /
+set_text y el canvas se repinta con draw_idle(), que agrupa los repintados y
+evita el coste completo de maquetación de Matplotlib.
+"""
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.patches import Rectangle
+
+# Por debajo de este número de puntos dibujados se marcan con 'o'
+MAX_PUNTOS_CON_MARCADOR = 60
+
+
+def indices_lttb(x, y, n_salida: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de los n_salida puntos de (x, y) que mejor
+    conservan la forma de la serie (picos y valles incluidos). Siempre mantiene el primero
+    y el último. Si la serie ya cabe (o tiene NaN) devuelve todos los índices.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_salida >= n or n_salida < 3 or not np.isfinite(y).all():
+        return np.arange(n)
+
+    # n_salida - 2 cubos para los puntos interiores; bordes[i]..bordes[i+1] es el cubo i
+    ancho = (n - 2) / (n_salida - 2)
+    bordes = np.floor(np.arange(n_salida - 1) * ancho).astype(np.int64) + 1
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_salida - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        # vértice C: media del cubo siguiente (para el último cubo, el último punto)
+        cx = x[fin:sig_fin].mean()
+        cy = y[fin:sig_fin].mean()
+        # área del triángulo (A = punto elegido antes, B = candidato del cubo, C)
+        areas = np.abs((x[a] - cx) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (cy - y[a]))
+        a = ini + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def etiquetas_extremos(fechas, saldos, xytext=(0, 6)):
+    """Anotaciones (para colocar/actualizar) solo en el máximo y el mínimo de la serie."""
+    y = np.asarray(saldos, dtype=np.float64)
+    if not len(y) or np.isnan(y).all():
+        return []
+    i_max, i_min = int(np.nanargmax(y)), int(np.nanargmin(y))
+    etiquetas = [((fechas[i_max], y[i_max]), f"{y[i_max]:.2f}", {"xytext": xytext, "va": "bottom"})]
+    if y[i_min] != y[i_max]:
+        etiquetas.append(((fechas[i_min], y[i_min]), f"{y[i_min]:.2f}",
+                          {"xytext": (xytext[0], -xytext[1]), "va": "top"}))
+    return etiquetas
+
+
+# Estilo por defecto de las anotaciones (se reaplica entero al reutilizar una,
+# para que no arrastre color/alineación de su uso anterior)
+ESTILO_ETIQUETA = {
+    "ha": "center", "va": "baseline", "color": "black",
+    "fontsize": 8, "fontweight": "normal", "bbox": None,
+}
+
+
+class EtiquetasReutilizables:
+    """
+    Conjunto de anotaciones de un eje que se reutilizan entre refrescos.
+    colocar() mueve/reescribe las existentes, crea solo las que falten y oculta las sobrantes.
+    """
+
+    def __init__(self, ax):
+        self.ax = ax
+        self._anotaciones = []
+
+    def colocar(self, etiquetas):
+        """
+        etiquetas: iterable de (xy, texto, estilo). estilo es un dict opcional con
+        xytext (desplazamiento en puntos) y propiedades de texto (ha, va, color, fontsize, fontweight, bbox).
+        """
+        n = 0
+        for xy, texto, estilo in etiquetas:
+            estilo = dict(estilo or {})
+            xytext = estilo.pop("xytext", (0, 0))
+            if n < len(self._anotaciones):
+                ann = self._anotaciones[n]
+                ann.xy = xy
+                ann.set_text(texto)
+            else:
+                ann = self.ax.annotate(texto, xy=xy, xytext=xytext, textcoords="offset points")
+                self._anotaciones.append(ann)
+            ann.xyann = xytext
+            ann.set(**{**ESTILO_ETIQUETA, **estilo})
+            ann.set_visible(True)
+            n += 1
+        for ann in self._anotaciones[n:]:
+            ann.set_visible(False)
+
+    def ocultar(self):
+        self.colocar([])
+
+
+class GraficoSeries:
+    """
+    Gráfico de líneas de saldos (una o varias series sobre las mismas fechas) con
+    sombreado de proyección. Crea el eje una vez y reutiliza las líneas: cambiar de
+    cuenta o de fecha solo actualiza datos y llama a draw_idle().
+    """
+
+    def __init__(self, figure, canvas):
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.add_subplot(111)
+        self.ax.xaxis.axis_date()  # unidades de fecha desde el principio: set_data acepta date
+        self.ax.set_xlabel("Fecha")
+        self.ax.set_ylabel("Saldo (€)")
+        self.ax.grid(True)
+        self.lineas = []
+        self.etiquetas = EtiquetasReutilizables(self.ax)
+        # sombreado del futuro: x en datos, y en coordenadas del eje (de 0 a 1)
+        self.proyeccion = Rectangle((0, 0), 0, 1, transform=self.ax.get_xaxis_transform(),
+                                    alpha=0.2, color="blue", visible=False)
+        self.ax.add_patch(self.proyeccion)
+        self._formato_fecha = None
+        self._claves_leyenda = None
+
+    def actualizar(self, fechas, series, titulo, formato_fecha, nombres=None,
+                   etiquetas=(), fecha_proyeccion=None, markersize=None):
+        """
+        fechas: lista de date; series: lista de secuencias de saldos (una por línea), que se
+        reducen con LTTB al ancho del eje antes de dibujarlas.
+        nombres: etiquetas de leyenda (None = sin leyenda). etiquetas: (xy, texto, estilo) a anotar.
+        fecha_proyeccion: sombrea desde la primera fecha >= ella hasta la última.
+        """
+        ax = self.ax
+        # Cada serie se reduce con LTTB al ancho en píxeles del eje: más puntos no se verían
+        fechas64 = np.asarray(fechas, dtype="datetime64[D]")
+        x = fechas64.astype(np.int64)
+        ancho_px = max(int(ax.bbox.width), 100)
+        for i, saldos in enumerate(series):
+            saldos = np.asarray(saldos, dtype=np.float64)
+            idx = indices_lttb(x, saldos, ancho_px)
+            if i < len(self.lineas):
+                linea = self.lineas[i]
+                linea.set_data(fechas64[idx], saldos[idx])
+            else:
+                linea, = ax.plot(fechas64[idx], saldos[idx], linestyle="-")
+                self.lineas.append(linea)
+            linea.set_label(nombres[i] if nombres else None)
+            linea.set_marker("o" if len(idx) <= MAX_PUNTOS_CON_MARCADOR else "None")
+            linea.set_markersize(markersize if markersize is not None else 6)
+            linea.set_visible(True)
+        for linea in self.lineas[len(series):]:
+            linea.set_visible(False)
+            linea.set_label(None)  # fuera de la leyenda
+
+        # Sombrear área futura
+        futuras = [f for f in fechas if fecha_proyeccion is not None and f >= fecha_proyeccion]
+        if futuras and len(fechas) > 1:
+            x0, x1 = mdates.date2num(futuras[0]), mdates.date2num(fechas[-1])
+            self.proyeccion.set_x(x0)
+            self.proyeccion.set_width(x1 - x0)
+            self.proyeccion.set_visible(True)
+            self.proyeccion.set_label("Proyección")
+        else:
+            self.proyeccion.set_visible(False)
+            self.proyeccion.set_label(None)
+
+        if formato_fecha != self._formato_fecha:
+            ax.xaxis.set_major_formatter(mdates.DateFormatter(formato_fecha))
+            self._formato_fecha = formato_fecha
+        self.figure.autofmt_xdate(rotation=30)
+        ax.set_title(titulo)
+
+        self.etiquetas.colocar(etiquetas)
+
+        # La leyenda solo se reconstruye si cambian las series
+        claves = (tuple(nombres), self.proyeccion.get_visible()) if nombres else None
+        if claves != self._claves_leyenda:
+            leyenda = ax.get_legend()
+            if leyenda is not None:
+                leyenda.remove()
+            if claves:
+                ax.legend(loc="best", fontsize=8)
+            self._claves_leyenda = claves
+
+        ax.relim(visible_only=True)
+        ax.autoscale_view()
+        self.canvas.draw_idle()
@@ -20,7 +20,10 @@ import numpy as np
 from dateutil.relativedelta import relativedelta
 from models.adjustment import Adjustment
 from models.fixed_expense import FixedExpense
-from utils.reconciler import obtener_gastos_top, calcular_detalle_cuenta
+from utils.reconciler import obtener_gastos_top, calcular_saldos_todas_cuentas
+from utils.recurrence import contar_ocurrencias
+from utils.money import a_centimos, a_euros, a_decimal
+from ui.charts import EtiquetasReutilizables
 
 # Función helper para obtener formato matplotlib desde configuración
 def get_matplotlib_date_format():
@@ -38,25 +41,12 @@ try:
 except Exception:
     Mortgage = None
     MortgagePeriod = None
-from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QGridLayout, QLabel
-)
-from PySide6.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-
-
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel
-from PySide6.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-import numpy as np
+from PySide6.QtWidgets import QGridLayout
 
 from models.account import Account
 from utils.reconciler import calcular_detalle_acumulado
 from models.mortgage import Mortgage
 from models.mortgage_period import MortgagePeriod
-import pandas as pd
 from sqlalchemy import select, or_, func
 
 class DashboardWidget(QWidget):
@@ -115,6 +105,9 @@ class DashboardWidget(QWidget):
         self.canvas_invest = FigureCanvas(self.fig_invest)
         self.canvas_invest.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # Ejes y artistas fijos: los refrescos solo actualizan datos
+        self._crear_ejes()
+
         # Layout 2x2: todas las celdas con tamaño igual
         # Fila 0: Ingresos/Gastos | Préstamos
         # Fila 1: Top Gastos (tarta) | Inversiones
@@ -180,6 +173,46 @@ class DashboardWidget(QWidget):
         # Guardar referencia al grid
         self.grid = grid
     
+    def _crear_ejes(self):
+        """
+        Crea una sola vez los ejes de los 4 gráficos con sus títulos, rejillas y
+        artistas reutilizables (líneas, textos). Los _draw_* solo cambian sus datos.
+        """
+        self.ax_bars = self.fig_bars.add_subplot(111)
+        self.ax_bars.set_ylabel("Euros")
+        self.ax_bars.set_title("Ingresos y Gastos — mes anterior")
+        self.ax_bars.grid(axis="y", linestyle="--", alpha=0.4)
+        self._etiquetas_bars = EtiquetasReutilizables(self.ax_bars)
+
+        self.ax_top_gastos = self.fig_top_gastos.add_subplot(111)
+        self.ax_top_gastos.set_aspect('equal')
+        self.ax_top_gastos.axis('off')  # quitamos ejes para que ocupe todo el espacio
+        self.fig_top_gastos.tight_layout()
+
+        self.fig_loans.set_size_inches(10, 6)  # ancho=10, alto=6 pulgadas
+        self.ax_loans = self.fig_loans.add_subplot(111)
+        self.ax_loans.set_xlabel("Porcentaje de amortización (%)", fontsize=10)
+        self.ax_loans.set_xlim(0, 115)  # Dar espacio para las etiquetas del total
+        self.ax_loans.set_title("Préstamos — Proporción Amortizado vs Pendiente", fontsize=11, weight='bold')
+        self.ax_loans.grid(axis="x", linestyle="--", alpha=0.4)
+        self._etiquetas_loans = EtiquetasReutilizables(self.ax_loans)
+
+        self.ax_invest = self.fig_invest.add_subplot(111)
+        self.ax_invest.xaxis.axis_date()
+        self._linea_coste, = self.ax_invest.plot([], [], label="Coste Acumulado",
+                                                 linewidth=2, color="tab:blue", marker="o")
+        self._linea_valor, = self.ax_invest.plot([], [], label="Valor Actual",
+                                                 linewidth=2, color="tab:green", marker="o")
+        self.ax_invest.set_title("Evolución de Inversiones")
+        self.ax_invest.set_xlabel("Fecha")
+        self.ax_invest.set_ylabel("Valor (€)")
+        self.ax_invest.grid(True, linestyle="--", alpha=0.5)
+        self._texto_sin_invest = self.ax_invest.text(0.5, 0.5, '', transform=self.ax_invest.transAxes,
+                                                     ha='center', va='center', fontsize=14, color='gray',
+                                                     visible=False)
+        self._etiquetas_invest = EtiquetasReutilizables(self.ax_invest)
+        self._invest_maquetado = False
+
     def showEvent(self, event):
         """Posiciona el score cuando se muestra el widget"""
         super().showEvent(event)
@@ -289,31 +322,49 @@ class DashboardWidget(QWidget):
         gastos = [float(d.get("gastos", 0.0) or 0.0) for d in datos]
 
         fig = self.fig_bars
-        fig.clear()
-        ax = fig.add_subplot(111)
-
+        ax = self.ax_bars
         x = np.arange(len(nombres))
         width = 0.35
 
-        bars_ing = ax.bar(x - width/2, ingresos, width, label="Ingresos")
-        bars_gas = ax.bar(x + width/2, gastos, width, label="Gastos")
-
-        ax.set_ylabel("Euros")
-        ax.set_title("Ingresos y Gastos — mes anterior")
-        ax.set_xticks(x)
-        ax.set_xticklabels(nombres, rotation=25, ha="right")
-        ax.legend()
-        ax.grid(axis="y", linestyle="--", alpha=0.4)
+        # Reutilizar las barras si el número de cuentas no cambia; si cambia se
+        # recrean solo las barras (los ejes, títulos y rejilla se mantienen)
+        barras = getattr(self, "_barras_ing_gas", None)
+        cambia_forma = barras is None or len(barras[0]) != len(nombres)
+        if cambia_forma:
+            if barras is not None:
+                for contenedor in barras:
+                    contenedor.remove()
+            barras = (
+                ax.bar(x - width/2, ingresos, width, label="Ingresos", color="tab:blue"),
+                ax.bar(x + width/2, gastos, width, label="Gastos", color="tab:orange"),
+            )
+            self._barras_ing_gas = barras
+            ax.set_xticks(x)
+            ax.legend()
+        else:
+            for rects, valores in zip(barras, (ingresos, gastos)):
+                for rect, h in zip(rects, valores):
+                    rect.set_height(h)
+        bars_ing, bars_gas = barras
+        if cambia_forma or [t.get_text() for t in ax.get_xticklabels()] != nombres:
+            ax.set_xticklabels(nombres, rotation=25, ha="right")
+            cambia_forma = True
 
         # anotar valores encima de las barras
+        etiquetas = []
         for rects in (bars_ing, bars_gas):
             for rect in rects:
                 h = rect.get_height()
                 if h:
-                    ax.annotate(f'{h:.2f}', xy=(rect.get_x() + rect.get_width() / 2, h),
-                                xytext=(0, 3), textcoords="offset points", ha='center', va='bottom', fontsize=8)
-
-        fig.tight_layout()
+                    etiquetas.append(((rect.get_x() + rect.get_width() / 2, h), f'{h:.2f}',
+                                      {"xytext": (0, 3), "va": "bottom"}))
+        self._etiquetas_bars.colocar(etiquetas)
+
+        ax.relim()
+        ax.autoscale_view()
+        # tight_layout es la parte cara: solo cuando cambian las etiquetas del eje X
+        if cambia_forma:
+            fig.tight_layout()
         try:
             self.canvas_bars.draw_idle()
         except Exception as e:
@@ -380,9 +431,11 @@ class DashboardWidget(QWidget):
                 labels = ["Sin datos"]
                 sizes = [1.0]
 
-            # limpiar figura y dibujar tarta ocupando todo el canvas
-            self.fig_top_gastos.clear()
-            ax = self.fig_top_gastos.add_subplot(111)
+            # Mismo eje de siempre: solo se sustituyen las cuñas y sus textos
+            # (una tarta no se puede redimensionar in situ como una línea)
+            ax = self.ax_top_gastos
+            for artista in getattr(self, "_artistas_tarta", []):
+                artista.remove()
 
             # dibujar pie completo (no rosquilla)
             wedges, texts, autotexts = ax.pie(
@@ -392,16 +445,13 @@ class DashboardWidget(QWidget):
                 startangle=90,
                 textprops={'fontsize': 9, 'weight': 'bold'}
             )
+            self._artistas_tarta = [*wedges, *texts, *autotexts]
 
             # mejor contraste: autotexts en blanco cuando es necesario
             for at in autotexts:
                 at.set_color('white')
                 at.set_fontsize(8)
 
-            ax.set_aspect('equal')
-            ax.axis('off')  # quitamos ejes para que ocupe todo el espacio
-
-            self.fig_top_gastos.tight_layout()
             try:
                 self.canvas_top_gastos.draw_idle()
             except Exception as e:
@@ -437,11 +487,7 @@ class DashboardWidget(QWidget):
             print("⚠️ fig_loans/canvas_loans no existen — crea en _build_ui")
             return
 
-        self.fig_loans.set_size_inches(10, 6)  # ancho=10, alto=6 pulgadas
-        self.fig_loans.clear()
-        ax = self.fig_loans.add_subplot(111)
-
-        import numpy as np
+        ax = self.ax_loans
         y = np.arange(len(nombres))
         height = 0.6
 
@@ -450,50 +496,59 @@ class DashboardWidget(QWidget):
         porcentajes_amortizado = [(am / total * 100) if total > 0 else 0 for am, total in zip(amortizado, totales)]
         porcentajes_pendiente = [(pend / total * 100) if total > 0 else 0 for pend, total in zip(pendiente, totales)]
 
-        # Dibujar barras proporcionales (de 0 a 100%)
-        ax.barh(y, porcentajes_amortizado, height=height, color="#27AE60", label="Amortizado", edgecolor='white', linewidth=1)
-        ax.barh(y, porcentajes_pendiente, height=height, left=porcentajes_amortizado, color="#C0392B", label="Pendiente", edgecolor='white', linewidth=1)
+        # Barras proporcionales (de 0 a 100%): se reutilizan si el número de préstamos no cambia
+        barras = getattr(self, "_barras_loans", None)
+        cambia_forma = barras is None or len(barras[0]) != len(nombres)
+        if cambia_forma:
+            if barras is not None:
+                for contenedor in barras:
+                    contenedor.remove()
+            barras = (
+                ax.barh(y, porcentajes_amortizado, height=height, color="#27AE60", label="Amortizado", edgecolor='white', linewidth=1),
+                ax.barh(y, porcentajes_pendiente, height=height, left=porcentajes_amortizado, color="#C0392B", label="Pendiente", edgecolor='white', linewidth=1),
+            )
+            self._barras_loans = barras
+            ax.set_yticks(y)
+            ax.set_ylim(len(nombres) - 0.5, -0.5)  # primer préstamo arriba (equivale a invert_yaxis)
+            ax.legend(loc="lower right")
+        else:
+            for rect_am, rect_pend, p_am, p_pend in zip(barras[0], barras[1], porcentajes_amortizado, porcentajes_pendiente):
+                rect_am.set_width(p_am)
+                rect_pend.set_x(p_am)
+                rect_pend.set_width(p_pend)
+        if cambia_forma or [t.get_text() for t in ax.get_yticklabels()] != nombres:
+            ax.set_yticklabels(nombres, fontsize=9)
+            cambia_forma = True
 
         # Anotaciones: valores absolutos dentro de las barras
+        etiquetas = []
         for i, (am, pend, p_am, p_pend, total) in enumerate(zip(amortizado, pendiente, porcentajes_amortizado, porcentajes_pendiente, totales)):
             # Valor de amortizado dentro de su barra (verde) - solo si es visible (>5%)
             if p_am > 5:
-                ax.annotate(f"{am:,.0f}€\n({p_am:.1f}%)", xy=(p_am/2, i), xytext=(0, 0),
-                            textcoords="offset points", ha="center", va="center", 
-                            color="white", fontsize=8, weight="bold")
+                etiquetas.append(((p_am/2, i), f"{am:,.0f}€\n({p_am:.1f}%)",
+                                  {"va": "center", "color": "white", "fontweight": "bold"}))
             elif am > 0:
                 # Si es muy pequeño, ponerlo fuera a la izquierda
-                ax.annotate(f"{am:,.0f}€", xy=(0, i), xytext=(-5, 0),
-                            textcoords="offset points", ha="right", va="center", 
-                            color="#27AE60", fontsize=7, weight="bold")
-            
+                etiquetas.append(((0, i), f"{am:,.0f}€",
+                                  {"xytext": (-5, 0), "ha": "right", "va": "center", "color": "#27AE60", "fontsize": 7, "fontweight": "bold"}))
+
             # Valor de pendiente dentro de su barra (roja) - solo si es visible (>5%)
             if p_pend > 5:
-                ax.annotate(f"{pend:,.0f}€\n({p_pend:.1f}%)", xy=(p_am + p_pend/2, i), xytext=(0, 0),
-                            textcoords="offset points", ha="center", va="center", 
-                            color="white", fontsize=8, weight="bold")
+                etiquetas.append(((p_am + p_pend/2, i), f"{pend:,.0f}€\n({p_pend:.1f}%)",
+                                  {"va": "center", "color": "white", "fontweight": "bold"}))
             elif pend > 0:
                 # Si es muy pequeño, ponerlo fuera a la derecha
-                ax.annotate(f"{pend:,.0f}€", xy=(100, i), xytext=(5, 0),
-                            textcoords="offset points", ha="left", va="center", 
-                            color="#C0392B", fontsize=7, weight="bold")
-            
+                etiquetas.append(((100, i), f"{pend:,.0f}€",
+                                  {"xytext": (5, 0), "ha": "left", "va": "center", "color": "#C0392B", "fontsize": 7, "fontweight": "bold"}))
+
             # Total al final de cada barra (fuera)
-            ax.annotate(f"Total: {total:,.0f}€", xy=(100, i), xytext=(8, 0),
-                       textcoords="offset points", ha="left", va="center", 
-                       color="black", fontsize=8,
-                       bbox=dict(boxstyle='round,pad=0.3', facecolor='lightyellow', alpha=0.8, edgecolor='gray'))
-
-        ax.set_yticks(y)
-        ax.set_yticklabels(nombres, fontsize=9)
-        ax.invert_yaxis()
-        ax.set_xlabel("Porcentaje de amortización (%)", fontsize=10)
-        ax.set_xlim(0, 115)  # Dar espacio para las etiquetas del total
-        ax.set_title("Préstamos — Proporción Amortizado vs Pendiente", fontsize=11, weight='bold')
-        ax.legend(loc="lower right")
-        ax.grid(axis="x", linestyle="--", alpha=0.4)
-
-        self.fig_loans.tight_layout()
+            etiquetas.append(((100, i), f"Total: {total:,.0f}€",
+                              {"xytext": (8, 0), "ha": "left", "va": "center",
+                               "bbox": dict(boxstyle='round,pad=0.3', facecolor='lightyellow', alpha=0.8, edgecolor='gray')}))
+        self._etiquetas_loans.colocar(etiquetas)
+
+        if cambia_forma:
+            self.fig_loans.tight_layout()
         try:
             self.canvas_loans.draw_idle()
         except Exception as e:
@@ -517,12 +572,7 @@ class DashboardWidget(QWidget):
 
             if not purchases:
                 # Mostrar mensaje si no hay datos
-                self.fig_invest.clear()
-                ax = self.fig_invest.add_subplot(111)
-                ax.text(0.5, 0.5, 'Sin datos de inversiones', 
-                       ha='center', va='center', fontsize=14, color='gray')
-                ax.axis('off')
-                self.canvas_invest.draw_idle()
+                self._mostrar_mensaje_invest('Sin datos de inversiones')
                 return
 
             # Preparar listas
@@ -550,54 +600,45 @@ class DashboardWidget(QWidget):
 
             if not fechas:
                 # Mostrar mensaje si no hay datos válidos
-                self.fig_invest.clear()
-                ax = self.fig_invest.add_subplot(111)
-                ax.text(0.5, 0.5, 'Sin datos válidos', 
-                       ha='center', va='center', fontsize=14, color='gray')
-                ax.axis('off')
-                self.canvas_invest.draw_idle()
+                self._mostrar_mensaje_invest('Sin datos válidos')
                 return
 
-            # Convertir a DataFrame
+            # Convertir a DataFrame (pandas solo se carga al pintar inversiones)
+            import pandas as pd
             df = pd.DataFrame({
                 "fecha": fechas,
                 "coste": coste_total,
                 "valor_actual": valor_actual_total
             }).sort_values("fecha")
 
-            # Limpiar y crear figura
-            self.fig_invest.clear()
-            ax = self.fig_invest.add_subplot(111)
-            
-            ax.plot(df["fecha"], df["coste"], label="Coste Acumulado", 
-                   linewidth=2, color="tab:blue", marker="o")
-            ax.plot(df["fecha"], df["valor_actual"], label="Valor Actual", 
-                   linewidth=2, color="tab:green", marker="o")
+            # Reutilizar las dos líneas creadas en _crear_ejes
+            ax = self.ax_invest
+            self._texto_sin_invest.set_visible(False)
+            ax.axis('on')
+            self._linea_coste.set_data(df["fecha"], df["coste"])
+            self._linea_valor.set_data(df["fecha"], df["valor_actual"])
+            self._linea_coste.set_visible(True)
+            self._linea_valor.set_visible(True)
+            if ax.get_legend() is None:
+                ax.legend()
 
             # Etiquetas con los valores
-            # Coste acumulado: debajo del punto
-            for x, y in zip(df["fecha"], df["coste"]):
-                ax.annotate(f"{y:.0f}€", xy=(x, y), xytext=(0, -12),
-                           textcoords="offset points", ha="center", fontsize=8, 
-                           color="tab:blue", weight="bold")
-
-            # Valor actual: ARRIBA del punto para evitar superposición
-            for x, y in zip(df["fecha"], df["valor_actual"]):
-                ax.annotate(f"{y:.0f}€", xy=(x, y), xytext=(0, 10),
-                           textcoords="offset points", ha="center", fontsize=8, 
-                           color="tab:green", weight="bold")
+            # Coste acumulado: debajo del punto; valor actual: ARRIBA para evitar superposición
+            etiquetas = [((x, y), f"{y:.0f}€", {"xytext": (0, -12), "color": "tab:blue", "fontweight": "bold"})
+                         for x, y in zip(df["fecha"], df["coste"])]
+            etiquetas += [((x, y), f"{y:.0f}€", {"xytext": (0, 10), "color": "tab:green", "fontweight": "bold"})
+                          for x, y in zip(df["fecha"], df["valor_actual"])]
+            self._etiquetas_invest.colocar(etiquetas)
 
             # Formato de fecha usando configuración
             ax.xaxis.set_major_formatter(mdates.DateFormatter(get_matplotlib_date_format()))
             self.fig_invest.autofmt_xdate(rotation=30)
 
-            ax.set_title("Evolución de Inversiones")
-            ax.set_xlabel("Fecha")
-            ax.set_ylabel("Valor (€)")
-            ax.legend()
-            ax.grid(True, linestyle="--", alpha=0.5)
-
-            self.fig_invest.tight_layout()
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+            if not self._invest_maquetado:
+                self.fig_invest.tight_layout()
+                self._invest_maquetado = True
             self.canvas_invest.draw_idle()
             
         except Exception as e:
@@ -605,6 +646,19 @@ class DashboardWidget(QWidget):
             import traceback
             traceback.print_exc()
 
+    def _mostrar_mensaje_invest(self, mensaje):
+        """Oculta las líneas de inversiones y muestra un aviso centrado en su lugar."""
+        self._linea_coste.set_visible(False)
+        self._linea_valor.set_visible(False)
+        self._etiquetas_invest.ocultar()
+        leyenda = self.ax_invest.get_legend()
+        if leyenda is not None:
+            leyenda.remove()
+        self.ax_invest.axis('off')
+        self._texto_sin_invest.set_text(mensaje)
+        self._texto_sin_invest.set_visible(True)
+        self.canvas_invest.draw_idle()
+
     # -------------------------
     # SCORE FINANCIERO
     # -------------------------
@@ -617,12 +671,10 @@ class DashboardWidget(QWidget):
             total_cuentas = 0.0
             from sqlalchemy import select
             cuentas = session.scalars(select(Account.id)).all()
-            for cuenta_id in cuentas:
-                try:
-                    _, saldo_final = calcular_detalle_cuenta(session, cuenta_id, hoy)
-                    total_cuentas += saldo_final
-                except Exception as e_saldo:
-                    print(f"⚠️ Error calculando saldo cuenta {cuenta_id}: {e_saldo}")
+            try:
+                total_cuentas = sum(calcular_saldos_todas_cuentas(session, hoy).values())
+            except Exception as e_saldo:
+                print(f"⚠️ Error calculando saldos de las cuentas: {e_saldo}")
 
             # 2️⃣ Total inversiones (valor actual)
             total_inversiones = float(
@@ -725,13 +777,13 @@ class DashboardWidget(QWidget):
         if Mortgage is not None and MortgagePeriod is not None:
             loans = session.query(Mortgage).all()
             for m in loans:
-                inicial = Decimal(str(getattr(m, "capital_inicial", 0) or 0))
-                paid = Decimal(str(
+                # capital_inicial es Float: a céntimos para no arrastrar deriva sub-céntimo
+                inicial = a_centimos(getattr(m, "capital_inicial", 0))
+                paid = a_centimos(
                     session.query(func.coalesce(func.sum(MortgagePeriod.amortizacion_total), 0))
-                    .filter(MortgagePeriod.mortgage_id == m.id).scalar() or 0
-                ))
-                pending = max(Decimal("0"), inicial - paid)
-                total_debt += pending
+                    .filter(MortgagePeriod.mortgage_id == m.id).scalar()
+                )
+                total_debt += a_decimal(max(0, inicial - paid))
 
         # monthly avg income: últimos 6 meses
         today = date.today()
@@ -780,8 +832,9 @@ class DashboardWidget(QWidget):
 # Función util (fuera de la clase)
 # -------------------------
 def _sum_ingresos_gastos_directo(session, cuenta_id, fecha_inicio, fecha_fin):
-    ingresos = 0.0
-    gastos = 0.0
+    # Acumuladores en céntimos (enteros): cada importe se convierte una sola vez al leerlo
+    ingresos = 0
+    gastos = 0
     n_eventos = 0
 
     # Transacciones puntuales (excluyendo transferencias)
@@ -795,7 +848,7 @@ def _sum_ingresos_gastos_directo(session, cuenta_id, fecha_inicio, fecha_fin):
             .where(Transaction.es_transferencia == 0)  # Excluir transferencias
         ).scalars().all()
         for t in trans:
-            m = float(t or 0.0)
+            m = a_centimos(t)
             if m > 0:
                 ingresos += m
             else:
@@ -814,7 +867,7 @@ def _sum_ingresos_gastos_directo(session, cuenta_id, fecha_inicio, fecha_fin):
             .where(Adjustment.fecha <= fecha_fin)
         ).scalars().all()
         for a in adjs:
-            m = float(a or 0.0)
+            m = a_centimos(a)
             if m > 0:
                 ingresos += m
             else:
@@ -823,7 +876,7 @@ def _sum_ingresos_gastos_directo(session, cuenta_id, fecha_inicio, fecha_fin):
     except Exception as e:
         print("DEBUG ajustes error:", e)
 
-    # Gastos/ingresos fijos: generar ocurrencias en rango
+    # Gastos/ingresos fijos: contar ocurrencias en rango (sin recorrerlas)
     try:
         from sqlalchemy import select
         fijos = session.execute(
@@ -834,32 +887,21 @@ def _sum_ingresos_gastos_directo(session, cuenta_id, fecha_inicio, fecha_fin):
         ).scalars().all()
 
         for f in fijos:
-            ocurrencia = max(f.fecha_inicio, fecha_inicio)
+            inicio = max(f.fecha_inicio, fecha_inicio)
             fin_fijo = f.fecha_fin if f.fecha_fin and f.fecha_fin < fecha_fin else fecha_fin
-            while ocurrencia <= fin_fijo:
-                if fecha_inicio <= ocurrencia <= fecha_fin:
-                    m = float(f.monto or 0.0)
-                    if m > 0:
-                        ingresos += m
-                    else:
-                        gastos += abs(m)
-                    n_eventos += 1
-                if f.frecuencia == "semanal":
-                    ocurrencia += timedelta(weeks=1)
-                elif f.frecuencia == "mensual":
-                    ocurrencia += relativedelta(months=1)
-                elif f.frecuencia == "trimestral":
-                    ocurrencia += relativedelta(months=3)
-                elif f.frecuencia == "semestral":
-                    ocurrencia += relativedelta(months=6)
-                elif f.frecuencia == "anual":
-                    ocurrencia += relativedelta(years=1)
-                else:
-                    break
+            n = contar_ocurrencias(f.frecuencia, inicio, inicio, fin_fijo)
+            if not n:
+                continue
+            m = a_centimos(f.monto)
+            if m > 0:
+                ingresos += m * n
+            else:
+                gastos += abs(m) * n
+            n_eventos += n
     except Exception as e:
         print("DEBUG fijos error:", e)
 
-    return round(ingresos, 2), round(gastos, 2), n_eventos
+    return a_euros(ingresos), a_euros(gastos), n_eventos
 
 def normalizar(valor, ideal, maximo):
     # Escala de 0–100, sin superar 100
@@ -0,0 +1,1646 @@
+# ui/main_window.py
+"""
+Ventana principal de la aplicación (MainWindow) y sus diálogos: configuración de la
+BD, consolidación, auditoría, selección de cuenta e importación por carpeta.
+
+main.py solo la importa dentro de main(), detrás de freeze_support(): los procesos
+spawn de la importación por carpeta y de Monte Carlo vuelven a ejecutar main.py como
+__mp_main__ y no deben cargar PySide6, numpy ni los modelos. La BD la inicializa
+main() (db.init_app()) antes de crear la ventana.
+"""
+# Tiempos de arranque (FINANZAS_STARTUP_REPORT=1 o --startup-report)
+from utils.startup_timing import fase, primer_import, imprimir_informe
+
+import sys
+import csv
+from datetime import date, timedelta, datetime
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+
+with fase("import PySide6"):
+    from PySide6.QtWidgets import (
+        QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+        QCalendarWidget, QSizePolicy, QScrollArea, QFrame, QDialog, QTableWidget,
+        QTableWidgetItem, QFileDialog, QMessageBox, QComboBox, QCheckBox, QLineEdit, QProgressDialog
+    )
+    from PySide6.QtCore import Qt, QThreadPool, QTimer
+    from PySide6.QtGui import QColor
+import math
+# Matplotlib (backend Qt), las ventanas de admin/dashboard/simulación, pandas y
+# yfinance NO se importan aquí: se cargan en su primer uso para que la ventana
+# principal se pinte antes (ver _asegurar_grafico y open_admin/open_dashboard...)
+
+with fase("import numpy"):
+    import numpy as np
+
+with fase("import BD y modelos"):
+    from database import db
+    from sqlalchemy import func
+    from models.account import Account
+    from models.adjustment import Adjustment
+    from models.transaction import Transaction
+    from models.fixed_expense import FixedExpense
+
+with fase("import ui.workers"):
+    from ui.workers import SaldosCuentasWorker, DBWorker, ConexionWorker, ImportWorker, ImportCarpetaWorker
+    from utils.importer import ficheros_de_carpeta, leer_mapeo, asignar_cuentas
+    from ui.table_models import Columna, ModeloColumnas, crear_vista_tabla, poner_modelo, filtrar, DERECHA
+
+import os
+from dotenv import load_dotenv, set_key, dotenv_values
+
+with fase("import reconciler y ledger"):
+    # Importar la versión de reconciler adaptada al entorno de escritorio
+    # (la que definimos antes: calcular_balance_cuenta(session, cuenta_id, fecha_objetivo))
+    from utils.reconciler import (
+        calcular_balance_cuenta, calcular_detalle_cuenta, calcular_balances_en_fechas, auditar_rango
+    )
+
+    from utils.ledger import calcular_series_saldos, TIPO_FIJO, TIPO_AJUSTE, TIPO_TRANSACCION
+
+from decimal import InvalidOperation
+import io
+import traceback
+
+# Función helper para obtener formato de fecha desde configuración
+def get_date_format():
+    """Retorna el formato de fecha configurado en .env o 'dd/MM/yyyy' por defecto"""
+    formato = os.environ.get("DATE_FORMAT", "dd/MM/yyyy").strip()
+    if not formato:
+        formato = "dd/MM/yyyy"
+    return formato
+
+def date_to_string(fecha_obj, formato=None):
+    """Convierte un objeto date a string usando el formato configurado"""
+    if formato is None:
+        formato = get_date_format()
+    
+    if not isinstance(fecha_obj, (date, datetime)):
+        return str(fecha_obj)
+    
+    # Convertir formato Qt/Python a formato strftime
+    # dd/MM/yyyy -> %d/%m/%Y
+    # MM/dd/yyyy -> %m/%d/%Y
+    # yyyy-MM-dd -> %Y-%m-%d
+    formato_py = formato.replace('dd', '%d').replace('MM', '%m').replace('yyyy', '%Y').replace('yy', '%y')
+    
+    if hasattr(fecha_obj, 'date'):
+        fecha_obj = fecha_obj.date()
+    
+    return fecha_obj.strftime(formato_py)
+
+def get_matplotlib_date_format():
+    """Convierte el formato de fecha configurado a formato matplotlib strftime"""
+    formato = get_date_format()
+    # Convertir formato Qt/Python a formato strftime para matplotlib
+    # dd/MM/yyyy -> %d/%m/%Y
+    # MM/dd/yyyy -> %m/%d/%Y
+    # yyyy-MM-dd -> %Y-%m-%d
+    formato_py = formato.replace('dd', '%d').replace('MM', '%m').replace('yyyy', '%Y').replace('yy', '%y')
+    return formato_py
+
+# --------------------------
+# Helper: calcular serie de saldos (igual que tu dashboard web)
+# --------------------------
+# Horizontes seleccionables del gráfico: clave -> (texto, cuánto hacia atrás; None = todo el histórico)
+HORIZONTES = {
+    "3m": ("3 meses", relativedelta(months=3)),
+    "1a": ("1 año", relativedelta(years=1)),
+    "5a": ("5 años", relativedelta(years=5)),
+    "todo": ("Todo", None),
+}
+HORIZONTE_POR_DEFECTO = "3m"
+# La proyección sigue siendo de 4 semanas hacia delante
+DIAS_PROYECCION = 28
+
+def primera_fecha_movimientos(session, cuenta_ids):
+    """Fecha del primer movimiento (transacción, ajuste o inicio de gasto fijo) de esas cuentas, o None."""
+    primeras = [
+        session.query(func.min(Transaction.fecha)).filter(Transaction.cuenta_id.in_(cuenta_ids)).scalar(),
+        session.query(func.min(Adjustment.fecha)).filter(Adjustment.cuenta_id.in_(cuenta_ids)).scalar(),
+        session.query(func.min(FixedExpense.fecha_inicio)).filter(FixedExpense.cuenta_id.in_(cuenta_ids)).scalar(),
+    ]
+    primeras = [f for f in primeras if f is not None]
+    return min(primeras) if primeras else None
+
+def generar_fechas_rango(fecha_obj: date, horizonte: str = HORIZONTE_POR_DEFECTO, primera_fecha: date | None = None):
+    """
+    Fechas diarias del gráfico: desde el inicio del horizonte hasta DIAS_PROYECCION días
+    después de fecha_obj. Con horizonte "todo" se empieza en primera_fecha (primer movimiento).
+    """
+    atras = HORIZONTES.get(horizonte, HORIZONTES[HORIZONTE_POR_DEFECTO])[1]
+    if atras is not None:
+        desde = fecha_obj - atras
+    else:
+        desde = min(primera_fecha, fecha_obj) if primera_fecha else fecha_obj - relativedelta(months=3)
+    dias = (fecha_obj - desde).days + DIAS_PROYECCION
+    return [desde + timedelta(days=i) for i in range(dias + 1)]
+
+# Función para obtener la serie de saldos de una cuenta usando el reconciler
+def obtener_serie_saldos(session, cuenta, fecha_obj: date, horizonte: str = HORIZONTE_POR_DEFECTO):
+    primera = primera_fecha_movimientos(session, [cuenta.id]) if HORIZONTES.get(horizonte, (None, 0))[1] is None else None
+    fechas = generar_fechas_rango(fecha_obj, horizonte, primera)
+    # una sola lectura del histórico para todas las fechas (antes: un calcular_detalle_cuenta por fecha)
+    saldos = calcular_balances_en_fechas(session, cuenta.id, fechas)
+    return fechas, saldos
+
+# Hilos como máximo para calcular en paralelo las series del gráfico de todas las cuentas
+MAX_HILOS_SERIES = 4
+
+def calcular_serie_bloque(session, peticion_id: int, bloque: int, cuenta_ids, fechas):
+    """
+    Trabajo de un worker del gráfico "Todas las cuentas": series de un bloque de cuentas
+    con la sesión propia del worker. Si falla, DBWorker emite signals.error y la petición
+    se descarta (MainWindow._on_serie_bloque_error).
+    """
+    return peticion_id, bloque, calcular_series_saldos(session, cuenta_ids, fechas)
+
+# --------------------------
+# Función de auditoría (detalle acumulado)
+# Saldo de apertura + ajustes, transacciones y fijos del rango con el saldo acumulado
+# --------------------------
+def calcular_detalle_acumulado(session, cuenta_id: int, fecha_inicio: date, fecha_fin: date):
+    """
+    Devuelve {'saldo_inicial', 'ledger', 'saldo_final'}: 'ledger' es el tramo del Ledger
+    (columnas NumPy) desde fecha_inicio hasta fecha_fin (inclusive) con el saldo acumulado.
+    """
+    # Saldo de apertura por checkpoint + O(reglas) y solo los movimientos del rango
+    # (reconciler.auditar_rango); en el mismo día: fijo, luego puntual, luego ajuste.
+    # Se devuelve el tramo en columnas: AuditDialog lo lee fila a fila según
+    # se ve, sin construir un dict por movimiento
+    return auditar_rango(
+        session, cuenta_id, fecha_inicio, fecha_fin,
+        orden_tipos={TIPO_FIJO: 0, TIPO_TRANSACCION: 1, TIPO_AJUSTE: 2},
+    )
+
+
+class ConfigDialog(QDialog):
+    """
+    Diálogo pequeño para editar DATABASE_URL, formato de fecha y probar conexión.
+    Devuelve aceptado() si la nueva configuración se aplicó correctamente.
+    """
+    def __init__(self, parent=None, current_url: str | None = None):
+        super().__init__(parent)
+        self.setWindowTitle("Configuración")
+        self.resize(800, 600)
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.input_dburl = QLineEdit(current_url or os.environ.get("DATABASE_URL", ""))
+        form.addRow("DATABASE_URL:", self.input_dburl)
+        
+        # Campo para formato de fecha
+        self.combo_date_format = QComboBox()
+        self.combo_date_format.addItem("dd/MM/yyyy", "dd/MM/yyyy")
+        self.combo_date_format.addItem("MM/dd/yyyy", "MM/dd/yyyy")
+        self.combo_date_format.addItem("yyyy-MM-dd", "yyyy-MM-dd")
+        self.combo_date_format.addItem("dd-MM-yyyy", "dd-MM-yyyy")
+        self.combo_date_format.addItem("MM-dd-yyyy", "MM-dd-yyyy")
+        
+        # Seleccionar formato actual
+        current_format = os.environ.get("DATE_FORMAT", "dd/MM/yyyy")
+        index = self.combo_date_format.findData(current_format)
+        if index >= 0:
+            self.combo_date_format.setCurrentIndex(index)
+        
+        form.addRow("Formato de fecha:", self.combo_date_format)
+        
+        # Label de ejemplo
+        ejemplo_fecha = date.today()
+        self.lbl_ejemplo = QLabel()
+        self._update_ejemplo()
+        form.addRow("Ejemplo:", self.lbl_ejemplo)
+        self.combo_date_format.currentIndexChanged.connect(self._update_ejemplo)
+
+        self.lbl_status = QLabel("")  # para mensajes de estado
+        layout.addLayout(form)
+        layout.addWidget(self.lbl_status)
+
+        botones = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        botones.accepted.connect(self.on_save)
+        botones.rejected.connect(self.reject)
+        layout.addWidget(botones)
+
+        self._saved = False
+    
+    def _update_ejemplo(self):
+        """Actualiza el label de ejemplo con el formato seleccionado"""
+        formato = self.combo_date_format.currentData()
+        ejemplo_fecha = date.today()
+        try:
+            ejemplo_str = date_to_string(ejemplo_fecha, formato)
+            self.lbl_ejemplo.setText(f"Hoy: {ejemplo_str}")
+        except:
+            self.lbl_ejemplo.setText("(formato inválido)")
+
+    def on_save(self):
+        new_url = self.input_dburl.text().strip()
+        
+        # Verificar si solo se está cambiando el formato de fecha
+        current_url = os.environ.get("DATABASE_URL", "")
+        solo_formato = (not new_url or new_url == current_url)
+        
+        if not new_url and not current_url:
+            self.lbl_status.setText("Introduce una DATABASE_URL válida.")
+            return
+        
+        # Si hay nueva URL, probar conexión
+        if new_url and new_url != current_url:
+            # intentamos inicializar engine localmente para probar la conexión
+            from database import db as _db
+            try:
+                _db.init_app(new_url)
+                ok, _err = _db.check_connection(timeout_seconds=5)
+            except Exception as e:
+                ok = False
+                self.lbl_status.setText(f"Error probando conexión: {e}")
+
+            if not ok:
+                self.lbl_status.setText("No se pudo conectar con esa URL. Revisa credenciales/host.")
+                return
+        
+        # si ok -> persistir en .env
+        try:
+            # escribir en .env (crea si no existe)
+            env_path = os.path.join(os.getcwd(), ".env")
+            load_dotenv(env_path)
+            
+            # Guardar DATABASE_URL solo si cambió
+            if new_url and new_url != current_url:
+                set_key(env_path, "DATABASE_URL", new_url)
+                # opcional: desactivar echo
+                set_key(env_path, "DB_ECHO", os.environ.get("DB_ECHO", "False"))
+            
+            # Siempre guardar formato de fecha
+            date_format = self.combo_date_format.currentData()
+            set_key(env_path, "DATE_FORMAT", date_format)
+            os.environ["DATE_FORMAT"] = date_format  # actualizar en memoria también
+            
+        except Exception as e:
+            # no crítico, avisamos pero aceptamos
+            self.lbl_status.setText(f"Configuración guardada pero hubo un error al escribir .env: {e}")
+            self._saved = True
+            self.accept()
+            return
+
+        self._saved = True
+        self.accept()
+
+    def saved(self):
+        return self._saved
+# --------------------------
+# UI: ventana principal
+# --------------------------
+class MainWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Finanzas Desktop")
+        self.resize(1280, 1024)
+
+        self.selected_account_id = None
+
+        main_layout = QVBoxLayout(self)
+        main_layout.setContentsMargins(10, 10, 10, 10)
+        main_layout.setSpacing(8)
+
+        # Header spacer
+        header = QWidget()
+        header.setFixedHeight(6)
+        main_layout.addWidget(header)
+
+        # --- Zona central: calendario y panel derecho (botones verticales centrados) ---
+        center_widget = QWidget()
+        center_widget.setFixedHeight(260)
+        center_layout = QHBoxLayout(center_widget)
+        center_layout.setContentsMargins(8, 8, 8, 8)
+        center_layout.setSpacing(12)
+
+        # Calendario (centrado)
+        self.calendar = QCalendarWidget()
+        self.calendar.setSelectedDate(date.today())
+        self.calendar.setGridVisible(True)
+        self.calendar.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        center_layout.addWidget(self.calendar, stretch=1)
+
+        # Panel derecho con botones verticales, centrado verticalmente
+        right_widget = QWidget()
+        right_widget.setFixedWidth(210)
+        right_v = QVBoxLayout(right_widget)
+        right_v.setContentsMargins(0, 0, 0, 0)
+        right_v.setSpacing(8)
+        right_v.setAlignment(Qt.AlignVCenter)
+
+        # Botones (7) + Auditoría + Simulación + Simular cuenta
+        self.btn_config = QPushButton("⚙️ Config")
+        self.btn_admin = QPushButton("✎ Admin")
+        self.btn_cons = QPushButton("📊 Consolidación")
+        self.btn_dash = QPushButton("🖥 Dashboard")
+        self.btn_import = QPushButton("🔁 Importar")
+        self.btn_import_carpeta = QPushButton("📂 Importar carpeta")  # varios extractos, cada uno en su cuenta
+        self.btn_audit = QPushButton("🔍 Auditoría")  # abre diálogo de auditoría
+        self.btn_simulation = QPushButton("🎯 Simulación")  # abre ventana de simulación
+        self.btn_account_simulation = QPushButton("💳 Simular cuenta")  # abre ventana de simulación detallada de cuenta
+
+        for b in (self.btn_config, self.btn_admin, self.btn_cons, self.btn_dash, self.btn_import, self.btn_import_carpeta, self.btn_audit, self.btn_simulation, self.btn_account_simulation):
+            b.setFixedWidth(190)
+            b.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+            right_v.addWidget(b)
+
+        center_layout.addWidget(right_widget, alignment=Qt.AlignVCenter)
+        main_layout.addWidget(center_widget)
+
+        # Conectar auditoría
+        self.btn_audit.clicked.connect(self.on_audit_clicked)
+        self.btn_simulation.clicked.connect(self.on_simulation_clicked)
+        self.btn_account_simulation.clicked.connect(self.on_account_simulation_clicked)
+        self.btn_admin.clicked.connect(self.open_admin)
+        # Conectar con Dashboard
+        self.btn_dash.clicked.connect(self.open_dashboard)
+        #conectar consolidacion
+        self.btn_cons.clicked.connect(self.on_consolidation_clicked)
+        #conectar config
+        self.btn_config.clicked.connect(self.on_config_clicked)
+         #conectar importar
+        self.btn_import.clicked.connect(self.on_import_clicked)
+        self.btn_import_carpeta.clicked.connect(self.on_import_folder_clicked)
+        
+        # Inicializar diccionarios para cuentas ANTES de cargar los botones
+        self.account_widgets = {}  # {cuenta_id: widget}
+        self.account_checkboxes = {}  # {cuenta_id: checkbox}
+        self.account_saldo_labels = {}  # {cuenta_id: QLabel del saldo}
+        self._carga_saldos_id = 0  # id de la última carga de saldos en segundo plano
+        self._sondeo_bd_en_curso = False
+        self._import_worker = None   # importación CSV en curso (ImportWorker o ImportCarpetaWorker)
+        self._import_dialogo = None  # su QProgressDialog
+        # Pool acotado para las series del gráfico "Todas las cuentas"
+        self.series_pool = QThreadPool(self)
+        self.series_pool.setMaxThreadCount(MAX_HILOS_SERIES)
+        self._serie_todas_id = 0
+        self._serie_todas = None
+        self.filter_mode = False
+        
+        # --- Controles de visualización de cuentas ---
+        accounts_controls_layout = QHBoxLayout()
+        accounts_controls_layout.setContentsMargins(12, 4, 12, 4)
+        
+        # Botón de ojo para mostrar/ocultar cuentas inactivas
+        self.btn_toggle_filter = QPushButton("👁 Gestionar Visibilidad")
+        self.btn_toggle_filter.setCheckable(True)
+        self.btn_toggle_filter.setChecked(False)
+        self.btn_toggle_filter.clicked.connect(self.toggle_account_filter)
+        accounts_controls_layout.addWidget(self.btn_toggle_filter)
+        
+        # Botón mostrar todas las cuentas en un gráfico
+        self.btn_show_all = QPushButton("📊 Mostrar Todas las Cuentas")
+        self.btn_show_all.clicked.connect(self.show_all_accounts_graph)
+        accounts_controls_layout.addWidget(self.btn_show_all)
+
+        # Horizonte del gráfico (resolución diaria)
+        self.horizonte = HORIZONTE_POR_DEFECTO
+        self._grafico_todas = False
+        accounts_controls_layout.addWidget(QLabel("Horizonte:"))
+        self.combo_horizonte = QComboBox()
+        for clave, (texto, _) in HORIZONTES.items():
+            self.combo_horizonte.addItem(texto, clave)
+        self.combo_horizonte.setCurrentIndex(self.combo_horizonte.findData(self.horizonte))
+        self.combo_horizonte.currentIndexChanged.connect(self.on_horizonte_changed)
+        accounts_controls_layout.addWidget(self.combo_horizonte)
+        
+        accounts_controls_layout.addStretch()
+        main_layout.addLayout(accounts_controls_layout)
+        
+        # --- Línea de cuentas (centradas) ---
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        container = QWidget()
+        self.accounts_layout = QHBoxLayout(container)
+        self.accounts_layout.setSpacing(12)
+        self.accounts_layout.setContentsMargins(12, 8, 12, 8)
+        self.accounts_layout.setAlignment(Qt.AlignHCenter)
+        self.load_accounts_buttons(self.accounts_layout)
+        scroll.setWidget(container)
+        scroll.setFixedHeight(120)
+        main_layout.addWidget(scroll)
+
+        # --- Gráfico ---
+        # Hueco para el canvas: Matplotlib se importa y el canvas se crea después de
+        # pintar la ventana (arranque_diferido) o en el primer dibujo si llega antes
+        self.grafico = None
+        self.grafico_container = QWidget()
+        self.grafico_container.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.grafico_layout = QVBoxLayout(self.grafico_container)
+        self.grafico_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.grafico_container, stretch=1)
+
+        # Botón recalc/refresh para recalcular series (útil si cambian datos)
+        btn_refresh = QPushButton("Recalcular gráfico")
+        btn_refresh.clicked.connect(self.recalcular_grafico)
+        main_layout.addWidget(btn_refresh, alignment=Qt.AlignRight)
+
+    def load_accounts_buttons(self, layout):
+        # limpia layout
+        while layout.count():
+            it = layout.takeAt(0)
+            w = it.widget()
+            if w:
+                w.deleteLater()
+        
+        # Limpiar diccionarios
+        self.account_widgets.clear()
+        self.account_checkboxes.clear()
+
+        from database import db as _db
+
+        # Intentamos init sin forzar la conexión
+        try:
+            _db.init_app()
+        except Exception:
+            pass
+
+        # ¿Responde la BD? Se usa el último sondeo si es reciente (TTL); si no, se
+        # sondea en segundo plano con el pool del engine y al terminar se vuelve aquí
+        estado = _db.cached_connection_status()
+        if estado is None:
+            self.db_placeholder_widget = self._tarjeta_aviso_bd(layout, "Comprobando conexión con la base de datos…")
+            self._comprobar_conexion_en_segundo_plano()
+            return
+        connected, _error = estado
+
+        # Si no hay conexión, mostramos placeholder (y guardamos referencia)
+        if not connected:
+            widget = QFrame()
+            widget.setFrameShape(QFrame.StyledPanel)
+            widget.setFixedSize(420, 80)
+            vbox = QVBoxLayout(widget)
+            vbox.setContentsMargins(6, 6, 6, 6)
+            vbox.setSpacing(6)
+
+            lbl = QLabel("Base de datos inaccesible o no configurada.\nPulsa 'Config' para establecer la conexión.")
+            lbl.setWordWrap(True)
+            lbl.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+
+            btn_conf = QPushButton("Abrir Configuración")
+            btn_conf.clicked.connect(self.on_config_clicked if hasattr(self, "on_config_clicked") else lambda: None)
+
+            vbox.addWidget(lbl)
+            vbox.addWidget(btn_conf, alignment=Qt.AlignRight)
+            layout.addWidget(widget)
+
+            # Guarda la referencia para poder eliminarla si la conexión se establece posteriormente
+            self.db_placeholder_widget = widget
+            return
+
+        # Si está conectada, eliminamos placeholder si existía
+        try:
+            if hasattr(self, "db_placeholder_widget") and self.db_placeholder_widget is not None:
+                try:
+                    layout.removeWidget(self.db_placeholder_widget)
+                    self.db_placeholder_widget.deleteLater()
+                except Exception:
+                    pass
+                self.db_placeholder_widget = None
+        except Exception:
+            pass
+
+        # Abrimos UNA sesión y consultamos cuentas
+        session = _db.session()
+        try:
+            # Si NO estamos en modo filtro, mostrar solo las visibles (activas)
+            if not self.filter_mode:
+                cuentas = session.query(Account).filter_by(visible=1).order_by(Account.id).all()
+            else:
+                # En modo filtro, mostrar TODAS las cuentas (incluidas inactivas)
+                cuentas = session.query(Account).order_by(Account.id).all()
+        except Exception as e:
+            print("Error cargando cuentas:", e)
+            # el veredicto cacheado ya no vale: la próxima recarga vuelve a sondear
+            _db.invalidate_connection_status()
+            try:
+                session.close()
+            except Exception:
+                pass
+            widget = QFrame()
+            widget.setFrameShape(QFrame.StyledPanel)
+            widget.setFixedSize(420, 80)
+            vbox = QVBoxLayout(widget)
+            vbox.setContentsMargins(6, 6, 6, 6)
+            lbl = QLabel(f"No se pudo obtener la lista de cuentas ({e}). Pulsa 'Config' para revisar conexión.")
+            lbl.setWordWrap(True)
+            btn_conf = QPushButton("Abrir Configuración")
+            btn_conf.clicked.connect(self.on_config_clicked if hasattr(self, "on_config_clicked") else lambda: None)
+            vbox.addWidget(lbl)
+            vbox.addWidget(btn_conf, alignment=Qt.AlignRight)
+            layout.addWidget(widget)
+            return
+
+        # Las tarjetas se pintan ya con un saldo provisional; los saldos reales se
+        # calculan en segundo plano (ver _cargar_saldos_en_segundo_plano)
+        self.account_saldo_labels.clear()
+
+        for c in cuentas:
+            # Contenedor principal con checkbox y widget de cuenta
+            main_container = QWidget()
+            main_vbox = QVBoxLayout(main_container)
+            main_vbox.setContentsMargins(2, 2, 2, 2)
+            main_vbox.setSpacing(2)
+            
+            # Checkbox para mostrar/ocultar
+            checkbox = QCheckBox()
+            # Cargar estado guardado de visibilidad (default 1=visible)
+            is_visible = getattr(c, "visible", 1)
+            checkbox.setChecked(bool(is_visible))
+            checkbox.stateChanged.connect(lambda state, cuenta_id=c.id: self.on_account_checkbox_changed(cuenta_id, state))
+            checkbox.setVisible(False)  # Oculto por defecto hasta activar filtro
+            self.account_checkboxes[c.id] = checkbox
+            main_vbox.addWidget(checkbox, alignment=Qt.AlignCenter)
+            
+            # Widget de la cuenta
+            widget = QFrame()
+            widget.setFrameShape(QFrame.StyledPanel)
+            widget.setFixedSize(160, 80)
+            vbox = QVBoxLayout(widget)
+            vbox.setContentsMargins(6, 6, 6, 6)
+            vbox.setSpacing(4)
+
+            lbl_nombre = QLabel(f"{c.nombre}")
+            lbl_nombre.setAlignment(Qt.AlignCenter)
+            lbl_nombre.setStyleSheet("font-weight: bold;")
+
+            lbl_saldo = QLabel("… €")
+            lbl_saldo.setAlignment(Qt.AlignCenter)
+            lbl_saldo.setStyleSheet("color: gray;")
+            self.account_saldo_labels[c.id] = lbl_saldo
+
+            vbox.addWidget(lbl_nombre)
+            vbox.addWidget(lbl_saldo)
+
+            # captura cid correctamente para evitar cierre sobre la variable de bucle
+            widget.mousePressEvent = lambda ev, _cid=c.id: self.on_account_click(_cid)
+            
+            main_vbox.addWidget(widget)
+            self.account_widgets[c.id] = main_container
+            layout.addWidget(main_container)
+
+        try:
+            session.close()
+        except Exception:
+            pass
+
+        self._cargar_saldos_en_segundo_plano([c.id for c in cuentas])
+
+    def _tarjeta_aviso_bd(self, layout, texto):
+        """Tarjeta provisional en la fila de cuentas mientras se comprueba la conexión."""
+        widget = QFrame()
+        widget.setFrameShape(QFrame.StyledPanel)
+        widget.setFixedSize(420, 80)
+        vbox = QVBoxLayout(widget)
+        vbox.setContentsMargins(6, 6, 6, 6)
+        lbl = QLabel(texto)
+        lbl.setWordWrap(True)
+        lbl.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+        lbl.setStyleSheet("color: gray;")
+        vbox.addWidget(lbl)
+        layout.addWidget(widget)
+        return widget
+
+    def _comprobar_conexion_en_segundo_plano(self):
+        """Lanza db.probe_connection en el pool; si ya hay un sondeo en curso no lanza otro."""
+        if self._sondeo_bd_en_curso:
+            return
+        self._sondeo_bd_en_curso = True
+        worker = ConexionWorker()
+        worker.signals.resultado.connect(self._on_conexion_comprobada)
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_conexion_comprobada(self, resultado):
+        """Llega el veredicto (ya cacheado en db): se rehace la fila de cuentas con él."""
+        self._sondeo_bd_en_curso = False
+        ok, error = resultado
+        if not ok:
+            print("DEBUG conexión BD:", error)
+        self.load_accounts_buttons(self.accounts_layout)
+
+    def _cargar_saldos_en_segundo_plano(self, cuenta_ids):
+        """Lanza el cálculo de saldos de las tarjetas en el QThreadPool (sesión propia del worker)."""
+        # cada carga tiene un id: los resultados de una carga anterior se descartan
+        self._carga_saldos_id += 1
+        worker = SaldosCuentasWorker(self._carga_saldos_id, cuenta_ids, date.today())
+        worker.signals.saldo_listo.connect(self._on_saldo_cuenta_listo)
+        worker.signals.error.connect(self._on_error_saldos_cuentas)
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_saldo_cuenta_listo(self, carga_id, cuenta_id, saldo):
+        if carga_id != self._carga_saldos_id:
+            return
+        lbl = self.account_saldo_labels.get(cuenta_id)
+        if lbl is not None:
+            lbl.setText(f"{saldo:.2f} €")
+            lbl.setStyleSheet("")
+
+    def _on_error_saldos_cuentas(self, carga_id, mensaje):
+        if carga_id != self._carga_saldos_id:
+            return
+        for lbl in self.account_saldo_labels.values():
+            lbl.setText("-- €")
+            lbl.setToolTip(f"No se pudo calcular el saldo: {mensaje}")
+
+    def _asegurar_grafico(self):
+        """Crea (una sola vez) la figura, el canvas Qt y la capa GraficoSeries del gráfico principal."""
+        if self.grafico is not None:
+            return self.grafico
+        with fase("crear gráfico (matplotlib)"):
+            with primer_import("matplotlib.backends.backend_qtagg"):
+                from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+            with primer_import("matplotlib.figure"):
+                from matplotlib.figure import Figure
+            from ui.charts import GraficoSeries
+            self.figure = Figure(figsize=(8, 4))
+            self.canvas = FigureCanvas(self.figure)
+            self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+            self.grafico_layout.addWidget(self.canvas)
+            # Ejes y líneas se crean una vez; cada refresco solo actualiza datos
+            self.grafico = GraficoSeries(self.figure, self.canvas)
+        return self.grafico
+
+    def arranque_diferido(self):
+        """Lo que no hace falta para el primer pintado: se ejecuta justo después de mostrar la ventana."""
+        self._asegurar_grafico()
+        imprimir_informe()
+
+    def open_admin(self):
+        with primer_import("ui.admin_ui"):
+            from ui.admin_ui import AdminWindow
+        self.admin_window = AdminWindow()
+        self.admin_window.show()
+    def open_dashboard(self):
+        with primer_import("ui.dashboard_widget"):
+            from ui.dashboard_widget import DashboardWidget
+        self.dashboard = DashboardWidget()
+        self.dashboard.show()
+
+    def on_account_click(self, cuenta_id):
+        # Al hacer click en cuenta, actualizamos selección y dibujamos su gráfico
+        self.selected_account_id = cuenta_id
+        self.dibujar_grafico_cuenta(cuenta_id)
+
+    def dibujar_grafico_cuenta(self, cuenta_id):
+        session = db.session()
+        try:
+            cuenta = session.get(Account, cuenta_id)
+            if not cuenta:
+                return
+            fecha_obj = self.calendar.selectedDate().toPython() if hasattr(self.calendar, "selectedDate") else date.today()
+            fechas, saldos = obtener_serie_saldos(session, cuenta, fecha_obj, self.horizonte)
+        finally:
+            session.close()
+
+        # preparar x (fechas) y y (saldos)
+        x = [f for f in fechas]
+        y = [s if s is not None else float('nan') for s in saldos]
+
+        # Con series diarias de años no se anota cada punto: solo el máximo y el mínimo
+        from ui.charts import etiquetas_extremos
+        self._grafico_todas = False
+        self._serie_todas = None  # descarta un "Todas las cuentas" que aún se esté calculando
+        self._asegurar_grafico().actualizar(
+            x, [y], f"Saldo - {cuenta.nombre} ({HORIZONTES[self.horizonte][0]})", get_matplotlib_date_format(),
+            etiquetas=etiquetas_extremos(x, y), fecha_proyeccion=date.today(),
+        )
+
+    def recalcular_grafico(self):
+        # Si hay cuenta seleccionada, recalcular su serie; si no, recalcular primer cuenta
+        session = db.session()
+        try:
+            if self.selected_account_id:
+                target_id = self.selected_account_id
+            else:
+                first = session.query(Account).order_by(Account.id).first()
+                target_id = first.id if first else None
+        finally:
+            session.close()
+
+        if target_id:
+            self.dibujar_grafico_cuenta(target_id)
+        else:
+            QMessageBox.information(self, "Info", "No hay cuentas para graficar.")
+    
+    def on_horizonte_changed(self, _index):
+        """Redibuja la vista actual (una cuenta o todas) con el horizonte elegido."""
+        self.horizonte = self.combo_horizonte.currentData() or HORIZONTE_POR_DEFECTO
+        if self._grafico_todas:
+            self.show_all_accounts_graph()
+        else:
+            self.recalcular_grafico()
+
+    def toggle_account_filter(self):
+        """Activar/desactivar el modo de gestión de visibilidad"""
+        self.filter_mode = self.btn_toggle_filter.isChecked()
+        
+        # Recargar cuentas según el modo
+        # Si activamos filtro: muestra TODAS (incluidas inactivas)
+        # Si desactivamos: muestra solo activas (visible=1)
+        self.load_accounts_buttons(self.accounts_layout)
+        
+        # Mostrar/ocultar checkboxes según el modo
+        for checkbox in self.account_checkboxes.values():
+            checkbox.setVisible(self.filter_mode)
+    
+    def on_account_checkbox_changed(self, cuenta_id, state):
+        """Manejar cambios en los checkboxes de cuentas y guardar estado en BD"""
+        is_checked = (state == Qt.Checked.value)
+        
+        # Guardar estado en base de datos
+        session = db.session()
+        try:
+            cuenta = session.query(Account).filter_by(id=cuenta_id).first()
+            if cuenta:
+                cuenta.visible = 1 if is_checked else 0
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error guardando visibilidad de cuenta {cuenta_id}: {e}")
+        finally:
+            session.close()
+        
+        # Actualizar visibilidad en UI si el modo filtro está activo
+        if self.filter_mode and cuenta_id in self.account_widgets:
+            self.account_widgets[cuenta_id].setVisible(is_checked)
+    
+    def show_all_accounts_graph(self):
+        """Mostrar un gráfico con todas las cuentas activas juntas"""
+        session = db.session()
+        try:
+            # Obtener todas las cuentas
+            cuentas = session.query(Account).order_by(Account.nombre).all()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error al generar el gráfico: {e}")
+            return
+        finally:
+            session.close()
+
+        if not cuentas:
+            QMessageBox.information(self, "Info", "No hay cuentas para graficar.")
+            return
+
+        # Filtrar por cuentas visibles si el modo filtro está activo
+        if self.filter_mode:
+            cuentas = [c for c in cuentas if self.account_checkboxes.get(c.id, None) and
+                      self.account_checkboxes[c.id].isChecked()]
+
+        if not cuentas:
+            QMessageBox.information(self, "Info", "No hay cuentas visibles para graficar.")
+            return
+
+        fecha_obj = self.calendar.selectedDate().toPython() if hasattr(self.calendar, "selectedDate") else date.today()
+        primera = None
+        if HORIZONTES[self.horizonte][1] is None:
+            session = db.session()
+            try:
+                primera = primera_fecha_movimientos(session, [c.id for c in cuentas])
+            finally:
+                session.close()
+        fechas = generar_fechas_rango(fecha_obj, self.horizonte, primera)
+        self._grafico_todas = True
+
+        # Repartir las cuentas en bloques, uno por hilo del pool: cada worker calcula
+        # las series de su bloque con su propia sesión y el resultado se junta aquí
+        self._serie_todas_id += 1
+        n_bloques = min(MAX_HILOS_SERIES, len(cuentas))
+        tam = math.ceil(len(cuentas) / n_bloques)
+        bloques = [cuentas[i:i + tam] for i in range(0, len(cuentas), tam)]
+        self._serie_todas = {
+            "id": self._serie_todas_id,
+            "cuentas": bloques,
+            "fechas": fechas,
+            "matrices": [None] * len(bloques),
+        }
+        for i, bloque in enumerate(bloques):
+            worker = DBWorker(calcular_serie_bloque, self._serie_todas_id, i, [c.id for c in bloque], fechas)
+            worker.signals.resultado.connect(self._on_serie_bloque_lista)
+            worker.signals.error.connect(
+                lambda mensaje, peticion_id=self._serie_todas_id: self._on_serie_bloque_error(peticion_id, mensaje))
+            self.series_pool.start(worker)
+
+    def _on_serie_bloque_lista(self, resultado):
+        """Llega (en el hilo de la UI) la serie de un bloque de cuentas; al completar todos se dibuja."""
+        peticion_id, bloque, matriz = resultado
+        estado = getattr(self, "_serie_todas", None)
+        if not estado or estado["id"] != peticion_id:
+            return  # petición antigua (se ha vuelto a pulsar el botón)
+        estado["matrices"][bloque] = matriz
+        if any(m is None for m in estado["matrices"]):
+            return
+        cuentas = [c for bloque in estado["cuentas"] for c in bloque]
+        matriz = np.vstack(estado["matrices"])
+        self._serie_todas = None
+        self._dibujar_todas_las_cuentas(cuentas, estado["fechas"], matriz)
+
+    def _on_serie_bloque_error(self, peticion_id, mensaje):
+        """Ha fallado un bloque: se descarta la petición entera (los demás bloques se ignoran al llegar)."""
+        estado = getattr(self, "_serie_todas", None)
+        if not estado or estado["id"] != peticion_id:
+            return
+        self._serie_todas = None
+        QMessageBox.warning(self, "Error", f"Error al generar el gráfico: {mensaje}")
+
+    def _dibujar_todas_las_cuentas(self, cuentas, fechas, matriz):
+        try:
+            # Una fila de la matriz (cuentas × fechas) por cuenta; se reutilizan las
+            # líneas ya creadas y solo se reconstruye la leyenda si cambian las cuentas
+            self._asegurar_grafico().actualizar(
+                fechas, list(matriz), "Todas las Cuentas", get_matplotlib_date_format(),
+                nombres=[c.nombre for c in cuentas], fecha_proyeccion=date.today(), markersize=4,
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error al generar el gráfico: {e}")
+
+    # ---------------------------
+    # Auditoría: abre diálogo con detalle acumulado y posibilidad de exportar CSV
+    # ---------------------------
+    def on_audit_clicked(self):
+        if not self.selected_account_id:
+            QMessageBox.information(self, "Auditoría", "Selecciona primero una cuenta (haz click en la casilla de la cuenta).")
+            return
+
+        # Rango: tomamos ±8 semanas por defecto (igual que en web)
+        fecha_central = self.calendar.selectedDate().toPython()
+        fecha_inicio = fecha_central - timedelta(weeks=8)
+        fecha_fin = fecha_central + timedelta(weeks=4)
+
+        session = db.session()
+        try:
+            # llamar a la función que tengas; puede llamarse calcular_detalle_acumulado o calcular_detalle_cuenta
+            # adaptamos la recepción de la respuesta para varios formatos:
+            result = None
+            try:
+                result = calcular_detalle_acumulado(session, self.selected_account_id, fecha_inicio, fecha_fin)
+            except TypeError:
+                # quizá tu función tiene firma (session, cuenta_id, fecha_objetivo) -> en ese caso llamamos con fecha_fin
+                result = calcular_detalle_cuenta(session, self.selected_account_id, fecha_fin)
+
+            # Normalizar resultado a un dict con claves: 'detalle', 'saldo_inicial', 'saldo_final'
+            report = None
+            if isinstance(result, dict):
+                # ya es un dict — comprobamos claves mínimas
+                report = result
+            elif isinstance(result, tuple) and len(result) == 2:
+                # (movimientos, saldo_final) o (movimientos, saldo)
+                movimientos, saldo_final = result
+                # construir report: calcular saldo_inicial a partir de movimientos si está
+                saldo_inicial = None
+                if movimientos and isinstance(movimientos, list):
+                    first = movimientos[0]
+                    saldo_inicial = first.get("saldo") if isinstance(first, dict) else None
+                if saldo_inicial is None:
+                    # fallback: usar saldo inicial de la cuenta
+                    acc = session.get(Account, self.selected_account_id)
+                    from decimal import Decimal
+                    saldo_inicial = float(Decimal(str(getattr(acc, "saldo_inicial", 0))))
+                report = {
+                    "detalle": movimientos,
+                    "saldo_inicial": float(saldo_inicial),
+                    "saldo_final": float(saldo_final)
+                }
+            else:
+                # formato inesperado: intentar convertir iterables
+                try:
+                    movimientos = list(result)
+                    # si al menos hay una estructura intentamos usarla
+                    report = {"detalle": movimientos, "saldo_inicial": 0.0, "saldo_final": 0.0}
+                except Exception as e:
+                    QMessageBox.critical(self, "Error", f"Respuesta inesperada del cálculo: {e}")
+                    return
+
+        except Exception as e:
+            session.rollback()
+            QMessageBox.critical(self, "Error", f"No se pudo calcular la auditoría: {e}")
+            print("DEBUG on_audit error:", e)
+            return
+        finally:
+            session.close()
+
+        dlg = AuditDialog(self, report)
+        dlg.exec()
+    
+    # ---------------------------
+    # Simulación: abre ventana de simulación de saldos
+    # ---------------------------
+    def on_simulation_clicked(self):
+        session = db.session()
+        try:
+            with primer_import("ui.simulation_window"):
+                from ui.simulation_window import SimulationWindow
+            dlg = SimulationWindow(session, parent=self)
+            dlg.exec()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo abrir la ventana de simulación: {e}")
+            print("DEBUG simulation error:", e)
+        finally:
+            session.close()
+    
+    # ---------------------------
+    # Simulación de cuenta: abre ventana de simulación detallada de movimientos de una cuenta
+    # ---------------------------
+    def on_account_simulation_clicked(self):
+        session = db.session()
+        try:
+            with primer_import("ui.account_simulation_window"):
+                from ui.account_simulation_window import AccountSimulationWindow
+            dlg = AccountSimulationWindow(session, parent=self)
+            dlg.exec()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo abrir la ventana de simulación de cuenta: {e}")
+            print("DEBUG account simulation error:", e)
+        finally:
+            session.close()
+    
+    #Definición para la consolidación
+    def on_consolidation_clicked(self):
+        if not self.selected_account_id:
+            QMessageBox.information(self, "Consolidación", "Selecciona primero una cuenta.")
+            return
+
+        # abrir diálogo
+        fecha_def = self.calendar.selectedDate().toPython() if hasattr(self.calendar, "selectedDate") else date.today()
+        dlg = ConsolidationDialog(self, fecha_default=fecha_def, saldo_default=0.0)
+        if dlg.exec() != QDialog.Accepted:
+            return
+
+        vals = dlg.get_values()
+        fecha = vals["fecha"]
+        saldo_obj = vals["saldo_objetivo"]
+        descripcion = vals["descripcion"]
+
+        session = db.session()
+        try:
+            from utils.reconciler import reconciliar_cuenta
+            ajuste = reconciliar_cuenta(session, self.selected_account_id, fecha, saldo_obj, descripcion)
+            session.commit()
+            QMessageBox.information(self, "Consolidación", f"Ajuste creado: {float(ajuste.monto_ajuste):.2f} € en {ajuste.fecha}")
+        except Exception as e:
+            session.rollback()
+            QMessageBox.critical(self, "Error", f"No se pudo crear el ajuste de consolidación: {e}")
+            print("DEBUG: error en reconciliar:", e)
+        finally:
+            session.close()
+
+        # refrescar UI: botón saldo, gráfico y auditoría si quieres
+        try:
+            self.load_accounts_buttons(self.accounts_layout)  # recarga los botones con saldos actualizados
+        except Exception:
+            pass
+        self.recalcular_grafico()
+        # opcional: abrir el diálogo de auditoría en el rango centrado en la fecha de reconciliación
+        # seleccionar cuenta y mostrar auditoría:
+        self.selected_account_id = self.selected_account_id
+        self.calendar.setSelectedDate(QDate(fecha.year, fecha.month, fecha.day))
+        # llamar a auditoría para ver efecto
+        self.on_audit_clicked()
+    def on_config_clicked(self):
+        # Abrir diálogo (tu ConfigDialog puede aceptar args si ya lo tienes así)
+        try:
+            dlg = ConfigDialog(self)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No pude abrir ConfigDialog: {e}")
+            return
+
+        # Si el usuario cancela, salimos
+        if dlg.exec() != QDialog.Accepted:
+            return
+
+        # Primero intentamos guardar usando métodos habituales del diálogo (si existen)
+        new_url = None
+        try:
+            # si el diálogo implementa save(), úsalo (guardará en .env o similar)
+            if hasattr(dlg, "save") and callable(dlg.save):
+                dlg.save()
+            # si implementa saved() (boolean), comprobamos
+            if hasattr(dlg, "saved") and callable(dlg.saved) and not dlg.saved():
+                QMessageBox.warning(self, "Config", "No se guardó la configuración.")
+                return
+            # intenta obtener la URL (método recomendado)
+            if hasattr(dlg, "get_database_url") and callable(dlg.get_database_url):
+                new_url = dlg.get_database_url().strip()
+        except Exception as e:
+            QMessageBox.warning(self, "Config", f"Error guardando configuración: {e}")
+            # intentar continuar intentando leer la URL manualmente abajo
+
+        # fallback: si no obtuvimos new_url, intentar leer un atributo directo
+        if not new_url:
+            if hasattr(dlg, "database_url"):
+                new_url = getattr(dlg, "database_url")
+            if not new_url:
+                # No hay nueva URL, pero puede que solo se haya cambiado el formato de fecha
+                # Intentar usar la URL existente en .env
+                new_url = os.environ.get("DATABASE_URL", "").strip()
+                if not new_url:
+                    QMessageBox.warning(self, "Config", "No se encontró DATABASE_URL. Configura la conexión a la base de datos.")
+                    return
+                # Si hay URL en .env, continuar sin mostrar error
+        
+        # Reinicializar base de datos con la URL
+        try:
+            from database import db as _db
+            _db.init_app(new_url)
+            # con el pool del engine nuevo: deja el veredicto cacheado para load_accounts_buttons
+            ok, err = _db.probe_connection()
+        except Exception as e:
+            ok = False
+            err = str(e)
+        
+        if not ok:
+            QMessageBox.critical(self, "No se pudo conectar", f"No se pudo conectar con la DB: {err}")
+            return
+        
+        # Conexión OK -> limpiar sesiones antiguas y recargar cuentas en caliente
+        try:
+            if getattr(_db, "SessionLocal", None) is not None and hasattr(_db.SessionLocal, "remove"):
+                try:
+                    _db.SessionLocal.remove()
+                except Exception:
+                    pass
+        except Exception:
+            pass
+
+        # Quitar placeholder si existe
+        try:
+            if hasattr(self, "db_placeholder_widget") and self.db_placeholder_widget is not None:
+                try:
+                    self.accounts_layout.removeWidget(self.db_placeholder_widget)
+                except Exception:
+                    pass
+                try:
+                    self.db_placeholder_widget.deleteLater()
+                except Exception:
+                    pass
+                self.db_placeholder_widget = None
+        except Exception:
+            pass
+
+        # Recargar botones/cuentas
+        try:
+            self.load_accounts_buttons(self.accounts_layout)
+        except Exception as e:
+            QMessageBox.warning(self, "Advertencia", f"Conexión establecida pero fallo al cargar cuentas: {e}")
+            print("DEBUG load_accounts_buttons error:", e)
+
+        QMessageBox.information(self, "Conectado", "Conexión OK. Configuración guardada correctamente.")
+    
+    def on_import_clicked(self):
+        """
+        Importa movimientos desde un fichero TSV/CSV con columnas:
+        Fecha    Descripcion    Monto
+        Detecta delimitador automáticamente y gestiona comillas/negativos.
+        La importación corre en un ImportWorker (ver utils/importer.py).
+        """
+
+        # Aviso de formato antes de seleccionar cuenta
+        example_text = (
+                        "El fichero CSV/TSV debe tener las siguientes columnas:\n"
+                        "Fecha\tDescripcion\tMonto\n"
+                        "Ejemplo:\n"
+                        "2025-08-15\tIngreso Bizum\t134.98\n"
+                        "2025-09-05\tDevolucion Bizum\t134.98\n"
+                        "2025-10-30\tTransferencia\t1225.24\n"
+                        "2025-10-31\tTransferencia de vuelta\t-1225.24\n\n"
+                        "Separador: Tabulador o coma. Las comillas son opcionales.\n"
+                        "La primera fila puede ser cabecera con nombres de columna."
+                    )
+        QMessageBox.information(self, "Formato esperado del fichero", example_text)
+        
+        # 1) comprobar cuenta seleccionada (o pedir al usuario que la elija)
+        cuenta_id = getattr(self, "selected_account_id", None)
+        session = db.session()
+        try:
+            cuentas = session.query(Account).order_by(Account.id).all()
+        except Exception as e:
+            session.close()
+            QMessageBox.critical(self, "Error", f"No se pudieron cargar cuentas: {e}")
+            return
+        finally:
+            session.close()
+
+        if not cuenta_id:
+            dlg_sel = SelectAccountDialog(self, cuentas=[(c.id, c.nombre) for c in cuentas])
+            if dlg_sel.exec() != QDialog.Accepted:
+                
+                return
+            cuenta_id = dlg_sel.get_values()["cuenta_id"]
+            if not cuenta_id:
+                QMessageBox.warning(self, "Cuenta no seleccionada", "No se seleccionó ninguna cuenta.")
+                return
+
+        # 2) elegir fichero
+        fname, _ = QFileDialog.getOpenFileName(self, "Seleccionar fichero (TSV/CSV)", "", "All files (*);;CSV files (*.csv *.txt *.tsv)")
+        if not fname:
+            return
+
+        # 3) importar en segundo plano (lectura en streaming, inserción por lotes) con
+        #    barra de progreso y botón de cancelar; el resultado llega a _on_import_terminado
+        self._lanzar_importacion(ImportWorker(fname, int(cuenta_id)),
+                                 f"Importando {os.path.basename(fname)}…", self._on_import_terminado)
+
+    def on_import_folder_clicked(self):
+        """
+        Importa de una vez todos los extractos de una carpeta, cada uno en la cuenta que
+        le corresponde por su nombre (patrones IMPORT_PATTERNS del .env, revisables en
+        ImportarCarpetaDialog). Los ficheros se parsean en paralelo en varios procesos
+        (ImportCarpetaWorker, ver utils/importer.importar_ficheros).
+        """
+        if self._import_worker is not None:
+            QMessageBox.information(self, "Importar", "Ya hay una importación en curso.")
+            return
+        carpeta = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta de extractos")
+        if not carpeta:
+            return
+        rutas = ficheros_de_carpeta(carpeta)
+        if not rutas:
+            QMessageBox.information(self, "Importar carpeta", "No hay ficheros .csv, .tsv o .txt en la carpeta.")
+            return
+
+        session = db.session()
+        try:
+            cuentas = [(c.id, c.nombre) for c in session.query(Account).order_by(Account.id).all()]
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron cargar cuentas: {e}")
+            return
+        finally:
+            session.close()
+
+        patrones = os.environ.get("IMPORT_PATTERNS", "")
+        dlg = ImportarCarpetaDialog(self, rutas=rutas, cuentas=cuentas, patrones=patrones)
+        if dlg.exec() != QDialog.Accepted:
+            return
+        valores = dlg.get_values()
+        if valores["patrones"] != patrones:
+            # guardar los patrones para la próxima vez (mismo .env que ConfigDialog)
+            try:
+                set_key(os.path.join(os.getcwd(), ".env"), "IMPORT_PATTERNS", valores["patrones"])
+                os.environ["IMPORT_PATTERNS"] = valores["patrones"]
+            except Exception as e:
+                print("DEBUG guardar IMPORT_PATTERNS:", e)
+        if not valores["asignacion"]:
+            QMessageBox.warning(self, "Importar carpeta", "Ningún fichero tiene cuenta asignada.")
+            return
+        self._lanzar_importacion(ImportCarpetaWorker(valores["asignacion"]),
+                                 f"Importando {len(valores['asignacion'])} ficheros…",
+                                 self._on_import_carpeta_terminado)
+
+    def _lanzar_importacion(self, worker, texto: str, al_terminar):
+        """Arranca un worker de importación con su QProgressDialog (botón Cancelar)."""
+        if self._import_worker is not None:
+            QMessageBox.information(self, "Importar", "Ya hay una importación en curso.")
+            return
+        dialogo = QProgressDialog(texto, "Cancelar", 0, 100, self)
+        dialogo.setWindowTitle("Importar movimientos")
+        dialogo.setWindowModality(Qt.WindowModal)
+        dialogo.setMinimumDuration(0)
+        dialogo.setAutoClose(False)
+        dialogo.setAutoReset(False)
+
+        worker.signals.progreso.connect(self._on_import_progreso)
+        worker.signals.resultado.connect(al_terminar)
+        worker.signals.cancelado.connect(self._on_import_cancelado)
+        worker.signals.error.connect(self._on_import_error)
+        worker.signals.terminado.connect(self._on_import_fin)
+        dialogo.canceled.connect(worker.cancelar)
+        self._import_worker, self._import_dialogo = worker, dialogo
+        dialogo.setValue(0)
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_import_progreso(self, porcentaje, insertadas):
+        # referencia local: setValue() de un diálogo modal procesa eventos y puede
+        # entregar ya el resultado, que cierra el diálogo (self._import_dialogo = None)
+        dialogo = self._import_dialogo
+        if dialogo is not None and not dialogo.wasCanceled():
+            dialogo.setLabelText(f"Importando… {insertadas} movimientos insertados")
+            dialogo.setValue(porcentaje)
+
+    def _on_import_terminado(self, resultado):
+        summary = (f"Import finalizado.\nFilas leídas: {resultado['leidas']}\n"
+                   f"Insertadas: {resultado['insertadas']}\nIgnoradas: {resultado['ignoradas']}\n"
+                   f"Duplicadas (ya importadas): {resultado['duplicadas']}")
+        if resultado.get("sin_deteccion_duplicados"):
+            summary += "\n⚠️ Sin detección de duplicados: ejecuta migrations/add_hash_contenido_to_transaction.py"
+        if resultado.get("fichero_errores"):
+            summary += f"\nDetalle errores en: {resultado['fichero_errores']}"
+        self._cerrar_dialogo_import()
+        QMessageBox.information(self, "Importar movimientos", summary)
+
+    def _on_import_carpeta_terminado(self, resultado):
+        ficheros = resultado["ficheros"]
+        summary = (f"Import finalizado: {len(ficheros)} ficheros.\nFilas leídas: {resultado['leidas']}\n"
+                   f"Insertadas: {resultado['insertadas']}\nIgnoradas: {resultado['ignoradas']}\n"
+                   f"Duplicadas (ya importadas): {resultado['duplicadas']}")
+        if resultado.get("sin_deteccion_duplicados"):
+            summary += "\n⚠️ Sin detección de duplicados: ejecuta migrations/add_hash_contenido_to_transaction.py"
+        for r in ficheros:
+            if r["error"]:
+                summary += f"\n⚠️ {os.path.basename(r['fichero'])}: no se pudo leer ({r['error']})"
+            elif r["fichero_errores"]:
+                summary += f"\n{os.path.basename(r['fichero'])}: {r['ignoradas']} filas con error en {r['fichero_errores']}"
+        self._cerrar_dialogo_import()
+        QMessageBox.information(self, "Importar carpeta", summary)
+
+    def _on_import_cancelado(self):
+        self._cerrar_dialogo_import()
+        QMessageBox.information(self, "Importar movimientos", "Importación cancelada: no se ha guardado ningún movimiento.")
+
+    def _on_import_error(self, mensaje):
+        self._cerrar_dialogo_import()
+        QMessageBox.critical(self, "Error", f"No se pudo importar: {mensaje}")
+
+    def _on_import_fin(self):
+        self._import_worker = None
+        self._cerrar_dialogo_import()
+        # refrescar UI
+        try:
+            self.recalcular_grafico()
+        except Exception:
+            pass
+        try:
+            self.refresh_table()
+        except Exception:
+            pass
+
+    def _cerrar_dialogo_import(self):
+        if self._import_dialogo is not None:
+            self._import_dialogo.close()
+            self._import_dialogo.deleteLater()
+            self._import_dialogo = None
+
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QFormLayout, QDateEdit, QDoubleSpinBox,
+    QLineEdit, QDialogButtonBox, QLabel
+)
+from PySide6.QtCore import QDate
+
+class ConsolidationDialog(QDialog):
+    """
+    Diálogo para introducir fecha y saldo objetivo de la consolidación (reconciliación).
+    Devuelve: dict {'fecha': date, 'saldo_objetivo': float, 'descripcion': str}
+    """
+    def __init__(self, parent=None, fecha_default=None, saldo_default=0.0, descripcion_default="Consolidación / Reconciliación"):
+        super().__init__(parent)
+        self.setWindowTitle("Consolidación / Reconciliación")
+        self.resize(360, 160)
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        # fecha
+        self.input_fecha = QDateEdit()
+        self.input_fecha.setCalendarPopup(True)
+        if fecha_default:
+            self.input_fecha.setDate(QDate(fecha_default.year, fecha_default.month, fecha_default.day))
+        else:
+            self.input_fecha.setDate(QDate.currentDate())
+
+        # saldo objetivo
+        self.input_saldo = QDoubleSpinBox()
+        self.input_saldo.setRange(-10_000_000_000, 10_000_000_000)
+        self.input_saldo.setDecimals(2)
+        self.input_saldo.setValue(float(saldo_default))
+
+        # descripcion
+        self.input_desc = QLineEdit(descripcion_default)
+
+        form.addRow("Fecha reconciliación:", self.input_fecha)
+        form.addRow("Saldo objetivo (€):", self.input_saldo)
+        form.addRow("Descripción:", self.input_desc)
+
+        layout.addLayout(form)
+
+        botones = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        botones.accepted.connect(self.accept)
+        botones.rejected.connect(self.reject)
+        layout.addWidget(botones)
+
+    def get_values(self):
+        return {
+            "fecha": self.input_fecha.date().toPython(),
+            "saldo_objetivo": float(self.input_saldo.value()),
+            "descripcion": self.input_desc.text().strip() or "Consolidación / Reconciliación"
+        }
+
+class AuditDialog(QDialog):
+    """
+    Detalle de la auditoría en una tabla model/view: el informe puede traer el tramo
+    del ledger en columnas ('ledger', lo normal) o una lista de dicts ('detalle').
+    Texto y colores se calculan en data() solo para las filas visibles.
+    """
+    def __init__(self, parent, report):
+        super().__init__(parent)
+        self.setWindowTitle("Auditoría de cuenta")
+        self.resize(1000, 800)
+        self.report = report
+
+        layout = QVBoxLayout(self)
+
+        # Asegurar claves en report
+        saldo_inicial = report.get("saldo_inicial", 0.0)
+        saldo_final = report.get("saldo_final", 0.0)
+
+        lbl = QLabel(f"Saldo inicial: {float(saldo_inicial):.2f} €    -    Saldo final: {float(saldo_final):.2f} €")
+        layout.addWidget(lbl)
+
+        textos, claves = {}, {}
+        if report.get("ledger") is not None:
+            self.n_filas, self.campos = _campos_auditoria_ledger(report["ledger"])
+            textos, claves = _textos_auditoria_ledger(report["ledger"])
+        else:
+            # si report['detalle'] no existe, intentar otras claves
+            detalle = report.get("detalle") or report.get("movimientos") or report.get("rows") or []
+            self.n_filas, self.campos = _campos_auditoria_filas(detalle)
+
+        filtro = QLineEdit()
+        filtro.setPlaceholderText("Filtrar (fecha, tipo, concepto, importe...)")
+        layout.addWidget(filtro)
+
+        # Tabla virtual: azul claro para movimientos futuros, rojo y negrita para transferencias
+        campos = self.campos
+        fondo_futuro = QColor(220, 235, 255)  # azul muy claro
+        color_rojo = QColor(200, 0, 0)
+        fondo = lambda i: fondo_futuro if campos["futuro"](i) else None
+        color = lambda i: color_rojo if campos["transferencia"](i) else None
+        negrita = campos["transferencia"]
+        columnas = [
+            Columna("Fecha", campos["fecha"], date_to_string, fondo=fondo, color=color, negrita=negrita,
+                    textos=textos.get("fecha"), claves=claves.get("fecha")),
+            Columna("Tipo", campos["tipo"], fondo=fondo, color=color, negrita=negrita,
+                    textos=textos.get("tipo"), claves=claves.get("tipo")),
+            Columna("Concepto", campos["concepto"], fondo=fondo, color=color, negrita=negrita,
+                    textos=textos.get("concepto"), claves=claves.get("concepto")),
+            Columna("Importe", campos["importe"], lambda v: f"{v:.2f}", DERECHA, fondo, color, negrita,
+                    textos=textos.get("importe"), claves=claves.get("importe")),
+            Columna("Saldo parcial", campos["saldo"], lambda v: f"{v:.2f}", DERECHA, fondo, color, negrita,
+                    textos=textos.get("saldo"), claves=claves.get("saldo")),
+        ]
+        table = crear_vista_tabla(self)
+        poner_modelo(table, ModeloColumnas(self.n_filas, columnas))
+        table.resizeColumnsToContents()
+        filtro.textChanged.connect(lambda texto: filtrar(table, texto))
+        layout.addWidget(table)
+
+        btns_layout = QHBoxLayout()
+        btn_export = QPushButton("Exportar CSV")
+        btn_close = QPushButton("Cerrar")
+        btns_layout.addStretch()
+        btns_layout.addWidget(btn_export)
+        btns_layout.addWidget(btn_close)
+        layout.addLayout(btns_layout)
+
+        btn_export.clicked.connect(self.export_csv)
+        btn_close.clicked.connect(self.close)
+
+    def export_csv(self):
+        fname, _ = QFileDialog.getSaveFileName(self, "Guardar CSV", f"auditoria_{datetime.now().strftime('%Y%m%d_%H%M')}.csv", "CSV files (*.csv)")
+        if not fname:
+            return
+        campos = self.campos
+        try:
+            with open(fname, "w", newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["fecha", "tipo", "concepto", "importe", "saldo"])
+                for i in range(self.n_filas):
+                    fecha = campos["fecha"](i)
+                    saldo = campos["saldo"](i)
+                    writer.writerow([
+                        fecha.isoformat() if hasattr(fecha, "isoformat") else str(fecha),
+                        campos["tipo"](i),
+                        campos["concepto"](i),
+                        f"{campos['importe'](i):.2f}",
+                        f"{saldo:.2f}" if saldo is not None else ""
+                    ])
+            QMessageBox.information(self, "Exportado", f"CSV guardado en:\n{fname}")
+        except Exception as exc:
+            QMessageBox.critical(self, "Error", f"No se pudo guardar CSV: {exc}")
+
+
+def _campos_auditoria_ledger(ledger):
+    """
+    Accesores por fila sobre el tramo del ledger (arrays NumPy): no se crea nada por
+    movimiento, solo se leen las posiciones que la tabla pide.
+    """
+    nombres = {TIPO_FIJO: 'fijo', TIPO_TRANSACCION: 'puntual', TIPO_AJUSTE: 'ajuste'}
+    saldos = ledger.saldos  # cumsum una sola vez
+    futuro = ledger.fechas > np.datetime64(date.today(), "D")
+    return len(ledger), {
+        "fecha": lambda i: ledger.fechas[i].item(),
+        "tipo": lambda i: nombres.get(int(ledger.tipos[i]), ""),
+        "concepto": lambda i: ledger.descripciones[ledger.desc_idx[i]],
+        "importe": lambda i: int(ledger.centimos[i]) / 100,
+        "saldo": lambda i: int(saldos[i]) / 100,
+        "transferencia": lambda i: bool(ledger.transferencias[i]),
+        "futuro": lambda i: bool(futuro[i]),
+    }
+
+
+def _textos_auditoria_ledger(ledger):
+    """
+    Texto (para el filtro) y clave de orden de cada columna para todas las filas, sacados
+    de los arrays del ledger: una conversión por columna en vez de un acceso NumPy por celda.
+    Devuelve (textos, claves), dicts de campo -> función.
+    """
+    nombres = {TIPO_FIJO: 'fijo', TIPO_TRANSACCION: 'puntual', TIPO_AJUSTE: 'ajuste'}
+    formato_py = get_matplotlib_date_format()
+    importes = lambda centimos: [f"{v:.2f}" for v in (centimos / 100).tolist()]
+
+    def fechas():
+        # strftime solo sobre las fechas distintas (muchos movimientos comparten día)
+        unicas, inversa = np.unique(ledger.fechas, return_inverse=True)
+        textos = [f.strftime(formato_py) for f in unicas.tolist()]
+        return [textos[k] for k in inversa.tolist()]
+
+    textos = {
+        "fecha": fechas,
+        "tipo": lambda: [nombres.get(t, "") for t in ledger.tipos.tolist()],
+        "concepto": lambda: [ledger.descripciones[k] for k in ledger.desc_idx.tolist()],
+        "importe": lambda: importes(ledger.centimos),
+        "saldo": lambda: importes(ledger.saldos),
+    }
+    claves = {
+        "fecha": lambda: ledger.fechas,
+        "tipo": lambda: np.array(textos["tipo"]()),
+        "concepto": lambda: np.array(textos["concepto"]()),
+        "importe": lambda: ledger.centimos,
+        "saldo": lambda: ledger.saldos,
+    }
+    return textos, claves
+
+
+def _campos_auditoria_filas(detalle):
+    """Accesores por fila sobre una lista de dicts u objetos ORM (formato antiguo del informe)."""
+    def campo(r, *claves, defecto=None):
+        # r puede ser dict o un ORM object; intentamos extraer de forma defensiva
+        for clave in claves:
+            v = r.get(clave) if isinstance(r, dict) else getattr(r, clave, None)
+            if v is not None and v != "":
+                return v
+        return defecto
+
+    def fecha(i):
+        f = campo(detalle[i], "fecha", "date", "fecha_inicio", defecto="")
+        if isinstance(f, str):
+            try:
+                f = datetime.strptime(f, "%Y-%m-%d").date()
+            except ValueError:
+                pass
+        return f
+
+    def numero(valor):
+        # garantizar tipos numéricos
+        try:
+            return float(valor) if valor is not None else None
+        except Exception:
+            return None
+
+    def futuro(i):
+        f = fecha(i)
+        if isinstance(f, datetime):
+            f = f.date()
+        return isinstance(f, date) and f > date.today()
+
+    return len(detalle), {
+        "fecha": fecha,
+        "tipo": lambda i: str(campo(detalle[i], "tipo", "kind", defecto="")),
+        "concepto": lambda i: str(campo(detalle[i], "descripcion", "concepto", "desc", defecto="")),
+        "importe": lambda i: numero(campo(detalle[i], "monto", "importe", defecto=0.0)) or 0.0,
+        "saldo": lambda i: numero(campo(detalle[i], "saldo", "saldo_parcial")),
+        "transferencia": lambda i: bool(campo(detalle[i], "es_transferencia", defecto=0)),
+        "futuro": futuro,
+    }
+
+class SelectAccountDialog(QDialog):
+    """
+    Si no hay cuenta seleccionada, mostramos este diálogo para elegir una cuenta.
+    Devuelve {'cuenta_id': id} en get_values()
+    """
+    def __init__(self, parent=None, cuentas=None):
+        super().__init__(parent)
+        self.setWindowTitle("Seleccionar cuenta para importar")
+        self.resize(420, 120)
+        layout = QFormLayout(self)
+
+        self.combo_cuenta = QComboBox()
+        if cuentas:
+            for c in cuentas:
+                if isinstance(c, (tuple, list)):
+                    cid = c[0]
+                    name = c[1] if len(c) > 1 else str(cid)
+                else:
+                    cid = getattr(c, "id", None)
+                    name = getattr(c, "nombre", str(cid))
+                self.combo_cuenta.addItem(f"{name} ({cid})", cid)
+
+        layout.addRow("Cuenta:", self.combo_cuenta)
+
+        bb = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        bb.accepted.connect(self.accept)
+        bb.rejected.connect(self.reject)
+        layout.addRow(bb)
+
+    def get_values(self):
+        return {"cuenta_id": self.combo_cuenta.currentData()}
+
+
+class ImportarCarpetaDialog(QDialog):
+    """
+    Revisión de una importación por carpeta: cada fichero con la cuenta que le asignan
+    los patrones de nombre ("patrón=id_cuenta; ..."), que se pueden editar y reaplicar,
+    y un desplegable para corregirla o dejar el fichero fuera.
+    Devuelve {'asignacion': {ruta: cuenta_id}, 'patrones': texto} en get_values()
+    """
+    def __init__(self, parent=None, rutas=None, cuentas=None, patrones=""):
+        super().__init__(parent)
+        self.setWindowTitle("Importar carpeta de extractos")
+        self.resize(640, 480)
+        self.rutas = list(rutas or [])
+        self.cuentas = list(cuentas or [])  # [(id, nombre)]
+        layout = QVBoxLayout(self)
+
+        fila_patrones = QHBoxLayout()
+        self.input_patrones = QLineEdit(patrones)
+        self.input_patrones.setPlaceholderText("*santander*=1; bbva_*=2")
+        self.input_patrones.setToolTip("patrón=id_cuenta separados por ';'. Sin patrón que encaje se busca "
+                                       "el nombre de la cuenta en el nombre del fichero.")
+        btn_aplicar = QPushButton("Aplicar")
+        btn_aplicar.clicked.connect(self.aplicar_patrones)
+        fila_patrones.addWidget(QLabel("Patrones:"))
+        fila_patrones.addWidget(self.input_patrones)
+        fila_patrones.addWidget(btn_aplicar)
+        layout.addLayout(fila_patrones)
+
+        self.tabla = QTableWidget(len(self.rutas), 2)
+        self.tabla.setHorizontalHeaderLabels(["Fichero", "Cuenta"])
+        self.tabla.verticalHeader().setVisible(False)
+        self.combos = []
+        for fila, ruta in enumerate(self.rutas):
+            item = QTableWidgetItem(os.path.basename(ruta))
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            item.setToolTip(ruta)
+            self.tabla.setItem(fila, 0, item)
+            combo = QComboBox()
+            combo.addItem("(no importar)", None)
+            for cid, nombre in self.cuentas:
+                combo.addItem(f"{nombre} ({cid})", cid)
+            combo.currentIndexChanged.connect(self._actualizar_resumen)
+            self.tabla.setCellWidget(fila, 1, combo)
+            self.combos.append(combo)
+        self.tabla.resizeColumnsToContents()
+        self.tabla.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.tabla)
+
+        self.label_resumen = QLabel()
+        layout.addWidget(self.label_resumen)
+
+        bb = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        bb.accepted.connect(self.accept)
+        bb.rejected.connect(self.reject)
+        layout.addWidget(bb)
+        self.aplicar_patrones()
+
+    def aplicar_patrones(self):
+        asignacion = asignar_cuentas(self.rutas, leer_mapeo(self.input_patrones.text()), dict(self.cuentas))
+        for ruta, combo in zip(self.rutas, self.combos):
+            cuenta_id = asignacion.get(ruta)
+            combo.setCurrentIndex(combo.findData(cuenta_id) if cuenta_id is not None else 0)
+        self._actualizar_resumen()
+
+    def _actualizar_resumen(self, *_):
+        n = sum(1 for combo in self.combos if combo.currentData() is not None)
+        self.label_resumen.setText(f"{n} de {len(self.combos)} ficheros con cuenta asignada")
+
+    def get_values(self):
+        return {
+            "asignacion": {ruta: combo.currentData() for ruta, combo in zip(self.rutas, self.combos)
+                           if combo.currentData() is not None},
+            "patrones": self.input_patrones.text().strip(),
+        }
+    
+def _try_parse_date(s: str):
+    """Intentos habituales de parseo; devolver date o None."""
+    if s is None:
+        return None
+    s = str(s).strip()
+    if not s:
+        return None
+    from datetime import datetime, date
+    fmts = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+    for f in fmts:
+        try:
+            return datetime.strptime(s, f).date()
+        except Exception:
+            pass
+    # último recurso: intentar parseo flexible (día,mes, año separados por espacios)
+    try:
+        parts = [p for p in s.replace("-", "/").replace(".", "/").split("/") if p]
+        if len(parts) == 3:
+            d, m, y = parts
+            # heurística: si el primero tiene 4 dígitos, es año
+            if len(d) == 4:
+                return date(int(d), int(m), int(y))
+            else:
+                return date(int(y), int(m), int(d)) if len(y) == 4 else date(int(y), int(m), int(d))
+    except Exception:
+        pass
+    return None
@@ -1,17 +1,21 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                               QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox,
+                               QHeaderView, QMessageBox, QLineEdit,
                                QFormLayout, QDateEdit, QSpinBox, QGroupBox, QCheckBox,
-                               QScrollArea, QWidget, QLabel, QFileDialog)
-from PySide6.QtCore import Qt, QDate
+                               QScrollArea, QWidget, QLabel, QFileDialog, QComboBox, QProgressDialog)
+from PySide6.QtCore import Qt, QDate, QThreadPool
 from PySide6.QtGui import QColor
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from decimal import Decimal
+from datetime import datetime
 import csv
 from models.account import Account
-from models.simulation_variable import SimulationVariable
-from utils.reconciler import calcular_balance_cuenta
+from models.simulation_variable import SimulationVariable, distribucion_disponible, cargar_distribuciones
+from utils.simulation import simular_saldos
+from utils.montecarlo import preparar_montecarlo, CAMINOS_POR_DEFECTO
+from ui.workers import MonteCarloWorker
 from ui.variables_dialog import VariablesDialog
+from ui.table_models import Columna, ModeloColumnas, crear_vista_tabla, poner_modelo, filtrar, DERECHA
+import numpy as np
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
 
 
 class SimulationWindow(QDialog):
@@ -25,6 +29,9 @@ class SimulationWindow(QDialog):
         self.cuenta_checkboxes = {}
         self.resultados_cache = None  # Cache para exportar
         self.cuentas_cache = None
+        self.montecarlo_cache = None  # resultado de simular_montecarlo (modo Monte Carlo)
+        self._mc_worker = None        # MonteCarloWorker en curso
+        self._mc_dialogo = None       # su QProgressDialog
         self.setup_ui()
     
     def setup_ui(self):
@@ -53,6 +60,24 @@ class SimulationWindow(QDialog):
         self.intervalo_input.setSuffix(" días")
         config_layout.addRow("Intervalo:", self.intervalo_input)
         
+        # Modo Monte Carlo: importes aleatorios para las variables con distribución
+        montecarlo_layout = QHBoxLayout()
+        self.montecarlo_check = QCheckBox("Monte Carlo")
+        self.montecarlo_check.setToolTip("Simula muchos caminos con importes aleatorios para las variables con "
+                                         "distribución normal o histórica: bandas P5/P50/P95 y probabilidad "
+                                         "de saldo negativo por cuenta")
+        self.caminos_input = QSpinBox()
+        self.caminos_input.setRange(100, 100000)
+        self.caminos_input.setSingleStep(1000)
+        self.caminos_input.setValue(CAMINOS_POR_DEFECTO)
+        self.caminos_input.setSuffix(" caminos")
+        self.caminos_input.setEnabled(False)
+        self.montecarlo_check.toggled.connect(self.caminos_input.setEnabled)
+        montecarlo_layout.addWidget(self.montecarlo_check)
+        montecarlo_layout.addWidget(self.caminos_input)
+        montecarlo_layout.addStretch()
+        config_layout.addRow("Modo:", montecarlo_layout)
+        
         config_group.setLayout(config_layout)
         layout.addWidget(config_group)
         
@@ -122,8 +147,30 @@ class SimulationWindow(QDialog):
         results_label = QLabel("Resultados:")
         layout.addWidget(results_label)
         
-        self.results_table = QTableWidget()
-        self.results_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # Monte Carlo: probabilidad de saldo negativo y bandas de la serie elegida
+        # (ocultos en la simulación normal; la figura se crea con el primer resultado)
+        self.prob_label = QLabel()
+        self.prob_label.setWordWrap(True)
+        self.prob_label.hide()
+        layout.addWidget(self.prob_label)
+        self.banda_widget = QWidget()
+        banda_layout = QVBoxLayout(self.banda_widget)
+        banda_layout.setContentsMargins(0, 0, 0, 0)
+        self.serie_combo = QComboBox()
+        self.serie_combo.currentIndexChanged.connect(self.dibujar_bandas)
+        banda_layout.addWidget(self.serie_combo)
+        self.banda_widget.hide()
+        layout.addWidget(self.banda_widget)
+        self.fig_bandas = None
+        self.canvas_bandas = None
+        
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filtrar resultados...")
+        layout.addWidget(self.filter_edit)
+        
+        # Tabla virtual (modelo + proxy para ordenar/filtrar)
+        self.results_table = crear_vista_tabla(self)
+        self.filter_edit.textChanged.connect(lambda texto: filtrar(self.results_table, texto))
         layout.addWidget(self.results_table)
         
         # --- Botón cerrar ---
@@ -153,6 +200,9 @@ class SimulationWindow(QDialog):
     
     def export_to_csv(self):
         """Exportar los resultados de la simulación a un archivo CSV"""
+        if self.montecarlo_cache is not None:
+            self.export_montecarlo_to_csv()
+            return
         if not self.resultados_cache or not self.cuentas_cache:
             QMessageBox.warning(self, "Aviso", "No hay resultados para exportar. Ejecuta primero una simulación.")
             return
@@ -225,6 +275,10 @@ class SimulationWindow(QDialog):
             # Obtener variables activas
             variables_activas = self.session.query(SimulationVariable).filter_by(activo=1).all()
             
+            if self.montecarlo_check.isChecked():
+                self.run_montecarlo(fecha_inicio, fecha_fin, intervalo, cuentas_seleccionadas, variables_activas)
+                return
+            
             # Ejecutar simulación
             resultados = self.calculate_simulation(
                 fecha_inicio, fecha_fin, intervalo,
@@ -234,6 +288,9 @@ class SimulationWindow(QDialog):
             # Guardar en cache para exportar
             self.resultados_cache = resultados
             self.cuentas_cache = cuentas_seleccionadas
+            self.montecarlo_cache = None
+            self.prob_label.hide()
+            self.banda_widget.hide()
             
             # Mostrar resultados
             self.display_results(resultados, cuentas_seleccionadas)
@@ -246,86 +303,12 @@ class SimulationWindow(QDialog):
     
     def calculate_simulation(self, fecha_inicio, fecha_fin, intervalo, cuentas, variables):
         """
-        Calcular la simulación de saldos
-        
-        Args:
-            fecha_inicio: datetime.date
-            fecha_fin: datetime.date
-            intervalo: int (días)
-            cuentas: List[Account]
-            variables: List[SimulationVariable]
-        
+        Calcular la simulación de saldos (utils/simulation.simular_saldos, sin Qt).
+
         Returns:
             List[dict] con estructura: {'fecha': date, 'saldos': {cuenta_id: float}}
         """
-        resultados = []
-        fecha_actual = fecha_inicio
-        
-        # Diccionario para acumular efectos de variables por cuenta
-        # {cuenta_id: {fecha: importe_acumulado}}
-        efectos_variables = {cuenta.id: {} for cuenta in cuentas}
-        
-        # Pre-calcular efectos de variables para cada fecha
-        for variable in variables:
-            if variable.cuenta_id not in efectos_variables:
-                continue
-            
-            # Si la variable tiene fecha de inicio, empezar desde esa fecha
-            # Si no, empezar desde fecha_inicio de la simulación
-            fecha_var = variable.fecha_inicio if variable.fecha_inicio else fecha_inicio
-            
-            # Si la fecha de inicio de la variable es posterior al rango, saltarla
-            if fecha_var > fecha_fin:
-                continue
-            
-            # Si la fecha de inicio es anterior al rango de simulación, empezar desde fecha_inicio
-            fecha_var = max(fecha_var, fecha_inicio)
-            
-            while fecha_var <= fecha_fin:
-                if fecha_var not in efectos_variables[variable.cuenta_id]:
-                    efectos_variables[variable.cuenta_id][fecha_var] = Decimal('0')
-                
-                efectos_variables[variable.cuenta_id][fecha_var] += Decimal(str(variable.importe))
-                
-                # Calcular siguiente fecha según frecuencia
-                if variable.frecuencia == 'semanal':
-                    fecha_var += timedelta(days=7)
-                elif variable.frecuencia == 'mensual':
-                    fecha_var += relativedelta(months=1)
-                elif variable.frecuencia == 'trimestral':
-                    fecha_var += relativedelta(months=3)
-                elif variable.frecuencia == 'semestral':
-                    fecha_var += relativedelta(months=6)
-                elif variable.frecuencia == 'anual':
-                    fecha_var += relativedelta(years=1)
-                else:
-                    break  # Frecuencia desconocida
-        
-        # Calcular saldos en cada intervalo
-        while fecha_actual <= fecha_fin:
-            saldos = {}
-            
-            for cuenta in cuentas:
-                # Obtener saldo base de la cuenta usando reconciler
-                saldo_base = calcular_balance_cuenta(self.session, cuenta.id, fecha_actual)
-                
-                # Aplicar efectos acumulados de variables hasta esta fecha
-                efecto_total = Decimal('0')
-                for fecha_efecto, importe in efectos_variables[cuenta.id].items():
-                    if fecha_efecto <= fecha_actual:
-                        efecto_total += importe
-                
-                saldo_final = float(Decimal(str(saldo_base)) + efecto_total)
-                saldos[cuenta.id] = saldo_final
-            
-            resultados.append({
-                'fecha': fecha_actual,
-                'saldos': saldos
-            })
-            
-            fecha_actual += timedelta(days=intervalo)
-        
-        return resultados
+        return simular_saldos(self.session, fecha_inicio, fecha_fin, intervalo, cuentas, variables)
     
     def display_results(self, resultados, cuentas):
         """
@@ -336,58 +319,183 @@ class SimulationWindow(QDialog):
             cuentas: List[Account]
         """
         if not resultados:
-            self.results_table.setRowCount(0)
+            poner_modelo(self.results_table, ModeloColumnas(0, []))
             return
         
-        # Configurar columnas: Fecha + Cuentas + TOTAL
-        num_columns = len(cuentas) + 2
-        self.results_table.setColumnCount(num_columns)
-        
-        headers = ['Fecha']
-        for cuenta in cuentas:
-            headers.append(cuenta.nombre)
-        headers.append('TOTAL')
+        # Resultado en columnas: fechas + matriz fechas × cuentas (+ TOTAL vectorizado);
+        # el texto y los colores los calcula el modelo solo para las filas visibles
+        fechas = [r['fecha'] for r in resultados]
+        saldos = np.array([[r['saldos'].get(c.id, 0.0) for c in cuentas] for r in resultados], dtype=float).reshape(len(resultados), len(cuentas))
+        totales = saldos.sum(axis=1)
+        rojo_claro = QColor(255, 200, 200)  # Rojo claro
         
-        self.results_table.setHorizontalHeaderLabels(headers)
-        
-        # Llenar datos
-        self.results_table.setRowCount(len(resultados))
-        
-        for row, resultado in enumerate(resultados):
-            # Fecha
-            fecha_str = resultado['fecha'].strftime('%d/%m/%Y')
-            self.results_table.setItem(row, 0, QTableWidgetItem(fecha_str))
-            
-            # Saldos por cuenta
-            total = 0.0
-            for col, cuenta in enumerate(cuentas, start=1):
-                saldo = resultado['saldos'].get(cuenta.id, 0.0)
-                total += saldo
-                
-                item = QTableWidgetItem(f"{saldo:,.2f}")
-                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                
-                # Colorear en rojo si es negativo
-                if saldo < 0:
-                    item.setBackground(QColor(255, 200, 200))  # Rojo claro
-                
-                self.results_table.setItem(row, col, item)
-            
-            # Total
-            total_item = QTableWidgetItem(f"{total:,.2f}")
-            total_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            # Resaltar columna total en negrita
-            font = total_item.font()
-            font.setBold(True)
-            total_item.setFont(font)
-            
-            # Colorear en rojo si el total es negativo
-            if total < 0:
-                total_item.setBackground(QColor(255, 200, 200))  # Rojo claro
-            
-            self.results_table.setItem(row, num_columns - 1, total_item)
+        # Configurar columnas: Fecha + Cuentas + TOTAL
+        columnas = [Columna('Fecha', lambda i: fechas[i], lambda f: f.strftime('%d/%m/%Y'))]
+        for j, cuenta in enumerate(cuentas):
+            # Colorear en rojo si es negativo
+            columnas.append(Columna(
+                cuenta.nombre, lambda i, j=j: float(saldos[i, j]), lambda v: f"{v:,.2f}", DERECHA,
+                fondo=lambda i, j=j: rojo_claro if saldos[i, j] < 0 else None,
+                claves=lambda j=j: saldos[:, j],
+            ))
+        # Total en negrita y en rojo si es negativo
+        columnas.append(Columna(
+            'TOTAL', lambda i: float(totales[i]), lambda v: f"{v:,.2f}", DERECHA,
+            fondo=lambda i: rojo_claro if totales[i] < 0 else None, negrita=lambda i: True,
+            claves=lambda: totales,
+        ))
+        num_columns = len(columnas)
+        poner_modelo(self.results_table, ModeloColumnas(len(resultados), columnas))
         
         # Ajustar tamaño de columnas
         self.results_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         for i in range(1, num_columns):
             self.results_table.horizontalHeader().setSectionResizeMode(i, QHeaderView.Stretch)
+    
+    # -------------------------------------------------------------
+    # Modo Monte Carlo (utils/montecarlo.py)
+    # -------------------------------------------------------------
+    def run_montecarlo(self, fecha_inicio, fecha_fin, intervalo, cuentas, variables):
+        """
+        Prepara aquí lo que necesita la BD (camino base y muestras históricas) y simula
+        los caminos en MonteCarloWorker (pool de procesos) con barra de progreso.
+        """
+        if self._mc_worker is not None:
+            return
+        if not distribucion_disponible(self.session):
+            QMessageBox.warning(self, "Monte Carlo",
+                                "La base de datos no tiene las columnas de distribución de las variables.\n"
+                                "Ejecuta migrations/add_distribucion_migration.py.")
+            return
+        cargar_distribuciones(self.session, variables)
+        fechas, base, aleatorias = preparar_montecarlo(self.session, fecha_inicio, fecha_fin, intervalo,
+                                                       cuentas, variables)
+        if not aleatorias:
+            QMessageBox.information(self, "Monte Carlo",
+                                    "Ninguna variable activa tiene distribución normal o histórica: "
+                                    "todos los caminos coinciden con la simulación normal.")
+        n_caminos = self.caminos_input.value()
+        dialogo = QProgressDialog(f"Simulando {n_caminos} caminos…", "Cancelar", 0, 100, self)
+        dialogo.setWindowTitle("Simulación Monte Carlo")
+        dialogo.setWindowModality(Qt.WindowModal)
+        dialogo.setMinimumDuration(0)
+        dialogo.setAutoClose(False)
+        dialogo.setAutoReset(False)
+        
+        worker = MonteCarloWorker(fechas, base, aleatorias, n_caminos)
+        worker.signals.progreso.connect(dialogo.setValue)
+        worker.signals.resultado.connect(self._on_montecarlo_terminado)
+        worker.signals.error.connect(
+            lambda mensaje: QMessageBox.warning(self, "Error", f"Error en la simulación Monte Carlo: {mensaje}"))
+        worker.signals.terminado.connect(self._on_montecarlo_fin)
+        dialogo.canceled.connect(worker.cancelar)
+        self._mc_worker, self._mc_dialogo = worker, dialogo
+        self.cuentas_cache = cuentas
+        dialogo.setValue(0)
+        QThreadPool.globalInstance().start(worker)
+    
+    def _on_montecarlo_fin(self):
+        if self._mc_dialogo is not None:
+            self._mc_dialogo.close()
+            self._mc_dialogo.deleteLater()
+            self._mc_dialogo = None
+        self._mc_worker = None
+    
+    def _on_montecarlo_terminado(self, resultado):
+        self.montecarlo_cache = resultado
+        self.resultados_cache = None
+        self.display_montecarlo(resultado, self.cuentas_cache)
+        self.export_btn.setEnabled(True)
+    
+    def _nombres_series(self, cuentas):
+        return [c.nombre for c in cuentas] + ['TOTAL']
+    
+    def display_montecarlo(self, resultado, cuentas):
+        """
+        Mostrar el resultado Monte Carlo: P5/P50/P95 de cada cuenta (y del total) por fecha,
+        la probabilidad de saldo negativo en el periodo y las bandas de la serie elegida.
+        """
+        fechas = resultado['fechas']
+        p5, p50, p95 = resultado['p5'], resultado['p50'], resultado['p95']
+        nombres = self._nombres_series(cuentas)
+        rojo_claro = QColor(255, 200, 200)
+        
+        # percentiles negativos en rojo: P5 < 0 = al menos un 5% de los caminos en negativo ese día
+        columnas = [Columna('Fecha', lambda i: fechas[i], lambda f: f.strftime('%d/%m/%Y'))]
+        for j, nombre in enumerate(nombres):
+            for etiqueta, matriz in (('P5', p5), ('P50', p50), ('P95', p95)):
+                columnas.append(Columna(
+                    f"{nombre} {etiqueta}", lambda i, j=j, m=matriz: float(m[j, i]), lambda v: f"{v:,.2f}", DERECHA,
+                    fondo=lambda i, j=j, m=matriz: rojo_claro if m[j, i] < 0 else None,
+                    negrita=(lambda i: True) if j == len(cuentas) else None,
+                    claves=lambda j=j, m=matriz: m[j],
+                ))
+        poner_modelo(self.results_table, ModeloColumnas(len(fechas), columnas))
+        self.results_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        for i in range(1, len(columnas)):
+            self.results_table.horizontalHeader().setSectionResizeMode(i, QHeaderView.Stretch)
+        
+        probabilidades = " · ".join(f"{nombre}: {p:.1%}" for nombre, p in zip(nombres, resultado['prob_negativo']))
+        self.prob_label.setText(f"Probabilidad de saldo negativo en el periodo ({resultado['caminos']} caminos): "
+                                f"{probabilidades}")
+        self.prob_label.show()
+        
+        if self.canvas_bandas is None:
+            self.fig_bandas = Figure(figsize=(8, 3))
+            self.canvas_bandas = FigureCanvas(self.fig_bandas)
+            self.canvas_bandas.setMinimumHeight(220)
+            self.banda_widget.layout().addWidget(self.canvas_bandas)
+        self.serie_combo.blockSignals(True)
+        anterior = self.serie_combo.currentText()
+        self.serie_combo.clear()
+        self.serie_combo.addItems(nombres)
+        self.serie_combo.setCurrentIndex(max(self.serie_combo.findText(anterior), 0) if anterior else len(nombres) - 1)
+        self.serie_combo.blockSignals(False)
+        self.banda_widget.show()
+        self.dibujar_bandas()
+    
+    def dibujar_bandas(self, *_):
+        """Banda P5–P95 y mediana de la cuenta (o el total) elegida en el desplegable"""
+        if self.montecarlo_cache is None or self.fig_bandas is None:
+            return
+        j = self.serie_combo.currentIndex()
+        if j < 0:
+            return
+        r = self.montecarlo_cache
+        self.fig_bandas.clear()
+        ax = self.fig_bandas.add_subplot(111)
+        ax.fill_between(r['fechas'], r['p5'][j], r['p95'][j], alpha=0.25, label='P5–P95')
+        ax.plot(r['fechas'], r['p50'][j], label='P50')
+        ax.axhline(0, color='red', linewidth=0.8)
+        ax.set_title(f"{self.serie_combo.currentText()} · P(saldo < 0) = {r['prob_negativo'][j]:.1%}")
+        ax.legend(loc='best')
+        self.fig_bandas.autofmt_xdate()
+        self.canvas_bandas.draw_idle()
+    
+    def export_montecarlo_to_csv(self):
+        """Exportar los percentiles Monte Carlo (y la probabilidad de saldo negativo) a CSV"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Guardar simulación Monte Carlo como CSV",
+            "simulacion_montecarlo.csv",
+            "Archivos CSV (*.csv);;Todos los archivos (*.*)"
+        )
+        if not file_path:
+            return
+        
+        r = self.montecarlo_cache
+        nombres = self._nombres_series(self.cuentas_cache)
+        try:
+            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile, delimiter=';')
+                writer.writerow(['Fecha'] + [f"{n} {p}" for n in nombres for p in ('P5', 'P50', 'P95')])
+                for i, fecha in enumerate(r['fechas']):
+                    writer.writerow([fecha.strftime('%d/%m/%Y')] + [
+                        f"{m[j, i]:.2f}" for j in range(len(nombres)) for m in (r['p5'], r['p50'], r['p95'])
+                    ])
+                writer.writerow(['P(saldo negativo)'] + [
+                    valor for p in r['prob_negativo'] for valor in (f"{p:.4f}", '', '')
+                ])
+            QMessageBox.information(self, "Éxito", f"Simulación exportada correctamente a:\n{file_path}")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo exportar el archivo: {e}")
@@ -0,0 +1,234 @@
+# ui/table_models.py
+"""
+Modelos de tabla virtualizados (model/view) para resultados grandes.
+
+En vez de crear un QTableWidgetItem por celda (con colores y formato aplicados de
+antemano), la tabla es un QAbstractTableModel sobre los datos en columnas: Qt solo
+pide data() de las filas visibles, así que el texto, el color y la negrita se
+calculan al vuelo para esas filas. Ordenar y filtrar pasa por un proxy
+(ProxyColumnas, ver crear_vista_tabla), pero sin comparar celda a celda a través de
+data(): el orden es una permutación que calcula el modelo de una pasada sobre los
+valores crudos, y el filtro una máscara sobre el texto de cada fila (cacheado).
+"""
+import numpy as np
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QTableView, QHeaderView, QAbstractItemView
+
+# Rol con el valor crudo de la celda (número, fecha...), por si otra vista lo necesita
+ROL_VALOR = Qt.UserRole
+
+DERECHA = Qt.AlignRight | Qt.AlignVCenter
+CENTRO = Qt.AlignCenter
+
+# Roles resueltos una vez: leer Qt.<Rol> en cada llamada a data() cuesta varios µs
+_DISPLAY = Qt.DisplayRole
+_ALINEACION = Qt.TextAlignmentRole
+_FONDO = Qt.BackgroundRole
+_COLOR = Qt.ForegroundRole
+_FUENTE = Qt.FontRole
+_HORIZONTAL = Qt.Horizontal
+
+
+def _crudo(valor):
+    """Escalares de NumPy a tipos de Python (Qt no sabe convertir np.float64/np.datetime64)."""
+    item = getattr(valor, "item", None)
+    return item() if item is not None else valor
+
+
+class Columna:
+    """
+    Definición de una columna:
+    - valor(fila) -> valor crudo (para ordenar y para formatear)
+    - texto(valor) -> str mostrado (por defecto str; None se muestra vacío)
+    - fondo(fila) / color(fila) -> QColor o None; negrita(fila) -> bool
+    - textos() -> lista con el texto de todas las filas (opcional): si los datos están en
+      arrays, el filtro prepara su caché de una vez en lugar de formatear fila a fila
+    - claves() -> array NumPy con el valor crudo de todas las filas (opcional): ordenar es
+      entonces un argsort en lugar de leer el valor fila a fila
+    """
+    def __init__(self, titulo, valor, texto=str, alineacion=None, fondo=None, color=None, negrita=None,
+                 textos=None, claves=None):
+        self.titulo = titulo
+        self.valor = valor
+        self.texto = texto
+        self.alineacion = alineacion
+        self.fondo = fondo
+        self.color = color
+        self.negrita = negrita
+        self.textos = textos
+        self.claves = claves
+
+
+class ModeloColumnas(QAbstractTableModel):
+    """Modelo de solo lectura de n_filas filas definido por una lista de Columna."""
+
+    def __init__(self, n_filas: int, columnas, parent=None):
+        super().__init__(parent)
+        self.n_filas = n_filas
+        self.columnas = list(columnas)
+        self._negrita = QFont()
+        self._negrita.setBold(True)
+        self._orden = None   # permutación fila mostrada -> fila de datos (None = orden original)
+        self._textos = None  # texto en minúsculas de cada fila de datos (para filtrar)
+
+    def fila_datos(self, fila: int) -> int:
+        """Fila de datos que se muestra en la posición `fila` según el orden actual."""
+        return fila if self._orden is None else int(self._orden[fila])
+
+    def ordenar(self, columna: int, orden=Qt.AscendingOrder):
+        """
+        Ordena por el valor crudo de la columna con un único sort en Python (estable; los
+        vacíos van al final). columna < 0 vuelve al orden original.
+        """
+        self.layoutAboutToBeChanged.emit()
+        if columna < 0 or columna >= len(self.columnas):
+            self._orden = None
+        elif self.columnas[columna].claves is not None:
+            claves = np.asarray(self.columnas[columna].claves())
+            orden_idx = np.argsort(claves, kind="stable")
+            if orden == Qt.DescendingOrder:
+                # descendente y estable: invertir el orden ascendente de las claves invertidas
+                orden_idx = (len(claves) - 1 - np.argsort(claves[::-1], kind="stable"))[::-1]
+            self._orden = orden_idx
+        else:
+            valor = self.columnas[columna].valor
+            claves = [_crudo(valor(i)) for i in range(self.n_filas)]
+            llenas = [i for i, v in enumerate(claves) if v is not None]
+            vacias = [i for i, v in enumerate(claves) if v is None]
+            try:
+                llenas.sort(key=claves.__getitem__, reverse=(orden == Qt.DescendingOrder))
+            except TypeError:
+                # tipos mezclados en la columna: se ordena por el texto
+                llenas.sort(key=lambda i: str(claves[i]), reverse=(orden == Qt.DescendingOrder))
+            self._orden = np.asarray(llenas + vacias, dtype=np.int64)
+        self.layoutChanged.emit()
+
+    def coincidencias(self, texto: str):
+        """
+        Máscara (por fila de datos) de las filas cuyo texto mostrado en alguna columna contiene
+        `texto` sin distinguir mayúsculas. El texto de las filas se calcula la primera vez.
+        """
+        if self._textos is None:
+            por_columna = [
+                col.textos() if col.textos is not None
+                else [self._texto(col, i) for i in range(self.n_filas)]
+                for col in self.columnas
+            ]
+            self._textos = ["\t".join(fila).lower() for fila in zip(*por_columna)]
+        texto = texto.lower()
+        return np.fromiter((texto in t for t in self._textos), dtype=bool, count=self.n_filas)
+
+    def _texto(self, col, fila):
+        valor = col.valor(fila)
+        return "" if valor is None else col.texto(valor)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.n_filas
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columnas)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == _DISPLAY and orientation == _HORIZONTAL:
+            return self.columnas[section].titulo
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        col = self.columnas[index.column()]
+        fila = self.fila_datos(index.row())
+        try:
+            if role == _DISPLAY:
+                return self._texto(col, fila)
+            if role == ROL_VALOR:
+                return _crudo(col.valor(fila))
+            if role == _ALINEACION:
+                return col.alineacion
+            if role == _FONDO and col.fondo is not None:
+                return col.fondo(fila)
+            if role == _COLOR and col.color is not None:
+                return col.color(fila)
+            if role == _FUENTE and col.negrita is not None and col.negrita(fila):
+                return self._negrita
+        except Exception as e:
+            print(f"DEBUG tabla fila {fila} columna {col.titulo}: {e}")
+        return None
+
+
+class ProxyColumnas(QSortFilterProxyModel):
+    """
+    Proxy delante de un ModeloColumnas. sort() delega en ModeloColumnas.ordenar (el proxy
+    no ordena por su cuenta) y el filtro es una máscara precalculada por fila de datos,
+    así que filterAcceptsRow no llama a data().
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._mascara = None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        modelo = self.sourceModel()
+        if isinstance(modelo, ModeloColumnas):
+            modelo.ordenar(column, order)
+
+    def poner_filtro(self, texto: str):
+        modelo = self.sourceModel()
+        texto = (texto or "").strip()
+        nueva = modelo.coincidencias(texto) if texto and isinstance(modelo, ModeloColumnas) else None
+        if nueva is None and self._mascara is None:
+            return
+        self._mascara = nueva
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._mascara is None:
+            return True
+        return bool(self._mascara[self.sourceModel().fila_datos(source_row)])
+
+
+def crear_vista_tabla(parent=None):
+    """
+    QTableView de solo lectura con un ProxyColumnas delante (ordenar por el valor crudo,
+    filtrar por el texto de todas las columnas). Asignar el modelo con poner_modelo().
+    """
+    vista = QTableView(parent)
+    vista.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    vista.setSelectionBehavior(QAbstractItemView.SelectRows)
+    vista.setModel(ProxyColumnas(vista))
+    # alto de fila fijo: con 100k filas Qt no mide cada una
+    vista.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    vista.verticalHeader().setDefaultSectionSize(vista.fontMetrics().height() + 8)
+    # resizeColumnsToContents mide solo unas filas (las visibles y unas cuantas más), no todas
+    vista.horizontalHeader().setResizeContentsPrecision(200)
+    # sin indicador inicial: se abre en el orden original y se ordena al pulsar la cabecera
+    vista.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+    vista.setSortingEnabled(True)
+    return vista
+
+
+def poner_modelo(vista, modelo):
+    """
+    Sustituye el modelo fuente del proxy de la vista (el anterior se libera). Se mantienen
+    el orden elegido en la cabecera y el texto de filtro.
+    """
+    proxy = vista.model()
+    anterior = proxy.sourceModel()
+    texto = getattr(vista, "_texto_filtro", "")
+    modelo.setParent(vista)
+    proxy._mascara = None
+    proxy.setSourceModel(modelo)
+    if anterior is not None:
+        anterior.deleteLater()
+    cabecera = vista.horizontalHeader()
+    if cabecera.sortIndicatorSection() >= 0:
+        modelo.ordenar(cabecera.sortIndicatorSection(), cabecera.sortIndicatorOrder())
+    if texto:
+        proxy.poner_filtro(texto)
+
+
+def filtrar(vista, texto: str):
+    """Filtra las filas cuyo texto (en cualquier columna) contiene `texto`."""
+    vista._texto_filtro = texto
+    vista.model().poner_filtro(texto)
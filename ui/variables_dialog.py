@@ -3,8 +3,10 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
                                QFormLayout, QLineEdit, QComboBox, QDoubleSpinBox, QCheckBox,
                                QDialogButtonBox, QDateEdit)
 from PySide6.QtCore import Qt, QDate
-from models.simulation_variable import SimulationVariable
+from models.simulation_variable import (SimulationVariable, COLUMNAS_MONTECARLO, distribucion_disponible,
+                                        cargar_distribuciones, guardar_distribucion)
 from models.account import Account
+from utils.montecarlo import DISTRIBUCIONES
 from datetime import date
 
 
@@ -16,7 +18,7 @@ class VariableEditDialog(QDialog):
         self.variable = variable
         self.setWindowTitle("Editar Variable" if variable else "Nueva Variable")
         self.setModal(True)
-        self.resize(400, 250)
+        self.resize(400, 330)
         
         self.setup_ui()
         if variable:
@@ -54,6 +56,28 @@ class VariableEditDialog(QDialog):
         self.fecha_inicio_input.setDate(QDate.currentDate())
         layout.addRow("Fecha Inicio:", self.fecha_inicio_input)
         
+        # Distribución del importe en la simulación Monte Carlo (utils/montecarlo.py)
+        self.distribucion_combo = QComboBox()
+        self.distribucion_combo.addItems(DISTRIBUCIONES)
+        self.distribucion_combo.setToolTip("fija: siempre el importe · normal: importe ± desviación típica · "
+                                           "historica: remuestrea lo gastado en el pasado con ese concepto")
+        self.distribucion_combo.currentTextChanged.connect(self.actualizar_distribucion)
+        layout.addRow("Distribución:", self.distribucion_combo)
+        
+        self.desviacion_input = QDoubleSpinBox()
+        self.desviacion_input.setRange(0, 999999999.99)
+        self.desviacion_input.setDecimals(2)
+        layout.addRow("Desviación típica:", self.desviacion_input)
+        
+        self.patron_input = QLineEdit()
+        self.patron_input.setPlaceholderText("Texto de las transacciones (por defecto la descripción)")
+        layout.addRow("Patrón histórico:", self.patron_input)
+        self.actualizar_distribucion(self.distribucion_combo.currentText())
+        if not distribucion_disponible(self.session):
+            self.distribucion_combo.setEnabled(False)
+            self.distribucion_combo.setToolTip("Ejecuta migrations/add_distribucion_migration.py para usar "
+                                               "distribuciones en la simulación Monte Carlo")
+        
         # Activo
         self.activo_check = QCheckBox("Variable activa")
         self.activo_check.setChecked(True)
@@ -89,6 +113,17 @@ class VariableEditDialog(QDialog):
                                                    self.variable.fecha_inicio.day))
         
         self.activo_check.setChecked(bool(self.variable.activo))
+        
+        index = self.distribucion_combo.findText(self.variable.distribucion or 'fija')
+        if index >= 0:
+            self.distribucion_combo.setCurrentIndex(index)
+        self.desviacion_input.setValue(float(self.variable.desviacion or 0))
+        self.patron_input.setText(self.variable.patron_historico or '')
+    
+    def actualizar_distribucion(self, distribucion):
+        """Habilitar solo los parámetros de la distribución elegida"""
+        self.desviacion_input.setEnabled(distribucion == 'normal')
+        self.patron_input.setEnabled(distribucion == 'historica')
     
     def get_data(self):
         """Obtener datos del formulario"""
@@ -98,7 +133,10 @@ class VariableEditDialog(QDialog):
             'importe': self.importe_input.value(),
             'frecuencia': self.frecuencia_combo.currentText(),
             'fecha_inicio': self.fecha_inicio_input.date().toPython(),
-            'activo': 1 if self.activo_check.isChecked() else 0
+            'activo': 1 if self.activo_check.isChecked() else 0,
+            'distribucion': self.distribucion_combo.currentText(),
+            'desviacion': self.desviacion_input.value() or None,
+            'patron_historico': self.patron_input.text().strip() or None
         }
 
 
@@ -119,8 +157,8 @@ class VariablesDialog(QDialog):
         
         # Tabla de variables
         self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(['ID', 'Descripción', 'Cuenta', 'Importe', 'Frecuencia', 'Fecha Inicio', 'Activo'])
+        self.table.setColumnCount(8)
+        self.table.setHorizontalHeaderLabels(['ID', 'Descripción', 'Cuenta', 'Importe', 'Frecuencia', 'Fecha Inicio', 'Distribución', 'Activo'])
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
@@ -153,6 +191,7 @@ class VariablesDialog(QDialog):
         """Recargar la tabla de variables"""
         try:
             variables = self.session.query(SimulationVariable).order_by(SimulationVariable.id).all()
+            cargar_distribuciones(self.session, variables)
             
             self.table.setRowCount(len(variables))
             for row, var in enumerate(variables):
@@ -163,7 +202,13 @@ class VariablesDialog(QDialog):
                 self.table.setItem(row, 4, QTableWidgetItem(var.frecuencia))
                 fecha_str = var.fecha_inicio.strftime('%d/%m/%Y') if var.fecha_inicio else 'No definida'
                 self.table.setItem(row, 5, QTableWidgetItem(fecha_str))
-                self.table.setItem(row, 6, QTableWidgetItem('Sí' if var.activo else 'No'))
+                distribucion = var.distribucion or 'fija'
+                if distribucion == 'normal':
+                    distribucion += f" ±{float(var.desviacion or 0):.2f}"
+                elif distribucion == 'historica':
+                    distribucion += f" '{var.patron_historico or var.descripcion}'"
+                self.table.setItem(row, 6, QTableWidgetItem(distribucion))
+                self.table.setItem(row, 7, QTableWidgetItem('Sí' if var.activo else 'No'))
                 
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error al cargar variables: {e}")
@@ -178,8 +223,11 @@ class VariablesDialog(QDialog):
                     QMessageBox.warning(self, "Error", "La descripción es obligatoria")
                     return
                 
+                parametros = {c: data.pop(c) for c in COLUMNAS_MONTECARLO}
                 variable = SimulationVariable(**data)
                 self.session.add(variable)
+                self.session.flush()
+                guardar_distribucion(self.session, variable, **parametros)
                 self.session.commit()
                 self.refresh()
                 QMessageBox.information(self, "Éxito", "Variable creada correctamente")
@@ -201,6 +249,7 @@ class VariablesDialog(QDialog):
             if not variable:
                 QMessageBox.warning(self, "Error", "Variable no encontrada")
                 return
+            cargar_distribuciones(self.session, [variable])
             
             dialog = VariableEditDialog(self.session, variable, parent=self)
             if dialog.exec() == QDialog.Accepted:
@@ -209,9 +258,12 @@ class VariablesDialog(QDialog):
                     QMessageBox.warning(self, "Error", "La descripción es obligatoria")
                     return
                 
+                parametros = {c: data.pop(c) for c in COLUMNAS_MONTECARLO}
                 for key, value in data.items():
                     setattr(variable, key, value)
                 
+                self.session.flush()
+                guardar_distribucion(self.session, variable, **parametros)
                 self.session.commit()
                 self.refresh()
                 QMessageBox.information(self, "Éxito", "Variable actualizada correctamente")
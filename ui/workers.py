@@ -0,0 +1,218 @@
+# ui/workers.py
+"""
+Trabajo de base de datos fuera del hilo de la UI (QThreadPool).
+
+Cada worker abre su propia sesión con db.session_scope() y devuelve el resultado
+por señales; Qt entrega la señal en el hilo de la UI, donde ya se pueden tocar widgets.
+"""
+from datetime import date
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from database import db
+from utils.reconciler import calcular_saldos_todas_cuentas
+from utils.importer import importar_csv, importar_ficheros, ImportacionCancelada
+from utils.montecarlo import simular_montecarlo, SimulacionCancelada
+
+
+class WorkerSignals(QObject):
+    """Señales de un worker: resultado u error, y siempre terminado al final."""
+    resultado = Signal(object)
+    error = Signal(str)
+    terminado = Signal()
+
+
+class DBWorker(QRunnable):
+    """
+    Ejecuta funcion(session, *args) en un hilo del pool con una sesión propia
+    y emite signals.resultado con lo que devuelva.
+    """
+    def __init__(self, funcion, *args):
+        super().__init__()
+        self.funcion = funcion
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            with db.session_scope() as session:
+                resultado = self.funcion(session, *self.args)
+        except Exception as e:
+            print(f"DEBUG worker {getattr(self.funcion, '__name__', self.funcion)}: {e}")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.resultado.emit(resultado)
+        finally:
+            self.signals.terminado.emit()
+
+
+class SaldosCuentasSignals(QObject):
+    saldo_listo = Signal(int, int, float)  # (id de carga, cuenta_id, saldo)
+    error = Signal(int, str)               # (id de carga, mensaje)
+
+
+class SaldosCuentasWorker(QRunnable):
+    """
+    Calcula en segundo plano el saldo a `fecha` de las tarjetas de cuenta y lo envía
+    cuenta a cuenta. `carga_id` permite a la UI descartar resultados de una carga
+    anterior (p.ej. si se ha cambiado el modo filtro mientras tanto).
+    """
+    def __init__(self, carga_id: int, cuenta_ids, fecha: date):
+        super().__init__()
+        self.carga_id = carga_id
+        self.cuenta_ids = list(cuenta_ids)
+        self.fecha = fecha
+        self.signals = SaldosCuentasSignals()
+
+    def run(self):
+        try:
+            with db.session_scope() as session:
+                saldos = calcular_saldos_todas_cuentas(session, self.fecha)
+        except Exception as e:
+            print(f"Error calculando saldos de las cuentas: {e}")
+            self.signals.error.emit(self.carga_id, str(e))
+            return
+        for cuenta_id in self.cuenta_ids:
+            if cuenta_id in saldos:
+                self.signals.saldo_listo.emit(self.carga_id, cuenta_id, saldos[cuenta_id])
+
+
+class ConexionWorker(QRunnable):
+    """
+    Sondeo de la BD (db.probe_connection) fuera del hilo de la UI: con el servidor
+    caído tarda hasta el timeout de conexión sin congelar la ventana.
+    Emite signals.resultado con (ok, mensaje_error).
+    """
+    def __init__(self):
+        super().__init__()
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            self.signals.resultado.emit(db.probe_connection())
+        except Exception as e:
+            print(f"DEBUG worker probe_connection: {e}")
+            self.signals.resultado.emit((False, str(e)))
+        finally:
+            self.signals.terminado.emit()
+
+
+class ImportSignals(QObject):
+    progreso = Signal(int, int)  # (porcentaje, filas insertadas)
+    resultado = Signal(object)   # dict de importar_csv
+    cancelado = Signal()
+    error = Signal(str)
+    terminado = Signal()
+
+
+class ImportWorker(QRunnable):
+    """
+    Importa un fichero CSV/TSV de movimientos (utils/importer.importar_csv) fuera del hilo
+    de la UI, informando del progreso por lotes. cancelar() se puede llamar desde la UI:
+    la importación se detiene antes del siguiente lote y se deshace entera.
+    """
+    def __init__(self, ruta: str, cuenta_id: int):
+        super().__init__()
+        self.ruta = ruta
+        self.cuenta_id = cuenta_id
+        self._cancelar = False
+        self.signals = ImportSignals()
+
+    def cancelar(self):
+        self._cancelar = True
+
+    def run(self):
+        try:
+            with db.session_scope() as session:
+                resultado = importar_csv(
+                    session, self.ruta, self.cuenta_id,
+                    progreso=self.signals.progreso.emit,
+                    cancelado=lambda: self._cancelar,
+                )
+        except ImportacionCancelada:
+            self.signals.cancelado.emit()
+        except Exception as e:
+            print(f"DEBUG worker importar_csv {self.ruta}: {e}")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.resultado.emit(resultado)
+        finally:
+            self.signals.terminado.emit()
+
+
+class ImportCarpetaWorker(QRunnable):
+    """
+    Importa varios ficheros, cada uno en su cuenta ({ruta: cuenta_id}), con
+    utils/importer.importar_ficheros: se parsean en un pool de procesos y este hilo
+    inserta lo parseado. Mismas señales y misma cancelación que ImportWorker.
+    """
+    def __init__(self, asignacion: dict):
+        super().__init__()
+        self.asignacion = dict(asignacion)
+        self._cancelar = False
+        self.signals = ImportSignals()
+
+    def cancelar(self):
+        self._cancelar = True
+
+    def run(self):
+        try:
+            with db.session_scope() as session:
+                resultado = importar_ficheros(
+                    session, self.asignacion,
+                    progreso=self.signals.progreso.emit,
+                    cancelado=lambda: self._cancelar,
+                )
+        except ImportacionCancelada:
+            self.signals.cancelado.emit()
+        except Exception as e:
+            print(f"DEBUG worker importar_ficheros: {e}")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.resultado.emit(resultado)
+        finally:
+            self.signals.terminado.emit()
+
+
+class MonteCarloSignals(QObject):
+    progreso = Signal(int)       # porcentaje de bloques de fechas calculados
+    resultado = Signal(object)   # dict de simular_montecarlo
+    cancelado = Signal()
+    error = Signal(str)
+    terminado = Signal()
+
+
+class MonteCarloWorker(QRunnable):
+    """
+    Simulación Monte Carlo (utils/montecarlo.simular_montecarlo) fuera del hilo de la UI,
+    con los bloques de fechas repartidos en un pool de procesos. No usa la BD: recibe lo
+    que devuelve preparar_montecarlo(). cancelar() la detiene antes del siguiente bloque.
+    """
+    def __init__(self, fechas, base, aleatorias, n_caminos: int):
+        super().__init__()
+        self.fechas = fechas
+        self.base = base
+        self.aleatorias = aleatorias
+        self.n_caminos = n_caminos
+        self._cancelar = False
+        self.signals = MonteCarloSignals()
+
+    def cancelar(self):
+        self._cancelar = True
+
+    def run(self):
+        try:
+            resultado = simular_montecarlo(
+                self.fechas, self.base, self.aleatorias, self.n_caminos,
+                progreso=self.signals.progreso.emit,
+                cancelado=lambda: self._cancelar,
+            )
+        except SimulacionCancelada:
+            self.signals.cancelado.emit()
+        except Exception as e:
+            print(f"DEBUG worker simular_montecarlo: {e}")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.resultado.emit(resultado)
+        finally:
+            self.signals.terminado.emit()
@@ -0,0 +1,773 @@
+# utils/importer.py
+"""
+Importación de movimientos desde ficheros CSV/TSV (Fecha, Descripcion, Monto).
+
+El fichero no se carga entero: se lee en streaming con csv.reader, las filas se
+agrupan en lotes de FILAS_POR_LOTE, cada lote se parsea y se inserta con un único
+insert() de Core en modo executemany (sin crear un objeto ORM por fila). Todo va en
+una transacción: si se cancela o falla, no queda nada a medias.
+
+El formato de fecha y el separador decimal se detectan una vez por fichero a partir de
+una muestra (detectar_formato); con eso las columnas de fecha e importe de cada lote se
+convierten de golpe con NumPy, y solo las filas que no encajan pasan por el parser
+flexible fila a fila (parsear_fecha), que es el que decide si son errores.
+
+Cada fila lleva una huella de contenido (models.transaction.hash_contenido, con índice
+único en la BD); las que ya existen en la cuenta se saltan como duplicadas, así que
+reimportar un extracto que se solapa con otro no duplica movimientos. Las huellas
+existentes se cargan en un set solo para las fechas que trae el fichero.
+
+Las filas que no se pueden importar se escriben en "<fichero>.errors.csv" según se
+encuentran. Como el insert de Core no pasa por los hooks de sesión, al terminar se
+borran a mano los checkpoints de saldo afectados y se invalida el ledger en memoria.
+
+importar_ficheros importa de una vez una carpeta de extractos (cada fichero en la cuenta
+que le asigna asignar_cuentas por patrón de nombre): los ficheros se parsean en paralelo
+en un pool de procesos y esta sesión inserta lo parseado según llega (un único escritor).
+
+No depende de Qt: la UI lo ejecuta en un worker (ui/workers.ImportWorker e
+ImportCarpetaWorker) y le pasa callbacks de progreso y de cancelación.
+"""
+import csv
+import fnmatch
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from sqlalchemy import insert, delete, select
+
+from models.transaction import Transaction, hash_contenido, normalizar_descripcion, hash_disponible
+from models.balance_checkpoint import BalanceCheckpoint, checkpoints_disponibles
+from utils.money import a_centimos, a_decimal, centimos_array
+
+# Filas por lote: cada lote es un executemany y un aviso de progreso
+FILAS_POR_LOTE = 5000
+# Bytes que se leen para detectar el delimitador y los formatos de fecha e importe
+TAMANO_MUESTRA = 8192
+
+
+class ImportacionCancelada(Exception):
+    """La importación se canceló desde la UI (ya se ha hecho rollback)."""
+
+
+def detectar_delimitador(muestra: str) -> str:
+    """Delimitador probable (coma, tabulador o punto y coma) a partir de una muestra del fichero."""
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=[",", "\t", ";"]).delimiter
+    except Exception:
+        # fallback heurístico: si hay tabs en la muestra preferimos tab
+        return "\t" if "\t" in muestra else ","
+
+
+def es_cabecera(celdas: List[str]) -> bool:
+    """True si la fila parece una cabecera (nombra una columna de fecha y otra de importe)."""
+    cabecera = [c.strip().lower() for c in celdas]
+    return (any(h in cabecera for h in ("fecha", "date"))
+            and any(h in cabecera for h in ("monto", "importe", "amount", "value")))
+
+
+# Formatos de fecha aceptados, en orden de preferencia. Para cada uno: posición del
+# año, del mes y del día en el texto de ancho fijo (10 caracteres), separador y
+# posiciones de los separadores; así se parsean de golpe con NumPy (fechas_vectorizadas).
+FORMATOS_FECHA = {
+    "%Y-%m-%d": (0, 5, 8, "-", (4, 7)),
+    "%d/%m/%Y": (6, 3, 0, "/", (2, 5)),
+    "%d-%m-%Y": (6, 3, 0, "-", (2, 5)),
+    "%Y/%m/%d": (0, 5, 8, "/", (4, 7)),
+}
+
+# Importe con separador de miles bien agrupado ("1.234.567,89" / "1,234,567.89")
+_AGRUPADO = {
+    ".": re.compile(r"[-+]?\d{1,3}(?:\.\d{3})+(?:,\d*)?"),
+    ",": re.compile(r"[-+]?\d{1,3}(?:,\d{3})+(?:\.\d*)?"),
+}
+
+
+class FormatoFichero:
+    """
+    Convenciones de un extracto, detectadas una sola vez por fichero (detectar_formato):
+    delimitador, formato de fecha (clave de FORMATOS_FECHA o None) y separador decimal.
+    """
+
+    def __init__(self, delimitador: str = ",", formato_fecha: str | None = None, decimal: str = "."):
+        self.delimitador = delimitador
+        self.formato_fecha = formato_fecha
+        self.decimal = decimal
+
+    def __repr__(self):
+        return f"<FormatoFichero delimitador={self.delimitador!r} fecha={self.formato_fecha} decimal={self.decimal!r}>"
+
+
+def _limpiar_celdas(fila: List[str]) -> List[str]:
+    """Celdas sin comillas externas ni espacios."""
+    return [c.strip().strip('"').strip("'") for c in fila]
+
+
+def _separador_decimal(importe: str) -> str | None:
+    """
+    Separador decimal que sugiere un importe: el último de "," o "." si le siguen 1 o 2
+    cifras ("12,5", "1.234,56"), el otro si le siguen 3 y hay ambos ("1.234" no decide).
+    """
+    importe = importe.strip("()-+ ")
+    pos = max(importe.rfind(","), importe.rfind("."))
+    if pos < 0:
+        return None
+    ultimo = importe[pos]
+    otro = "." if ultimo == "," else ","
+    cifras = len(importe) - pos - 1
+    if cifras in (1, 2):
+        return ultimo
+    if cifras == 3 and otro in importe[:pos]:
+        return otro
+    return None
+
+
+def detectar_formato(muestra: str) -> FormatoFichero:
+    """
+    Detecta delimitador, formato de fecha y separador decimal a partir de las primeras
+    líneas del fichero: cada fila de la muestra vota y gana el formato más votado.
+    """
+    delimitador = detectar_delimitador(muestra)
+    lineas = muestra.splitlines()
+    if len(muestra) >= TAMANO_MUESTRA:
+        lineas = lineas[:-1]  # la última línea de la muestra puede estar cortada
+    filas = [_limpiar_celdas(f) for f in csv.reader(lineas, delimiter=delimitador)]
+    if filas and es_cabecera(filas[0]):
+        filas = filas[1:]
+    filas = [f for f in filas if len(f) >= 2]
+
+    votos_fecha = Counter()
+    for f in filas:
+        for formato in FORMATOS_FECHA:
+            try:
+                datetime.strptime(f[0], formato)
+            except ValueError:
+                continue
+            votos_fecha[formato] += 1
+            break
+    votos_decimal = Counter(_separador_decimal(f[2]) for f in filas if len(f) >= 3)
+    return FormatoFichero(
+        delimitador=delimitador,
+        formato_fecha=votos_fecha.most_common(1)[0][0] if votos_fecha else None,
+        decimal="," if votos_decimal[","] > votos_decimal["."] else ".",
+    )
+
+
+def parsear_fecha(s) -> date | None:
+    """Fecha en los formatos habituales de extractos (ISO, dd/mm/aaaa...); None si no se reconoce."""
+    if s is None:
+        return None
+    s = str(s).strip().strip('"').strip("'")
+    if not s:
+        return None
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(s, formato).date()
+        except Exception:
+            pass
+    # fallback: intentar split por /
+    try:
+        partes = [p for p in s.replace("-", "/").split("/") if p]
+        if len(partes) == 3:
+            d, m, y = partes
+            if len(y) == 4:
+                # suponer formato día/mes/año o año/mes/día si el primero tiene 4 dígitos
+                if len(d) == 4:
+                    return datetime(int(d), int(m), int(y)).date()
+                return datetime(int(y), int(m), int(d)).date()
+    except Exception:
+        pass
+    return None
+
+
+def fechas_vectorizadas(textos: List[str], formato_fecha: str | None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parsea de golpe con NumPy las fechas de ancho fijo en `formato_fecha` (clave de
+    FORMATOS_FECHA): los caracteres se ven como una matriz de códigos y año, mes y día
+    salen de sus columnas. Devuelve (fechas datetime64[D], máscara de las válidas); las
+    que no encajan (vacías, sin ceros a la izquierda, otro formato...) quedan a False.
+    """
+    n = len(textos)
+    fechas = np.zeros(n, dtype="datetime64[D]")
+    validas = np.zeros(n, dtype=bool)
+    if n == 0 or formato_fecha not in FORMATOS_FECHA:
+        return fechas, validas
+    pos_anio, pos_mes, pos_dia, separador, pos_separadores = FORMATOS_FECHA[formato_fecha]
+
+    largos = np.fromiter(map(len, textos), dtype=np.int64, count=n)
+    # cifras: código - ord("0"); los textos más largos se truncan pero ya no son de ancho 10
+    cifras = np.array(textos, dtype="U10").view(np.uint32).reshape(n, 10).astype(np.int64) - 48
+    pos_cifras = [p for p in range(10) if p not in pos_separadores]
+    validas = (largos == 10) & ((cifras[:, pos_cifras] >= 0) & (cifras[:, pos_cifras] <= 9)).all(axis=1)
+    for p in pos_separadores:
+        validas &= cifras[:, p] == ord(separador) - 48
+
+    def numero(desde: int, n_cifras: int) -> np.ndarray:
+        valor = np.zeros(n, dtype=np.int64)
+        for k in range(n_cifras):
+            valor = valor * 10 + cifras[:, desde + k]
+        return valor
+
+    anio, mes, dia = numero(pos_anio, 4), numero(pos_mes, 2), numero(pos_dia, 2)
+    validas &= (anio >= 1) & (mes >= 1) & (mes <= 12) & (dia >= 1)
+    meses = np.where(validas, (anio - 1970) * 12 + mes - 1, 0).astype("datetime64[M]")
+    fechas = meses.astype("datetime64[D]") + np.where(validas, dia - 1, 0)
+    # un día que no existe (31/02) cae en el mes siguiente
+    validas &= fechas.astype("datetime64[M]") == meses
+    return fechas, validas
+
+
+def normalizar_importe(s: str, decimal: str = ".") -> str:
+    """
+    Texto de importe a la forma que entiende float(): quita el separador de miles, deja el
+    decimal como punto y los paréntesis como signo negativo ("(1.234,50)" -> "-1234.50").
+    Si el separador de miles no agrupa de 3 en 3 se toma como decimal ("12,5" -> "12.5").
+    """
+    s = s.strip()
+    if s.startswith("(") and s.endswith(")"):
+        s = "-" + s[1:-1].strip()
+    if s == "":
+        return "0"
+    miles = "." if decimal == "," else ","
+    if miles in s:
+        s = s.replace(miles, "") if _AGRUPADO[miles].fullmatch(s) else s.replace(miles, ".")
+    if decimal == ",":
+        s = s.replace(",", ".")
+    return s
+
+
+def parsear_monto(s: str, decimal: str = ".") -> Decimal:
+    """
+    Importe con coma o punto decimal y paréntesis para negativos ("" = 0).
+    Lanza ValueError si no se puede interpretar.
+    """
+    monto_s = normalizar_importe(s, decimal)
+    try:
+        return Decimal(monto_s)
+    except (InvalidOperation, ValueError):
+        # intentar float fallback
+        return Decimal(str(float(monto_s)))
+
+
+def _a_float(s: str) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return float("nan")
+
+
+def importes_vectorizados(textos: List[str], decimal: str = ".") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Importes de un lote a céntimos (np.ndarray int64) con una sola conversión de NumPy.
+    Devuelve (céntimos, máscara de los válidos); los no parseables quedan a 0 / False.
+    """
+    normalizados = [normalizar_importe(s, decimal) for s in textos]
+    try:
+        valores = np.array(normalizados, dtype=np.float64)
+    except ValueError:
+        # algún importe no es un número: localizar cuáles uno a uno
+        valores = np.array([_a_float(s) for s in normalizados], dtype=np.float64)
+    validos = np.isfinite(valores)
+    return centimos_array(np.where(validos, valores, 0.0)), validos
+
+
+def parsear_lote(lote: List[Tuple[int, List[str]]], cuenta_id: int,
+                 formato: FormatoFichero | None = None) -> Tuple[List[Dict], List[Tuple]]:
+    """
+    Parsea un lote de (nº de fila, celdas): Fecha, Descripcion, Monto (si hay más columnas,
+    las tres primeras). Las columnas de fecha e importe se convierten de golpe con el
+    `formato` detectado; solo las fechas que no encajan pasan por parsear_fecha fila a fila.
+    Devuelve (registros para insertar, errores (fila, motivo, contenido)).
+    """
+    hoy = date.today()
+    formato = formato or FormatoFichero()
+    errores = []
+    filas, raw_fechas, descripciones, raw_montos = [], [], [], []
+    for n_fila, fila in lote:
+        celdas = _limpiar_celdas(fila)
+        if len(celdas) == 0 or (len(celdas) == 1 and celdas[0] == ""):
+            errores.append((n_fila, "fila vacía", fila))
+        elif len(celdas) < 2:
+            errores.append((n_fila, "fila con menos de 2 columnas", fila))
+        else:
+            filas.append((n_fila, fila))
+            raw_fechas.append(celdas[0])
+            descripciones.append(celdas[1])
+            raw_montos.append(celdas[2] if len(celdas) >= 3 else "")
+
+    fechas, fechas_ok = fechas_vectorizadas(raw_fechas, formato.formato_fecha)
+    centimos, montos_ok = importes_vectorizados(raw_montos, formato.decimal)
+    fechas, fechas_ok = fechas.tolist(), fechas_ok.tolist()
+    centimos, montos_ok = centimos.tolist(), montos_ok.tolist()
+
+    registros = []
+    for i, (n_fila, fila) in enumerate(filas):
+        fecha = fechas[i]
+        if not fechas_ok[i]:
+            fecha = parsear_fecha(raw_fechas[i])
+            if fecha is None:
+                # si fecha vacía usar hoy, si no reconocida marcar error
+                if raw_fechas[i] != "":
+                    errores.append((n_fila, f"fecha no reconocida: {raw_fechas[i]}", fila))
+                    continue
+                fecha = hoy
+        if not montos_ok[i]:
+            errores.append((n_fila, f"importe no parseable: {raw_montos[i]}", fila))
+            continue
+        registros.append({"cuenta_id": cuenta_id, "fecha": fecha, "descripcion": descripciones[i] or "",
+                          "monto": a_decimal(centimos[i]), "es_transferencia": 0})
+    errores.sort(key=lambda e: e[0])
+    return registros, errores
+
+
+class _LectorContado:
+    """Iterador de líneas de un fichero de texto que lleva la cuenta de lo leído (para el progreso)."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.leidos = 0
+
+    def __iter__(self):
+        for linea in self.fh:
+            self.leidos += len(linea)
+            yield linea
+
+
+def leer_lotes(lineas, delimitador: str, filas_por_lote: int = FILAS_POR_LOTE) -> Iterator[List[Tuple[int, List[str]]]]:
+    """
+    Lotes de (nº de fila, celdas) de un iterable de líneas (p.ej. un fichero abierto), en
+    streaming. La primera fila se salta si es cabecera. Los números de fila son los del
+    fichero (la primera es la 1).
+    """
+    filas = enumerate(csv.reader(lineas, delimiter=delimitador), start=1)
+    primera = next(filas, None)
+    if primera is None:
+        return
+    if not es_cabecera(primera[1]):
+        filas = chain([primera], filas)
+    while True:
+        lote = list(islice(filas, filas_por_lote))
+        if not lote:
+            return
+        yield lote
+
+
+class _HuellasExistentes:
+    """
+    Set con las huellas de las transacciones de la cuenta ya guardadas, cargado por
+    tramos de fechas según los pide el fichero (cubrir), para comprobar cada fila en O(1).
+    Las transacciones sin huella (creadas a mano o anteriores a la migración) se incluyen
+    calculándola al vuelo, con el ordinal según su orden de alta dentro del mismo día.
+    """
+
+    def __init__(self, session, cuenta_id: int):
+        self.session = session
+        self.cuenta_id = cuenta_id
+        self.huellas = set()
+        self._desde = None
+        self._hasta = None
+
+    def cubrir(self, desde: date, hasta: date):
+        """Asegura que están cargadas las huellas de [desde, hasta]."""
+        if self._desde is None:
+            self._cargar(desde, hasta)
+            self._desde, self._hasta = desde, hasta
+            return
+        if desde < self._desde:
+            self._cargar(desde, self._desde - timedelta(days=1))
+            self._desde = desde
+        if hasta > self._hasta:
+            self._cargar(self._hasta + timedelta(days=1), hasta)
+            self._hasta = hasta
+
+    def _cargar(self, desde: date, hasta: date):
+        t = Transaction.__table__
+        filas = self.session.execute(
+            select(t.c.fecha, t.c.monto, t.c.descripcion, t.c.hash_contenido)
+            .where(t.c.cuenta_id == self.cuenta_id, t.c.fecha.between(desde, hasta))
+            .order_by(t.c.fecha, t.c.id)
+        )
+        ordinales = Counter()
+        for fecha, monto, descripcion, huella in filas:
+            centimos = a_centimos(monto)
+            clave = (fecha, centimos, normalizar_descripcion(descripcion))
+            ordinales[clave] += 1
+            self.huellas.add(huella or hash_contenido(self.cuenta_id, fecha, centimos, descripcion, ordinales[clave]))
+
+
+class _InformeErrores:
+    """Fichero de errores que se crea con el primer error y se escribe según llegan."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.total = 0
+        self._fh = None
+        self._writer = None
+
+    def escribir(self, errores):
+        if not errores:
+            return
+        if self._fh is None:
+            self._fh = open(self.ruta, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._fh)
+            self._writer.writerow(["fila", "motivo", "contenido"])
+        for fila, motivo, contenido in errores:
+            self._writer.writerow([fila, motivo, str(contenido)])
+        self._fh.flush()
+        self.total += len(errores)
+
+    def cerrar(self):
+        if self._fh is not None:
+            self._fh.close()
+
+
+def _poner_huellas(registros: List[Dict], cuenta_id: int, ordinales: Counter):
+    """Añade a cada registro su hash_contenido; `ordinales` cuenta las apariciones de cada contenido en el fichero."""
+    for r in registros:
+        centimos = a_centimos(r["monto"])
+        clave = (r["fecha"], centimos, normalizar_descripcion(r["descripcion"]))
+        ordinales[clave] += 1
+        r["hash_contenido"] = hash_contenido(cuenta_id, r["fecha"], centimos, r["descripcion"], ordinales[clave])
+
+
+def parsear_fichero(ruta: str, cuenta_id: int, filas_por_lote: int = FILAS_POR_LOTE,
+                    con_huella: bool = True) -> Iterator[Tuple[List[Dict], List[Tuple], int, int]]:
+    """
+    Lee y parsea un fichero en streaming, sin tocar la BD. Por cada lote genera
+    (registros, errores, filas leídas, caracteres leídos hasta ahí). Con `con_huella`
+    cada registro lleva ya su hash_contenido (el ordinal es por fichero).
+    """
+    ordinales = Counter()
+    with open(ruta, "r", encoding="utf-8-sig", newline="") as fh:
+        formato = detectar_formato(fh.read(TAMANO_MUESTRA))
+        fh.seek(0)
+        lector = _LectorContado(fh)
+        for lote in leer_lotes(lector, formato.delimitador, filas_por_lote):
+            registros, errores = parsear_lote(lote, cuenta_id, formato)
+            if con_huella:
+                _poner_huellas(registros, cuenta_id, ordinales)
+            yield registros, errores, len(lote), lector.leidos
+
+
+def _parsear_fichero_entero(ruta: str, cuenta_id: int, con_huella: bool) -> List[Tuple[List[Dict], List[Tuple], int]]:
+    """parsear_fichero() completo en una lista; es lo que ejecuta cada proceso del pool de importar_ficheros."""
+    return [(registros, errores, n_filas) for registros, errores, n_filas, _ in
+            parsear_fichero(ruta, cuenta_id, con_huella=con_huella)]
+
+
+class _Escritor:
+    """
+    Inserta lotes ya parseados (de una o varias cuentas) con la sesión de la importación,
+    saltando los duplicados. No confirma nada hasta confirmar(): todo va en una transacción.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.deduplicar = hash_disponible(session)
+        if not self.deduplicar:
+            print("⚠️ transaction.hash_contenido no existe (falta la migración): importando sin detectar duplicados")
+        self.fecha_min = {}   # cuenta_id -> fecha más antigua insertada
+        self._existentes = {}  # cuenta_id -> _HuellasExistentes
+
+    def escribir(self, cuenta_id: int, registros: List[Dict]) -> Tuple[int, int]:
+        """Inserta los registros nuevos con un insert() de Core. Devuelve (insertadas, duplicadas)."""
+        duplicadas = 0
+        if registros and self.deduplicar:
+            existentes = self._existentes.get(cuenta_id)
+            if existentes is None:
+                existentes = self._existentes[cuenta_id] = _HuellasExistentes(self.session, cuenta_id)
+            existentes.cubrir(min(r["fecha"] for r in registros), max(r["fecha"] for r in registros))
+            nuevos = []
+            for r in registros:
+                if r["hash_contenido"] in existentes.huellas:
+                    duplicadas += 1
+                    continue
+                existentes.huellas.add(r["hash_contenido"])
+                nuevos.append(r)
+            registros = nuevos
+        if registros:
+            self.session.execute(insert(Transaction.__table__), registros)
+            minima = min(r["fecha"] for r in registros)
+            self.fecha_min[cuenta_id] = min(self.fecha_min.get(cuenta_id, minima), minima)
+        return len(registros), duplicadas
+
+    def confirmar(self):
+        """
+        Commit (o rollback si no se insertó nada). El insert de Core no dispara los hooks
+        de sesión: se borran a mano los checkpoints afectados y se invalida el ledger.
+        """
+        from utils.ledger import invalidar_ledger
+
+        if not self.fecha_min:
+            self.session.rollback()
+            return
+        if checkpoints_disponibles(self.session):
+            for cuenta_id, fecha_min in self.fecha_min.items():
+                self.session.execute(
+                    delete(BalanceCheckpoint.__table__).where(
+                        BalanceCheckpoint.cuenta_id == cuenta_id,
+                        BalanceCheckpoint.fecha >= fecha_min,
+                    )
+                )
+        self.session.commit()
+        for cuenta_id in self.fecha_min:
+            invalidar_ledger(cuenta_id)
+
+
+def importar_csv(session, ruta: str, cuenta_id: int,
+                 progreso: Callable[[int, int], None] | None = None,
+                 cancelado: Callable[[], bool] | None = None,
+                 filas_por_lote: int = FILAS_POR_LOTE) -> Dict:
+    """
+    Importa el fichero `ruta` como transacciones de `cuenta_id` en una sola transacción.
+
+    - progreso(porcentaje, insertadas) se llama tras cada lote
+    - cancelado() se consulta antes de insertar cada lote; si devuelve True se hace
+      rollback y se lanza ImportacionCancelada
+    - las filas erróneas van a "<ruta>.errors.csv" según se encuentran
+    - las filas cuya huella ya está en la cuenta se saltan (se cuentan en 'duplicadas');
+      si la BD aún no tiene la columna hash_contenido se importa sin esa comprobación
+
+    Devuelve {'leidas', 'insertadas', 'ignoradas', 'duplicadas', 'fichero_errores' (o None),
+    'fecha_min', 'sin_deteccion_duplicados'}.
+    """
+    cuenta_id = int(cuenta_id)
+    total_bytes = max(os.path.getsize(ruta), 1)
+    informe = _InformeErrores(ruta + ".errors.csv")
+    leidas = insertadas = duplicadas = 0
+    escritor = _Escritor(session)
+    try:
+        for registros, errores, n_filas, leidos in parsear_fichero(ruta, cuenta_id, filas_por_lote, escritor.deduplicar):
+            if cancelado is not None and cancelado():
+                raise ImportacionCancelada()
+            nuevas, repetidas = escritor.escribir(cuenta_id, registros)
+            informe.escribir(errores)
+            leidas += n_filas
+            insertadas += nuevas
+            duplicadas += repetidas
+            if progreso is not None:
+                progreso(min(99, leidos * 100 // total_bytes), insertadas)
+        escritor.confirmar()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        informe.cerrar()
+
+    if progreso is not None:
+        progreso(100, insertadas)
+    return {
+        "leidas": leidas,
+        "insertadas": insertadas,
+        "ignoradas": informe.total,
+        "duplicadas": duplicadas,
+        "fichero_errores": informe.ruta if informe.total else None,
+        "fecha_min": escritor.fecha_min.get(cuenta_id),
+        "sin_deteccion_duplicados": not escritor.deduplicar,
+    }
+
+
+# -------------------------------------------------------------
+# Importación de una carpeta: varios ficheros, cada uno en su cuenta
+# -------------------------------------------------------------
+EXTENSIONES_IMPORTABLES = (".csv", ".tsv", ".txt")
+
+
+def ficheros_de_carpeta(carpeta: str) -> List[str]:
+    """Ficheros importables (.csv, .tsv, .txt) de la carpeta, sin los informes *.errors.csv, por nombre."""
+    return sorted(
+        os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta)
+        if nombre.lower().endswith(EXTENSIONES_IMPORTABLES) and not nombre.lower().endswith(".errors.csv")
+        and os.path.isfile(os.path.join(carpeta, nombre))
+    )
+
+
+def leer_mapeo(texto: str | None) -> List[Tuple[str, int]]:
+    """
+    Patrones de nombre de fichero -> cuenta, en el formato de IMPORT_PATTERNS del .env:
+    "patrón=id_cuenta; patrón=id_cuenta" (p.ej. "*santander*=1; bbva_*=2"). Las entradas
+    mal formadas se ignoran con un aviso.
+    """
+    mapeo = []
+    for entrada in (texto or "").split(";"):
+        if not entrada.strip():
+            continue
+        patron, _, cuenta = entrada.rpartition("=")
+        try:
+            mapeo.append((patron.strip(), int(cuenta)))
+        except ValueError:
+            print(f"⚠️ patrón de importación mal formado (se ignora): {entrada.strip()!r}")
+    return [(p, c) for p, c in mapeo if p]
+
+
+def _sin_separadores(texto: str) -> str:
+    return "".join(ch for ch in str(texto).casefold() if ch.isalnum())
+
+
+def asignar_cuentas(rutas: List[str], mapeo: List[Tuple[str, int]], cuentas: Dict[int, str]) -> Dict[str, int | None]:
+    """
+    Cuenta de cada fichero: la del primer patrón de `mapeo` que encaja con el nombre
+    del fichero (fnmatch, sin distinguir mayúsculas); si ninguno encaja, la cuenta cuyo
+    nombre ({id: nombre}) aparece en el del fichero (la de nombre más largo si hay
+    varias); si tampoco, None.
+    """
+    nombres = sorted(((_sin_separadores(n), cid) for cid, n in cuentas.items() if _sin_separadores(n)),
+                     key=lambda x: -len(x[0]))
+    asignacion = {}
+    for ruta in rutas:
+        nombre = os.path.basename(ruta).casefold()
+        cuenta_id = next((cid for patron, cid in mapeo if fnmatch.fnmatch(nombre, patron.casefold())), None)
+        if cuenta_id is None:
+            compacto = _sin_separadores(nombre)
+            cuenta_id = next((cid for n, cid in nombres if n in compacto), None)
+        asignacion[ruta] = cuenta_id if cuenta_id in cuentas else None
+    return asignacion
+
+
+def importar_ficheros(session, asignacion: Dict[str, int],
+                      progreso: Callable[[int, int], None] | None = None,
+                      cancelado: Callable[[], bool] | None = None,
+                      procesos: int | None = None) -> Dict:
+    """
+    Importa varios ficheros ({ruta: cuenta_id}) en una sola transacción. Los ficheros se
+    parsean en paralelo en un pool de procesos (`procesos`, por defecto uno por núcleo) y
+    los lotes parseados se insertan según llega cada fichero con esta sesión, que es el
+    único escritor. Con un solo fichero o procesos=1 se parsea en este proceso.
+
+    - progreso(porcentaje, insertadas) tras cada fichero
+    - cancelado() se consulta mientras se espera a los procesos; si devuelve True se
+      hace rollback y se lanza ImportacionCancelada
+    - un fichero que no se puede leer no detiene el resto: queda con su 'error'
+
+    Devuelve {'ficheros': [{'fichero', 'cuenta_id', 'leidas', 'insertadas', 'duplicadas',
+    'ignoradas', 'fichero_errores', 'error'}], 'leidas', 'insertadas', 'duplicadas',
+    'ignoradas', 'sin_deteccion_duplicados'}.
+    """
+    asignacion = {ruta: int(cuenta_id) for ruta, cuenta_id in asignacion.items()}
+    tamanos = {ruta: os.path.getsize(ruta) if os.path.exists(ruta) else 0 for ruta in asignacion}
+    total_bytes = max(sum(tamanos.values()), 1)
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(asignacion)))
+    escritor = _Escritor(session)
+    resultados = {}
+    bytes_hechos = insertadas = 0
+
+    def escribir_fichero(ruta: str, lotes):
+        nonlocal insertadas
+        informe = _InformeErrores(ruta + ".errors.csv")
+        r = {"fichero": ruta, "cuenta_id": asignacion[ruta], "leidas": 0, "insertadas": 0,
+             "duplicadas": 0, "ignoradas": 0, "fichero_errores": None, "error": None}
+        try:
+            for registros, errores, n_filas, *_ in lotes:
+                comprobar_cancelacion()
+                nuevas, repetidas = escritor.escribir(asignacion[ruta], registros)
+                informe.escribir(errores)
+                r["leidas"] += n_filas
+                r["insertadas"] += nuevas
+                r["duplicadas"] += repetidas
+        finally:
+            informe.cerrar()
+        r["ignoradas"] = informe.total
+        r["fichero_errores"] = informe.ruta if informe.total else None
+        resultados[ruta] = r
+        insertadas += r["insertadas"]
+
+    def fichero_fallido(ruta: str, e: Exception):
+        print(f"DEBUG import {ruta} error: {e}")
+        resultados[ruta] = {"fichero": ruta, "cuenta_id": asignacion[ruta], "leidas": 0, "insertadas": 0,
+                            "duplicadas": 0, "ignoradas": 0, "fichero_errores": None, "error": str(e)}
+
+    def fichero_hecho(ruta: str):
+        nonlocal bytes_hechos
+        bytes_hechos += tamanos[ruta]
+        if progreso is not None:
+            progreso(min(99, bytes_hechos * 100 // total_bytes), insertadas)
+
+    def comprobar_cancelacion():
+        if cancelado is not None and cancelado():
+            raise ImportacionCancelada()
+
+    def importar_en_serie(rutas):
+        for ruta in rutas:
+            comprobar_cancelacion()
+            try:
+                escribir_fichero(ruta, parsear_fichero(ruta, asignacion[ruta], con_huella=escritor.deduplicar))
+            except (OSError, UnicodeError, csv.Error) as e:
+                fichero_fallido(ruta, e)
+            fichero_hecho(ruta)
+
+    try:
+        pool = None
+        if procesos > 1:
+            try:
+                # "spawn" en todas las plataformas: no se hace fork de un proceso con hilos (Qt)
+                # (cada hijo vuelve a ejecutar main.py como __mp_main__: solo su arranque ligero)
+                pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+            except Exception as e:
+                print(f"DEBUG import: sin pool de procesos ({e}), se parsea en este proceso")
+        if pool is None:
+            importar_en_serie(asignacion)
+        else:
+            # como mucho 2 ficheros por proceso en vuelo: lo parseado no se acumula en
+            # memoria si el escritor va más lento que los procesos
+            cola = iter(asignacion)
+            pendientes = {}
+            rezagados = []  # si el pool se cae, lo que falte se parsea en este proceso
+
+            def lanzar(ruta):
+                try:
+                    pendientes[pool.submit(_parsear_fichero_entero, ruta, asignacion[ruta], escritor.deduplicar)] = ruta
+                except BrokenProcessPool:
+                    rezagados.append(ruta)
+
+            try:
+                for ruta in islice(cola, 2 * procesos):
+                    lanzar(ruta)
+                while pendientes:
+                    hechos, _ = wait(pendientes, timeout=0.2, return_when=FIRST_COMPLETED)
+                    comprobar_cancelacion()
+                    for futuro in hechos:
+                        ruta = pendientes.pop(futuro)
+                        try:
+                            lotes = futuro.result()
+                        except BrokenProcessPool:
+                            rezagados.append(ruta)
+                            continue
+                        try:
+                            escribir_fichero(ruta, lotes)
+                        except (OSError, UnicodeError, csv.Error) as e:
+                            fichero_fallido(ruta, e)
+                        fichero_hecho(ruta)
+                        if not rezagados:
+                            siguiente = next(cola, None)
+                            if siguiente is not None:
+                                lanzar(siguiente)
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+            if rezagados:
+                print(f"DEBUG import: pool de procesos caído, {len(rezagados)} ficheros se parsean en este proceso")
+                importar_en_serie(rezagados + list(cola))
+        escritor.confirmar()
+    except BaseException:
+        session.rollback()
+        raise
+
+    if progreso is not None:
+        progreso(100, insertadas)
+    ficheros = [resultados[ruta] for ruta in asignacion]
+    return {
+        "ficheros": ficheros,
+        "leidas": sum(r["leidas"] for r in ficheros),
+        "insertadas": insertadas,
+        "duplicadas": sum(r["duplicadas"] for r in ficheros),
+        "ignoradas": sum(r["ignoradas"] for r in ficheros),
+        "sin_deteccion_duplicados": not escritor.deduplicar,
+    }
@@ -0,0 +1,431 @@
+# utils/ledger.py
+"""
+Representación columnar de los movimientos de una cuenta.
+
+En lugar de una lista de dicts con Decimal (cientos de bytes por fila), el Ledger
+guarda cada campo en un array de NumPy:
+  - fechas          datetime64[D]
+  - centimos        int64 (importe en céntimos)
+  - tipos           int8  (TIPO_FIJO, TIPO_AJUSTE, TIPO_TRANSACCION)
+  - desc_idx        int32 (índice en la lista `descripciones`, sin repetir textos)
+  - transferencias  int8  (es_transferencia)
+
+El saldo acumulado sale de np.cumsum. Para los llamadores que trabajan con dicts
+está el adaptador Ledger.a_dicts().
+
+obtener_ledger() mantiene en memoria (LRU) el ledger completo de cada cuenta y lo
+invalida cuando un flush toca sus movimientos o cuando cambia su sello en la BD
+(escrituras de otro proceso: CLI, importador por cron, otro cliente).
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import select, or_, event, func
+from sqlalchemy.orm import Session
+
+from models.account import Account
+from models.transaction import Transaction
+from models.adjustment import Adjustment
+from models.fixed_expense import FixedExpense
+from models.balance_checkpoint import fechas_afectadas
+from utils.recurrence import contar_hasta, ocurrencia_n
+from utils.money import a_centimos, centimos_array, a_decimal
+
+# Mismos códigos que reconciler.TIPO_ORDEN
+TIPO_FIJO = 1
+TIPO_AJUSTE = 2
+TIPO_TRANSACCION = 3
+NOMBRES_TIPO = {TIPO_FIJO: "fixed_expense", TIPO_AJUSTE: "adjustment", TIPO_TRANSACCION: "transaction"}
+
+# Prioridad por defecto en empates de fecha: fijo, ajuste, transacción
+ORDEN_POR_DEFECTO = {TIPO_FIJO: 1, TIPO_AJUSTE: 2, TIPO_TRANSACCION: 3}
+
+
+class Ledger:
+    """Movimientos de una cuenta en columnas, ya ordenados por fecha y tipo."""
+
+    def __init__(self, cuenta_id: int, saldo_inicial: int, fechas: np.ndarray, centimos: np.ndarray,
+                 tipos: np.ndarray, desc_idx: np.ndarray, transferencias: np.ndarray,
+                 descripciones: List[str]):
+        self.cuenta_id = cuenta_id
+        self.saldo_inicial = saldo_inicial  # céntimos, antes del primer movimiento
+        self.fechas = fechas
+        self.centimos = centimos
+        self.tipos = tipos
+        self.desc_idx = desc_idx
+        self.transferencias = transferencias
+        self.descripciones = descripciones
+        self.hasta = None  # fecha hasta la que se cargaron los movimientos (None = desconocida)
+        self._saldos = None
+
+    def __len__(self):
+        return len(self.centimos)
+
+    @property
+    def saldos(self) -> np.ndarray:
+        """Saldo acumulado (céntimos) después de cada movimiento."""
+        if self._saldos is None:
+            self._saldos = self.saldo_inicial + np.cumsum(self.centimos, dtype=np.int64)
+        return self._saldos
+
+    @property
+    def saldo_final(self) -> int:
+        return int(self.saldos[-1]) if len(self) else self.saldo_inicial
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de las columnas (sin contar la lista de descripciones)."""
+        return sum(a.nbytes for a in (self.fechas, self.centimos, self.tipos, self.desc_idx, self.transferencias))
+
+    def saldos_en(self, fechas: List[date]) -> np.ndarray:
+        """Saldo (céntimos) al final de cada una de `fechas`, por búsqueda binaria."""
+        idx = np.searchsorted(self.fechas, np.array(fechas, dtype="datetime64[D]"), side="right")
+        saldos = np.append(np.int64(self.saldo_inicial), self.saldos)
+        return saldos[idx]
+
+    def rango(self, desde: date, hasta: date, saldo_inicial: float | Decimal | None = None,
+              orden_tipos: Dict[int, int] | None = None) -> "Ledger":
+        """
+        Sub-ledger con los movimientos en [desde, hasta]. El saldo de partida es el acumulado
+        hasta la víspera de `desde` salvo que se indique `saldo_inicial`; con `orden_tipos`
+        se reordenan los empates de fecha (orden estable).
+        """
+        i0 = int(np.searchsorted(self.fechas, np.datetime64(desde, "D"), side="left"))
+        i1 = int(np.searchsorted(self.fechas, np.datetime64(hasta, "D"), side="right"))
+        if saldo_inicial is None:
+            inicial = int(self.saldos[i0 - 1]) if i0 else self.saldo_inicial
+        else:
+            inicial = a_centimos(saldo_inicial)
+        columnas = [self.fechas[i0:i1], self.centimos[i0:i1], self.tipos[i0:i1],
+                    self.desc_idx[i0:i1], self.transferencias[i0:i1]]
+        if orden_tipos is not None and i1 > i0:
+            orden = _orden(columnas[0], columnas[2], orden_tipos)
+            columnas = [c[orden] for c in columnas]
+        sub = Ledger(self.cuenta_id, inicial, *columnas, self.descripciones)
+        sub.hasta = hasta
+        return sub
+
+    def a_dicts(self) -> List[Dict]:
+        """
+        Adaptador al formato de iter_movimientos / calcular_detalle_cuenta:
+        dicts con fecha, descripcion, monto, saldo (Decimal), tipo y es_transferencia.
+        """
+        return [
+            {
+                "fecha": fecha,
+                "descripcion": self.descripciones[idx],
+                "monto": a_decimal(cent),
+                "saldo": a_decimal(saldo),
+                "tipo": NOMBRES_TIPO[int(tipo)],
+                "es_transferencia": int(transf),
+            }
+            for fecha, cent, saldo, tipo, idx, transf in zip(
+                self.fechas.tolist(), self.centimos, self.saldos, self.tipos, self.desc_idx, self.transferencias
+            )
+        ]
+
+
+def _orden(fechas: np.ndarray, tipos: np.ndarray, orden_tipos: Dict[int, int] | None) -> np.ndarray:
+    """Permutación estable que ordena por (fecha, prioridad del tipo)."""
+    prioridad = orden_tipos or ORDEN_POR_DEFECTO
+    tabla = np.zeros(max(NOMBRES_TIPO) + 1, dtype=np.int8)
+    for codigo, valor in prioridad.items():
+        tabla[codigo] = valor
+    return np.lexsort((tabla[tipos], fechas))
+
+
+def fechas_regla(frecuencia: str, ancla: date, desde: date | None, hasta: date) -> np.ndarray:
+    """Ocurrencias en [desde, hasta] de una regla anclada en `ancla`, como datetime64[D]."""
+    k0 = contar_hasta(frecuencia, ancla, desde - timedelta(days=1)) if desde and desde > ancla else 0
+    k1 = contar_hasta(frecuencia, ancla, hasta)
+    if k1 <= k0:
+        return np.empty(0, dtype="datetime64[D]")
+    if frecuencia == "semanal":
+        return np.datetime64(ancla, "D") + np.arange(k0, k1, dtype=np.int64) * 7
+    return np.array([ocurrencia_n(frecuencia, ancla, k) for k in range(k0, k1)], dtype="datetime64[D]")
+
+
+def _fechas_fijo(f, ancla: date, desde: date | None, hasta: date) -> np.ndarray:
+    """Ocurrencias de un fijo en [desde, hasta] como datetime64[D]."""
+    fin = min(f.fecha_fin, hasta) if f.fecha_fin else hasta
+    return fechas_regla(f.frecuencia, ancla, desde, fin)
+
+
+def cargar_ledger(session, cuenta_id: int, desde: date | None, hasta: date,
+                  saldo_inicial: float | Decimal | None = None,
+                  orden_tipos: Dict[int, int] | None = None,
+                  anclar_en_desde: bool = False) -> Ledger:
+    """
+    Carga los movimientos de la cuenta en [desde, hasta] (desde=None = desde el principio)
+    en un Ledger columnar.
+
+    - saldo_inicial: saldo antes de `desde`; si no se indica, el de calcular_balances_en_fechas
+      a la víspera (o el saldo inicial de la cuenta si desde=None)
+    - orden_tipos: prioridad de cada tipo en los empates de fecha (por defecto fijo, ajuste, transacción)
+    - anclar_en_desde: contar los fijos desde max(fecha_inicio, desde), como calcular_detalle_acumulado
+    """
+    cuenta = session.get(Account, cuenta_id)
+    if not cuenta:
+        raise ValueError(f"Cuenta {cuenta_id} no encontrada")
+
+    if saldo_inicial is None:
+        if desde is None:
+            saldo_inicial = cuenta.saldo_inicial or 0
+        else:
+            from utils.reconciler import calcular_balances_en_fechas
+            saldo_inicial = calcular_balances_en_fechas(session, cuenta_id, [desde - timedelta(days=1)])[0]
+
+    descripciones: List[str] = []
+    indices: Dict[str, int] = {}
+
+    def indice(texto):
+        if texto not in indices:
+            indices[texto] = len(descripciones)
+            descripciones.append(texto)
+        return indices[texto]
+
+    bloques = []  # (fechas, importes, tipo, desc_idx, transferencias)
+
+    # 1. Ajustes y transacciones: una consulta por tabla, solo las columnas necesarias
+    for modelo, tipo, columnas in (
+        (Adjustment, TIPO_AJUSTE, (Adjustment.fecha, Adjustment.descripcion, func.round(Adjustment.monto_ajuste, 2))),
+        (Transaction, TIPO_TRANSACCION, (Transaction.fecha, Transaction.descripcion, Transaction.monto,
+                                         Transaction.es_transferencia)),
+    ):
+        filtros = [modelo.cuenta_id == cuenta_id, modelo.fecha <= hasta]
+        if desde is not None:
+            filtros.append(modelo.fecha >= desde)
+        filas = session.execute(select(*columnas).where(*filtros).order_by(modelo.fecha, modelo.id)).all()
+        if not filas:
+            continue
+        por_defecto = "Ajuste" if tipo == TIPO_AJUSTE else ""
+        fechas, textos, importes, *transf = zip(*filas)
+        bloques.append((
+            np.array(fechas, dtype="datetime64[D]"),
+            centimos_array([float(x or 0) for x in importes]),
+            tipo,
+            np.array([indice(t or por_defecto) for t in textos], dtype=np.int32),
+            np.array([int(x or 0) for x in transf[0]], dtype=np.int8) if transf else np.zeros(len(filas), dtype=np.int8),
+        ))
+
+    # 2. Fijos: las ocurrencias de cada regla se generan como array de fechas
+    filtros = [FixedExpense.cuenta_id == cuenta_id, FixedExpense.fecha_inicio <= hasta,
+               or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= FixedExpense.fecha_inicio)]
+    if desde is not None:
+        filtros.append(or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= desde))
+    for f in session.scalars(select(FixedExpense).where(*filtros).order_by(FixedExpense.id)).all():
+        ancla = max(f.fecha_inicio, desde) if anclar_en_desde and desde else f.fecha_inicio
+        fechas = _fechas_fijo(f, ancla, desde, hasta)
+        if not len(fechas):
+            continue
+        n = len(fechas)
+        bloques.append((
+            fechas,
+            np.full(n, a_centimos(f.monto), dtype=np.int64),
+            TIPO_FIJO,
+            np.full(n, indice(f.descripcion or "Gasto/Recurso Fijo"), dtype=np.int32),
+            np.full(n, int(getattr(f, "es_transferencia", 0) or 0), dtype=np.int8),
+        ))
+
+    if bloques:
+        fechas = np.concatenate([b[0] for b in bloques])
+        centimos = np.concatenate([b[1] for b in bloques])
+        tipos = np.concatenate([np.full(len(b[0]), b[2], dtype=np.int8) for b in bloques])
+        desc_idx = np.concatenate([b[3] for b in bloques])
+        transferencias = np.concatenate([b[4] for b in bloques])
+
+        # 3. Orden estable por (fecha, prioridad del tipo)
+        orden = _orden(fechas, tipos, orden_tipos)
+        fechas, centimos, tipos = fechas[orden], centimos[orden], tipos[orden]
+        desc_idx, transferencias = desc_idx[orden], transferencias[orden]
+    else:
+        fechas = np.empty(0, dtype="datetime64[D]")
+        centimos = np.empty(0, dtype=np.int64)
+        tipos = np.empty(0, dtype=np.int8)
+        desc_idx = np.empty(0, dtype=np.int32)
+        transferencias = np.empty(0, dtype=np.int8)
+
+    ledger = Ledger(cuenta_id, a_centimos(saldo_inicial), fechas, centimos,
+                    tipos, desc_idx, transferencias, descripciones)
+    ledger.hasta = hasta
+    return ledger
+
+
+def calcular_series_saldos(session, cuenta_ids: List[int], fechas: List[date]) -> np.ndarray:
+    """
+    Saldos de varias cuentas en varias fechas de una sola pasada (gráfico "Todas las cuentas").
+    Devuelve una matriz float (euros) de forma (len(cuenta_ids), len(fechas)), con el mismo
+    criterio que calcular_balances_en_fechas:
+    - transacciones y ajustes de todas las cuentas se leen agrupados por (cuenta, día),
+      se ordenan por (cuenta, fecha) y se acumulan con un único np.cumsum; cada par
+      cuenta×fecha se resuelve con searchsorted
+    - las ocurrencias de cada fijo se generan una vez y se cuentan con searchsorted
+    """
+    n_cuentas, n_fechas = len(cuenta_ids), len(fechas)
+    if not n_cuentas or not n_fechas:
+        return np.zeros((n_cuentas, n_fechas))
+
+    fila = {cuenta_id: i for i, cuenta_id in enumerate(cuenta_ids)}
+    fecha_max = max(fechas)
+    dias = np.array(fechas, dtype="datetime64[D]")
+
+    # 1. Saldos iniciales
+    matriz = np.zeros((n_cuentas, n_fechas), dtype=np.int64)
+    for cuenta_id, saldo_inicial in session.execute(
+        select(Account.id, Account.saldo_inicial).where(Account.id.in_(cuenta_ids))
+    ).all():
+        matriz[fila[cuenta_id]] += a_centimos(saldo_inicial)
+
+    # 2. Transacciones y ajustes: totales por (cuenta, día) de todas las cuentas
+    cuentas_mov, fechas_mov, importes = [], [], []
+    for modelo, columna in ((Transaction, Transaction.monto),
+                            (Adjustment, func.round(Adjustment.monto_ajuste, 2))):
+        filas = session.execute(
+            select(modelo.cuenta_id, modelo.fecha, func.sum(columna))
+            .where(modelo.cuenta_id.in_(cuenta_ids), modelo.fecha <= fecha_max)
+            .group_by(modelo.cuenta_id, modelo.fecha)
+        ).all()
+        for cuenta_id, fecha, total in filas:
+            cuentas_mov.append(fila[cuenta_id])
+            fechas_mov.append(fecha)
+            importes.append(float(total or 0))
+
+    if importes:
+        cuentas_mov = np.array(cuentas_mov, dtype=np.int64)
+        fechas_mov = np.array(fechas_mov, dtype="datetime64[D]").astype(np.int64)
+        dias_num = dias.astype(np.int64)
+        centimos = centimos_array(importes)
+
+        # clave única (cuenta, día) para ordenar y buscar en un solo array;
+        # los días se desplazan para que sean >= 0 (fechas anteriores a 1970)
+        origen = min(fechas_mov.min(), dias_num.min())
+        fechas_mov, dias_num = fechas_mov - origen, dias_num - origen
+        base = int(max(fechas_mov.max(), dias_num.max())) + 1
+        orden = np.lexsort((fechas_mov, cuentas_mov))
+        claves = cuentas_mov[orden] * base + fechas_mov[orden]
+        acumulado = np.concatenate(([0], np.cumsum(centimos[orden], dtype=np.int64)))
+
+        filas_idx = np.arange(n_cuentas, dtype=np.int64)
+        inicio_cuenta = np.searchsorted(claves, filas_idx * base, side="left")
+        consultas = filas_idx[:, None] * base + dias_num[None, :]
+        posiciones = np.searchsorted(claves, consultas, side="right")
+        matriz += acumulado[posiciones] - acumulado[inicio_cuenta][:, None]
+
+    # 3. Fijos: ocurrencias de cada regla hasta la fecha más alta, contadas por fecha
+    fijos = session.scalars(
+        select(FixedExpense).where(
+            FixedExpense.cuenta_id.in_(cuenta_ids),
+            FixedExpense.fecha_inicio <= fecha_max,
+            or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= FixedExpense.fecha_inicio)
+        )
+    ).all()
+    for f in fijos:
+        ocurrencias = _fechas_fijo(f, f.fecha_inicio, None, fecha_max)
+        if len(ocurrencias):
+            matriz[fila[f.cuenta_id]] += a_centimos(f.monto) * np.searchsorted(ocurrencias, dias, side="right")
+
+    return matriz / 100
+
+
+# -------------------------------------------------------------
+# Caché en memoria del ledger completo de cada cuenta
+# -------------------------------------------------------------
+# LRU {cuenta_id: (engine, version, sello, Ledger)}. La versión de una cuenta sube en
+# cada flush de este proceso que toca sus movimientos (hook after_flush) y con
+# invalidar_ledger() (insert() de Core). Lo que escriben otros procesos lo detecta el
+# sello (_sello_cuenta), que se vuelve a leer de la BD en cada acierto de la caché.
+MAX_LEDGERS = 32
+# Al cargar se cubre al menos este horizonte futuro (gráficos y simulaciones miran adelante)
+HORIZONTE_CARGA = timedelta(days=366)
+
+_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_versiones: Dict[int, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def invalidar_ledger(cuenta_id: int | None = None):
+    """Descarta el ledger cacheado de una cuenta (o de todas si cuenta_id es None)."""
+    with _lock:
+        if cuenta_id is None:
+            for cid in list(_versiones):
+                _versiones[cid] += 1
+            _cache.clear()
+        else:
+            _versiones[cuenta_id] += 1
+            _cache.pop(cuenta_id, None)
+
+
+def _sello_cuenta(session, cuenta_id: int) -> tuple:
+    """
+    Huella barata del estado de la cuenta en la BD, en una sola consulta: nº de filas,
+    id máximo y suma de importes de transacciones, ajustes y fijos, más el saldo inicial.
+    Cambia con cualquier alta, baja o cambio de importe, venga de donde venga; un cambio
+    que solo mueva una fecha o la regla de un fijo solo se detecta si pasa por el ORM
+    de este proceso (hook after_flush).
+    """
+    columnas = []
+    for modelo, importe in ((Transaction, Transaction.monto),
+                            (Adjustment, func.round(Adjustment.monto_ajuste, 2)),
+                            (FixedExpense, FixedExpense.monto)):
+        filtro = modelo.cuenta_id == cuenta_id
+        columnas += [
+            select(func.count()).select_from(modelo).where(filtro).scalar_subquery(),
+            select(func.max(modelo.id)).where(filtro).scalar_subquery(),
+            select(func.sum(importe)).where(filtro).scalar_subquery(),
+        ]
+    columnas.append(select(Account.saldo_inicial).where(Account.id == cuenta_id).scalar_subquery())
+    return tuple(session.execute(select(*columnas)).one())
+
+
+def obtener_ledger(session, cuenta_id: int, hasta: date) -> Ledger:
+    """
+    Ledger completo de la cuenta (desde el principio, fijos anclados en su fecha_inicio real)
+    que cubre al menos hasta `hasta`. Se sirve desde memoria mientras la cuenta no cambie
+    (misma versión y mismo sello en la BD); puede traer movimientos posteriores a `hasta`
+    (usar Ledger.rango / saldos_en).
+    """
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    # el sello se lee antes que el ledger: si entre medias otro proceso confirma algo,
+    # el sello guardado queda antiguo y la entrada se recarga en el siguiente acierto
+    sello = _sello_cuenta(session, cuenta_id)
+    with _lock:
+        version = _versiones[cuenta_id]
+        entrada = _cache.get(cuenta_id)
+        if (entrada is not None and entrada[0] is engine and entrada[1] == version
+                and entrada[2] == sello and entrada[3].hasta >= hasta):
+            _cache.move_to_end(cuenta_id)
+            return entrada[3]
+
+    ledger = cargar_ledger(session, cuenta_id, None, max(hasta, date.today() + HORIZONTE_CARGA))
+
+    # con cambios sin confirmar en la sesión el ledger no es definitivo: no se cachea
+    if session.info.get("ledger_pendiente") or session.new or session.dirty or session.deleted:
+        return ledger
+    with _lock:
+        if _versiones[cuenta_id] == version:
+            _cache[cuenta_id] = (engine, version, sello, ledger)
+            _cache.move_to_end(cuenta_id)
+            while len(_cache) > MAX_LEDGERS:
+                _cache.popitem(last=False)
+    return ledger
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidar_ledgers(session, flush_context):
+    afectadas = fechas_afectadas(session)
+    if not afectadas:
+        return
+    session.info["ledger_pendiente"] = True
+    for cuenta_id in afectadas:
+        invalidar_ledger(cuenta_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _limpiar_marca_ledger(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("ledger_pendiente", None)
@@ -1,5 +1,4 @@
 # utils/market.py
-import yfinance as yf
 from decimal import Decimal
 
 def fetch_price_yfinance(ticker: str) -> float:
@@ -7,6 +6,7 @@ def fetch_price_yfinance(ticker: str) -> float:
     Devuelve precio actual (float) para ticker.
     yfinance acepta tickers con sufijos (eg 'SAN.MC' o 'BBVA.MC', 'AAPL').
     """
+    import yfinance as yf  # diferido: solo se carga al refrescar precios
     try:
         t = yf.Ticker(ticker)
         # preferimos last close / regularMarketPrice
@@ -1,5 +1,4 @@
 # utils/market_holdings.py
-import yfinance as yf
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
 from database import db
@@ -9,6 +8,7 @@ CACHE_TTL = timedelta(minutes=5)  # tiempo de cache
 
 def fetch_price_yfinance(ticker: str) -> Decimal:
     """Consulta yfinance y devuelve precio como Decimal."""
+    import yfinance as yf  # diferido: solo se carga al refrescar precios
     t = yf.Ticker(ticker)
     # intentamos regularMarketPrice o el close del día
     try:
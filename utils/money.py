@@ -0,0 +1,51 @@
+# utils/money.py
+"""
+Aritmética de importes en céntimos enteros.
+
+Las columnas de importe mezclan Numeric (Transaction.monto, FixedExpense.monto...) y
+Float (Adjustment.monto_ajuste, Mortgage.capital_inicial). En vez de encadenar
+Decimal(str(x)) y float(...) en cada suma, los importes se pasan a céntimos (int)
+una sola vez al leerlos de la BD, se acumulan con enteros (exacto y barato) y solo
+se vuelven a euros para mostrarlos o devolverlos a la UI.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+CENTIMO = Decimal("0.01")
+
+
+def a_centimos(valor) -> int:
+    """
+    Importe (Decimal, float, int, str o None) a céntimos, redondeando al céntimo
+    más cercano (mitades hacia arriba). Los float pasan por str() para que 0.1 sea 0.10.
+    """
+    if valor is None:
+        return 0
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return int(valor.quantize(CENTIMO, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def centimos_array(valores):
+    """
+    Versión vectorizada de a_centimos: secuencia de importes -> np.ndarray int64, con el
+    mismo redondeo (mitades hacia arriba, en valor absoluto). Los float binarios que caen
+    a un pelo de medio céntimo (1.005 * 100 = 100.4999...) se resuelven con a_centimos.
+    """
+    import numpy as np
+    importes = np.asarray(valores, dtype=np.float64)
+    escalados = np.abs(importes) * 100
+    centimos = (np.sign(importes) * np.floor(escalados + 0.5)).astype(np.int64)
+    dudosos = np.flatnonzero(np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6)
+    for i in dudosos:
+        centimos[i] = a_centimos(float(importes[i]))
+    return centimos
+
+
+def a_euros(centimos: int) -> float:
+    """Céntimos a float, para la UI y los gráficos."""
+    return centimos / 100
+
+
+def a_decimal(centimos: int) -> Decimal:
+    """Céntimos a Decimal exacto con dos decimales (12345 -> Decimal('123.45'))."""
+    return Decimal(int(centimos)).scaleb(-2)
@@ -0,0 +1,272 @@
+# utils/montecarlo.py
+"""
+Proyección Monte Carlo de los saldos: en lugar de un único camino determinista,
+miles de caminos en los que el importe de algunas variables de simulación es aleatorio.
+
+Cada SimulationVariable tiene una `distribucion`:
+  - 'fija'       importe constante (como en la simulación normal)
+  - 'normal'     normal de media `importe` y desviación típica `desviacion`
+  - 'historica'  bootstrap empírico: cada ocurrencia toma al azar el total de un periodo
+                 pasado (según su frecuencia) de las transacciones de la cuenta cuya
+                 descripción contiene `patron_historico`
+
+El camino base (saldo de apertura, movimientos, fijos y variables 'fija') sale una vez de
+utils/simulation.simular_matriz; cada variable aleatoria suma encima su matriz de importes
+(caminos × ocurrencias) acumulada con np.cumsum y muestreada en las fechas con searchsorted.
+
+El trabajo se reparte por bloques de fechas en un pool de procesos: cada bloque vuelve a
+generar los mismos sorteos (generador sembrado con (semilla, nº de variable)), así que los
+percentiles de cada fecha son exactos sin tener en memoria todos los caminos a la vez.
+Los sorteos van por ocurrencias (ocurrencias × caminos) en tramos de tamaño fijo: las k
+primeras ocurrencias son siempre el mismo prefijo del flujo del generador, y cada bloque
+solo sortea y acumula hasta su última fecha sin tener nunca más de un tramo en memoria.
+Este módulo no importa la BD ni Qt al cargarse (lo cargan los procesos del pool);
+preparar_montecarlo() importa lo que necesita al llamarse.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+DISTRIBUCIONES = ("fija", "normal", "historica")
+PERCENTILES = (5, 50, 95)
+CAMINOS_POR_DEFECTO = 10000
+# Meses de histórico de los que se remuestrea una variable 'historica'
+MESES_HISTORICO = 24
+# Celdas de cada array de un bloque: caminos × (cuentas + 1) × fechas del bloque, y
+# caminos × ocurrencias de cada tramo de sorteos. ~32 MB por array en int64/float64
+CELDAS_POR_BLOQUE = 4_000_000
+
+
+class SimulacionCancelada(Exception):
+    """La simulación se ha cancelado desde la UI."""
+
+
+class VariableAleatoria:
+    """
+    Ocurrencias de una variable con importe aleatorio y cómo sortearlo (en céntimos).
+    fila: índice de su cuenta en la matriz de la simulación.
+    """
+    def __init__(self, fila: int, fechas: np.ndarray, distribucion: str, media: int,
+                 desviacion: int = 0, muestra: np.ndarray | None = None):
+        self.fila = fila
+        self.fechas = fechas
+        self.distribucion = distribucion
+        self.media = media
+        self.desviacion = desviacion
+        self.muestra = muestra
+
+    def sortear(self, rng: np.random.Generator, n_ocurrencias: int, n_caminos: int) -> np.ndarray:
+        """
+        Importes (céntimos) de las n_ocurrencias siguientes en cada camino: matriz
+        (n_ocurrencias, n_caminos). Por filas, así sortear k y luego m ocurrencias con el
+        mismo generador da lo mismo que sortear k + m de una vez.
+        """
+        forma = (n_ocurrencias, n_caminos)
+        if self.distribucion == "historica":
+            return rng.choice(self.muestra, size=forma)
+        importes = rng.normal(self.media, self.desviacion, size=forma)
+        return np.rint(importes, out=importes).astype(np.int64)
+
+
+def _ocurrencias_por_tramo(n_caminos: int) -> int:
+    """Ocurrencias que se sortean de una vez (depende solo de n_caminos: igual en todos los bloques)."""
+    return max(1, CELDAS_POR_BLOQUE // n_caminos)
+
+
+def _periodos(fechas: np.ndarray, desde: date, frecuencia: str) -> np.ndarray:
+    """Índice del periodo de la frecuencia (semana, mes, trimestre...) de cada fecha, contado desde `desde`."""
+    from utils.recurrence import PASOS_MESES
+
+    if frecuencia == "semanal":
+        return (fechas - np.datetime64(desde, "D")).astype(np.int64) // 7
+    paso = PASOS_MESES.get(frecuencia)
+    if paso is None:
+        # frecuencia desconocida: cada transacción es su propio periodo
+        return np.arange(len(fechas), dtype=np.int64)
+    meses = fechas.astype("datetime64[M]").astype(np.int64) - np.datetime64(desde, "M").astype(np.int64)
+    return meses // paso
+
+
+def importes_historicos(session, cuenta_id: int, patron: str, frecuencia: str, hasta: date) -> np.ndarray:
+    """
+    Muestra empírica (céntimos) de una variable 'historica': total por periodo de su
+    frecuencia de las transacciones de la cuenta cuya descripción contiene `patron`
+    (sin distinguir mayúsculas) en los MESES_HISTORICO meses anteriores a `hasta`.
+    Los periodos sin movimientos cuentan como 0 a partir del primero que tiene alguno.
+    """
+    from dateutil.relativedelta import relativedelta
+    from sqlalchemy import select, func
+    from models.transaction import Transaction
+    from utils.money import centimos_array
+
+    desde = hasta - relativedelta(months=MESES_HISTORICO)
+    filas = session.execute(
+        select(Transaction.fecha, Transaction.monto).where(
+            Transaction.cuenta_id == cuenta_id,
+            Transaction.fecha >= desde, Transaction.fecha < hasta,
+            func.lower(Transaction.descripcion).like(f"%{patron.lower()}%"),
+        )
+    ).all()
+    if not filas:
+        return np.empty(0, dtype=np.int64)
+    fechas = np.array([f for f, _ in filas], dtype="datetime64[D]")
+    centimos = centimos_array([float(m or 0) for _, m in filas])
+    periodos = _periodos(fechas, desde, frecuencia)
+    periodos -= periodos.min()
+    return np.rint(np.bincount(periodos, weights=centimos)).astype(np.int64)
+
+
+def preparar_montecarlo(session, fecha_inicio: date, fecha_fin: date, intervalo: int,
+                        cuentas, variables) -> Tuple[np.ndarray, np.ndarray, List[VariableAleatoria]]:
+    """
+    Parte que necesita la BD: devuelve (fechas, matriz base en céntimos cuentas × fechas,
+    variables aleatorias). Las variables 'normal' sin desviación y las 'historica' sin
+    movimientos que remuestrear se simulan con su importe fijo.
+    """
+    from utils.simulation import simular_matriz, fechas_variable
+    from utils.money import a_centimos
+
+    fila = {c.id: i for i, c in enumerate(cuentas)}
+    fijas, aleatorias = [], []
+    for v in variables:
+        distribucion = getattr(v, "distribucion", None) or "fija"
+        if v.cuenta_id not in fila or distribucion == "fija":
+            fijas.append(v)
+            continue
+        fechas = fechas_variable(v, fecha_inicio, fecha_fin)
+        if distribucion == "normal" and a_centimos(v.desviacion or 0) > 0:
+            aleatorias.append(VariableAleatoria(fila[v.cuenta_id], fechas, "normal",
+                                                a_centimos(v.importe), a_centimos(v.desviacion)))
+            continue
+        if distribucion == "historica":
+            patron = (v.patron_historico or v.descripcion or "").strip()
+            muestra = importes_historicos(session, v.cuenta_id, patron, v.frecuencia, fecha_inicio) if patron else []
+            if len(muestra):
+                aleatorias.append(VariableAleatoria(fila[v.cuenta_id], fechas, "historica",
+                                                    int(muestra.mean()), muestra=muestra))
+                continue
+            print(f"⚠️ Variable '{v.descripcion}': sin transacciones '{patron}' que remuestrear, se usa su importe fijo")
+        fijas.append(v)
+
+    fechas, base = simular_matriz(session, fecha_inicio, fecha_fin, intervalo, cuentas, fijas)
+    return fechas, base, aleatorias
+
+
+def _simular_bloque(base: np.ndarray, fechas: np.ndarray, aleatorias: List[VariableAleatoria],
+                    n_caminos: int, semilla: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Caminos de un bloque de fechas (se ejecuta en el pool). Devuelve los PERCENTILES
+    (len(PERCENTILES), cuentas + 1, fechas) en céntimos, con el TOTAL en la última fila,
+    y qué caminos quedan en negativo en alguna fecha del bloque (n_caminos, cuentas + 1).
+    """
+    n_cuentas, n_fechas = base.shape
+    # caminos en el último eje (contiguo): los percentiles se calculan sobre él
+    caminos = np.empty((n_cuentas + 1, n_fechas, n_caminos), dtype=np.int64)
+    caminos[:n_cuentas] = base[:, :, None]
+    por_tramo = _ocurrencias_por_tramo(n_caminos)
+    for k, variable in enumerate(aleatorias):
+        # mismo generador para la variable en todos los bloques: los caminos son los mismos
+        rng = np.random.default_rng([semilla, k])
+        # nº de ocurrencias hasta cada fecha; solo se sortean las que hay hasta la última
+        hasta = np.searchsorted(variable.fechas, fechas, side="right")
+        acumulado = np.zeros(n_caminos, dtype=np.int64)
+        for inicio in range(0, int(hasta[-1]), por_tramo):
+            # tramos de límites fijos (múltiplos de por_tramo) en todos los bloques
+            importes = variable.sortear(rng, min(por_tramo, int(hasta[-1]) - inicio), n_caminos)
+            np.cumsum(importes, axis=0, out=importes)
+            importes += acumulado
+            en_tramo = (hasta > inicio) & (hasta <= inicio + len(importes))
+            caminos[variable.fila, en_tramo] += importes[hasta[en_tramo] - inicio - 1]
+            acumulado = importes[-1].copy()
+    caminos[n_cuentas] = caminos[:n_cuentas].sum(axis=0)
+    return np.percentile(caminos, PERCENTILES, axis=2), (caminos < 0).any(axis=1).T
+
+
+def simular_montecarlo(fechas: np.ndarray, base: np.ndarray, aleatorias: List[VariableAleatoria],
+                       n_caminos: int = CAMINOS_POR_DEFECTO, semilla: int | None = None,
+                       procesos: int | None = None,
+                       progreso: Callable[[int], None] | None = None,
+                       cancelado: Callable[[], bool] | None = None) -> Dict:
+    """
+    Simula `n_caminos` caminos sobre la salida de preparar_montecarlo(), repartiendo los
+    bloques de fechas en un pool de procesos (`procesos`, por defecto uno por núcleo; con
+    uno solo se calcula en este proceso).
+
+    - progreso(porcentaje) tras cada bloque
+    - cancelado() se consulta mientras se espera; si devuelve True se lanza SimulacionCancelada
+
+    Devuelve {'fechas': [date], 'p5', 'p50', 'p95': arrays (cuentas + 1, fechas) en euros con
+    el TOTAL en la última fila, 'prob_negativo': array (cuentas + 1) con la probabilidad de
+    que el saldo sea negativo en alguna fecha, 'caminos', 'semilla'}.
+    """
+    if semilla is None:
+        semilla = int(np.random.SeedSequence().entropy % (2 ** 63))
+    n_cuentas, n_fechas = base.shape
+    procesos = max(1, procesos or os.cpu_count() or 1)
+    tam = max(1, CELDAS_POR_BLOQUE // (n_caminos * (n_cuentas + 1)))
+    if procesos > 1:
+        tam = min(tam, -(-n_fechas // procesos))
+    bloques = [(i, min(i + tam, n_fechas)) for i in range(0, n_fechas, tam)]
+
+    percentiles = np.zeros((len(PERCENTILES), n_cuentas + 1, n_fechas))
+    negativos = np.zeros((n_caminos, n_cuentas + 1), dtype=bool)
+    hechos = 0
+
+    def comprobar_cancelacion():
+        if cancelado and cancelado():
+            raise SimulacionCancelada()
+
+    def guardar(bloque, resultado):
+        nonlocal hechos
+        i0, i1 = bloque
+        percentiles[:, :, i0:i1] = resultado[0]
+        negativos[:] |= resultado[1]
+        hechos += 1
+        if progreso:
+            progreso(int(hechos * 100 / len(bloques)))
+
+    def argumentos(bloque):
+        i0, i1 = bloque
+        return base[:, i0:i1], fechas[i0:i1], aleatorias, n_caminos, semilla
+
+    pendientes = list(bloques)  # lo que quede si el pool se cae se calcula en este proceso
+    procesos = min(procesos, len(bloques))
+    pool = None
+    if procesos > 1:
+        try:
+            # "spawn" en todas las plataformas: no se hace fork de un proceso con hilos (Qt)
+            # (cada hijo vuelve a ejecutar main.py como __mp_main__: solo su arranque ligero)
+            pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+        except Exception as e:
+            print(f"DEBUG montecarlo: sin pool de procesos ({e}), se calcula en este proceso")
+    if pool is not None:
+        try:
+            en_curso = {pool.submit(_simular_bloque, *argumentos(b)): b for b in bloques}
+            while en_curso:
+                listos, _ = wait(en_curso, timeout=0.2, return_when=FIRST_COMPLETED)
+                comprobar_cancelacion()
+                for futuro in listos:
+                    bloque = en_curso.pop(futuro)
+                    guardar(bloque, futuro.result())
+                    pendientes.remove(bloque)
+        except BrokenProcessPool as e:
+            print(f"DEBUG montecarlo: pool de procesos caído ({e}), {len(pendientes)} bloques se calculan en este proceso")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    for bloque in pendientes:
+        comprobar_cancelacion()
+        guardar(bloque, _simular_bloque(*argumentos(bloque)))
+
+    euros = percentiles / 100
+    return {
+        "fechas": fechas.tolist(),
+        "p5": euros[0], "p50": euros[1], "p95": euros[2],
+        "prob_negativo": negativos.mean(axis=0),
+        "caminos": n_caminos,
+        "semilla": semilla,
+    }
@@ -7,11 +7,105 @@ from models.account import Account
 from models.transaction import Transaction
 from models.adjustment import Adjustment
 from models.fixed_expense import FixedExpense
+from models.balance_checkpoint import BalanceCheckpoint, checkpoints_disponibles
 from database import db
-from typing import Dict, List
-from sqlalchemy import select, or_, func
+from typing import Dict, Iterator, List
+from sqlalchemy import select, or_, func, insert, literal, union_all, cast, Numeric
 from decimal import Decimal
 from collections import defaultdict
+from heapq import merge
+from utils.recurrence import contar_ocurrencias, contar_hasta, ocurrencia_n
+from utils.money import a_centimos, a_decimal, a_euros
+
+# Orden de los movimientos de un mismo día: fijo, luego ajuste, luego transacción
+TIPO_ORDEN = {"account": 0, "fixed_expense": 1, "adjustment": 2, "transaction": 3}
+# Filas que se traen de la BD en cada lote al recorrer movimientos en streaming
+FILAS_POR_LOTE = 1000
+
+def _monto_ajuste_redondeado():
+    """monto_ajuste es Float: se redondea al céntimo en la BD antes de sumar (sin deriva sub-céntimo)."""
+    return func.round(Adjustment.monto_ajuste, 2)
+
+def _sumar_puntuales(session, cuenta_id: int, fecha_hasta: date, fecha_desde: date | None = None,
+                     bloquear: bool = False) -> int:
+    """
+    Suma (en céntimos) de transacciones y ajustes de la cuenta con fecha en
+    [fecha_desde, fecha_hasta] (sin límite inferior si fecha_desde es None).
+    Usa SUM() en la BD (índices idx_cuenta_fecha) en lugar de cargar cada fila como objeto ORM.
+    `session` puede ser también una Connection; bloquear=True hace lecturas bloqueantes
+    (FOR SHARE / LOCK IN SHARE MODE; SQLite lo ignora).
+    """
+    filtros_t = [Transaction.cuenta_id == cuenta_id, Transaction.fecha <= fecha_hasta]
+    filtros_a = [Adjustment.cuenta_id == cuenta_id, Adjustment.fecha <= fecha_hasta]
+    if fecha_desde is not None:
+        filtros_t.append(Transaction.fecha >= fecha_desde)
+        filtros_a.append(Adjustment.fecha >= fecha_desde)
+
+    consulta_t = select(func.coalesce(func.sum(Transaction.monto), 0)).where(*filtros_t)
+    consulta_a = select(func.coalesce(func.sum(_monto_ajuste_redondeado()), 0)).where(*filtros_a)
+    if bloquear:
+        consulta_t = consulta_t.with_for_update(read=True)
+        consulta_a = consulta_a.with_for_update(read=True)
+    total_transacciones = session.execute(consulta_t).scalar_one()
+    total_ajustes = session.execute(consulta_a).scalar_one()
+
+    return a_centimos(total_transacciones) + a_centimos(total_ajustes)
+
+def _delta_fijos(fijos, fecha_inicio_cuenta: date, fecha_desde: date | None, fecha_hasta: date) -> int:
+    """Suma (en céntimos) de las ocurrencias de los gastos/ingresos fijos en [fecha_desde, fecha_hasta]."""
+    total = 0
+    for f in fijos:
+        # fecha de inicio efectiva
+        inicio = max(f.fecha_inicio, fecha_inicio_cuenta)
+        # fecha de fin efectiva
+        fin = f.fecha_fin if f.fecha_fin and f.fecha_fin < fecha_hasta else fecha_hasta
+
+        # nº de ocurrencias calculado aritméticamente (sin recorrerlas una a una)
+        desde = max(inicio, fecha_desde) if fecha_desde is not None else inicio
+        n = contar_ocurrencias(f.frecuencia, inicio, desde, fin)
+        total += a_centimos(f.monto) * n
+    return total
+
+def _guardar_checkpoint(session, cuenta_id: int, fecha_inicio_cuenta: date, fecha: date):
+    """
+    Calcula y persiste el checkpoint de `fecha` en una transacción propia, no con la sesión
+    del caller: una sesión abierta desde hace rato (ventanas de simulación, diálogos) ve una
+    foto de la BD (REPEATABLE READ) sin lo que otro proceso (CLI, importador) ha confirmado
+    después, y un checkpoint mal calculado no lo corrige nadie.
+    Las lecturas son bloqueantes: si otra transacción tiene movimientos de la cuenta sin
+    confirmar (el importador borra los checkpoints justo antes de su commit), se espera a
+    que termine. Es solo una caché: si falla (p.ej. otro proceso ya lo insertó) se ignora.
+    """
+    if session.info.get("checkpoints_pendientes") or session.new or session.dirty or session.deleted:
+        # la sesión tiene cambios sin confirmar: el saldo podría no ser el definitivo
+        return
+    try:
+        bind = session.get_bind()
+        engine = getattr(bind, "engine", bind)
+        with engine.begin() as conn:
+            saldo = a_centimos(conn.execute(
+                select(Account.saldo_inicial).where(Account.id == cuenta_id).with_for_update(read=True)
+            ).scalar_one())
+            fecha_desde = None
+            ck = conn.execute(
+                select(BalanceCheckpoint.fecha, BalanceCheckpoint.saldo)
+                .where(BalanceCheckpoint.cuenta_id == cuenta_id, BalanceCheckpoint.fecha < fecha)
+                .order_by(BalanceCheckpoint.fecha.desc()).limit(1).with_for_update(read=True)
+            ).first()
+            if ck is not None:
+                saldo, fecha_desde = a_centimos(ck.saldo), ck.fecha + timedelta(days=1)
+            fijos = conn.execute(
+                select(FixedExpense.fecha_inicio, FixedExpense.fecha_fin, FixedExpense.frecuencia, FixedExpense.monto)
+                .where(FixedExpense.cuenta_id == cuenta_id, FixedExpense.fecha_inicio <= fecha)
+                .with_for_update(read=True)
+            ).all()
+            saldo += _sumar_puntuales(conn, cuenta_id, fecha, fecha_desde, bloquear=True)
+            saldo += _delta_fijos(fijos, fecha_inicio_cuenta, fecha_desde, fecha)
+            conn.execute(
+                insert(BalanceCheckpoint.__table__).values(cuenta_id=cuenta_id, fecha=fecha, saldo=a_decimal(saldo))
+            )
+    except Exception as e:
+        print(f"DEBUG checkpoint cuenta {cuenta_id} {fecha} no guardado: {e}")
 
 def calcular_balance_cuenta(session, cuenta_id: int, fecha_objetivo: date) -> float:
     """
@@ -21,39 +115,39 @@ def calcular_balance_cuenta(session, cuenta_id: int, fecha_objetivo: date) -> fl
       - transacciones
       - ajustes
       - gastos o ingresos fijos recurrentes
+
+    Parte del checkpoint (tabla balance_checkpoint) más cercano anterior o igual a la
+    fecha y solo suma el delta; de paso guarda el checkpoint del último fin de mes.
     """
     cuenta = session.get(Account, cuenta_id)
     if not cuenta:
         raise ValueError(f"Cuenta {cuenta_id} no encontrada")
 
-    saldo = Decimal(str(cuenta.saldo_inicial or 0))
+    saldo = a_centimos(cuenta.saldo_inicial)  # céntimos
 
     # Definir fecha de inicio de la cuenta (por defecto 01/01/2024 si no existe)
     fecha_inicio_cuenta = getattr(cuenta, "fecha_inicio", date(2024, 1, 1))
 
-    # --- 1) Ajustes ---
-    ajustes = session.scalars(
-        select(Adjustment)
-        .where(
-            Adjustment.cuenta_id == cuenta_id,
-            Adjustment.fecha <= fecha_objetivo
-        )
-    ).all()
-    for adj in ajustes:
-        saldo += Decimal(str(adj.monto_ajuste))
-
-    # --- 2) Transacciones ---
-    transacciones = session.scalars(
-        select(Transaction)
-        .where(
-            Transaction.cuenta_id == cuenta_id,
-            Transaction.fecha <= fecha_objetivo
-        )
-    ).all()
-    for t in transacciones:
-        saldo += Decimal(str(t.monto))
-
-    # --- 3) Gastos fijos ---
+    # --- 0) Checkpoint más cercano ---
+    usar_checkpoints = checkpoints_disponibles(session)
+    fecha_desde = None  # None = desde el principio
+    if usar_checkpoints:
+        ck = session.execute(
+            select(BalanceCheckpoint.fecha, BalanceCheckpoint.saldo)
+            .where(
+                BalanceCheckpoint.cuenta_id == cuenta_id,
+                BalanceCheckpoint.fecha <= fecha_objetivo
+            )
+            .order_by(BalanceCheckpoint.fecha.desc())
+            .limit(1)
+        ).first()
+        if ck is not None:
+            saldo = a_centimos(ck.saldo)
+            if ck.fecha == fecha_objetivo:
+                return a_euros(saldo)
+            fecha_desde = ck.fecha + timedelta(days=1)
+
+    # --- 1) Gastos fijos que pueden tener ocurrencias en el tramo ---
     fijos = session.scalars(
         select(FixedExpense)
         .where(
@@ -61,36 +155,178 @@ def calcular_balance_cuenta(session, cuenta_id: int, fecha_objetivo: date) -> fl
             FixedExpense.fecha_inicio <= fecha_objetivo,
             or_(
                 FixedExpense.fecha_fin == None,
-                FixedExpense.fecha_fin >= fecha_inicio_cuenta
+                FixedExpense.fecha_fin >= max(fecha_inicio_cuenta, fecha_desde or fecha_inicio_cuenta)
             )
         )
     ).all()
 
-    for f in fijos:
-        # fecha de inicio efectiva
-        inicio = max(f.fecha_inicio, fecha_inicio_cuenta)
-        # fecha de fin efectiva
-        fin = f.fecha_fin if f.fecha_fin and f.fecha_fin < fecha_objetivo else fecha_objetivo
-
-        ocurrencia = inicio
-        while ocurrencia <= fin:
-            saldo += Decimal(str(f.monto))
-
-            # calcular siguiente ocurrencia según frecuencia
-            if f.frecuencia == "semanal":
-                ocurrencia += timedelta(weeks=1)
-            elif f.frecuencia == "mensual":
-                ocurrencia += relativedelta(months=1)
-            elif f.frecuencia == "trimestral":
-                ocurrencia += relativedelta(months=3)
-            elif f.frecuencia == "semestral":
-                ocurrencia += relativedelta(months=6)
-            elif f.frecuencia == "anual":
-                ocurrencia += relativedelta(years=1)
-            else:
-                break
-
-    return float(saldo)
+    # --- 2) Si el tramo cruza un fin de mes pasado, guardar checkpoint ahí ---
+    # (calculado en su propia transacción: el saldo que se devuelve es el de la sesión)
+    cierre = fecha_objetivo.replace(day=1) - timedelta(days=1)
+    if usar_checkpoints and cierre < date.today() and (fecha_desde is None or cierre >= fecha_desde):
+        _guardar_checkpoint(session, cuenta_id, fecha_inicio_cuenta, cierre)
+
+    # --- 3) Ajustes y transacciones (sumados en la BD) y fijos hasta la fecha ---
+    saldo += _sumar_puntuales(session, cuenta_id, fecha_objetivo, fecha_desde)
+    saldo += _delta_fijos(fijos, fecha_inicio_cuenta, fecha_desde, fecha_objetivo)
+
+    return a_euros(saldo)
+def _stream_puntuales(session, cuenta_id: int, desde: date | None, hasta: date) -> Iterator[dict]:
+    """
+    Ajustes y transacciones de la cuenta en [desde, hasta] ya ordenados por la BD
+    (fecha, tipo, id). Van en una sola consulta UNION ALL para tener un único cursor
+    abierto: con PyMySQL no se pueden intercalar dos cursores en streaming.
+    """
+    consultas = []
+    for modelo, tipo, monto, descripcion in (
+        (Adjustment, "adjustment", cast(_monto_ajuste_redondeado(), Numeric(18, 6)), func.coalesce(Adjustment.descripcion, "Ajuste")),
+        (Transaction, "transaction", Transaction.monto, func.coalesce(Transaction.descripcion, "")),
+    ):
+        filtros = [modelo.cuenta_id == cuenta_id, modelo.fecha <= hasta]
+        if desde is not None:
+            filtros.append(modelo.fecha >= desde)
+        consultas.append(
+            select(
+                modelo.fecha.label("fecha"),
+                literal(TIPO_ORDEN[tipo]).label("orden"),
+                modelo.id.label("id"),
+                descripcion.label("descripcion"),
+                monto.label("monto"),
+            ).where(*filtros)
+        )
+    union = union_all(*consultas).subquery()
+    stmt = (
+        select(union.c.fecha, union.c.orden, union.c.descripcion, union.c.monto)
+        .order_by(union.c.fecha, union.c.orden, union.c.id)
+        .execution_options(yield_per=FILAS_POR_LOTE)
+    )
+    tipos = {orden: tipo for tipo, orden in TIPO_ORDEN.items()}
+    for fecha, orden, descripcion, monto in session.execute(stmt):
+        yield {
+            "fecha": fecha,
+            "descripcion": descripcion,
+            "centimos": a_centimos(monto),
+            "tipo": tipos[orden],
+        }
+
+
+def _ocurrencias_fijo(f, ancla: date, desde: date | None, hasta: date) -> Iterator[dict]:
+    """Ocurrencias (en orden) de un fijo anclado en `ancla` dentro de [desde, hasta]."""
+    fin = min(f.fecha_fin, hasta) if f.fecha_fin else hasta
+    k = contar_hasta(f.frecuencia, ancla, desde - timedelta(days=1)) if desde and desde > ancla else 0
+    centimos = a_centimos(f.monto)
+    while True:
+        try:
+            ocurrencia = ocurrencia_n(f.frecuencia, ancla, k)
+        except ValueError:
+            return  # frecuencia desconocida: solo la primera ocurrencia
+        if ocurrencia > fin:
+            return
+        yield {
+            "fecha": ocurrencia,
+            "descripcion": f.descripcion or "Gasto/Recurso Fijo",
+            "centimos": centimos,
+            "tipo": "fixed_expense",
+        }
+        k += 1
+
+
+def _movimientos_ordenados(session, cuenta_id: int, desde: date | None, hasta: date,
+                           anclar_en_desde: bool = False) -> Iterator[dict]:
+    """
+    Mezcla (heapq.merge) el cursor de ajustes/transacciones con un generador de
+    ocurrencias por cada fijo, respetando TIPO_ORDEN en los empates de fecha.
+    Los importes van en la clave "centimos" (int); los consumidores añaden "monto".
+    Con `anclar_en_desde` las ocurrencias se cuentan desde max(fecha_inicio, desde),
+    como hacía calcular_detalle_acumulado.
+    """
+    filtros = [FixedExpense.cuenta_id == cuenta_id, FixedExpense.fecha_inicio <= hasta]
+    if desde is not None:
+        filtros.append(or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= desde))
+    filtros.append(or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= FixedExpense.fecha_inicio))
+    fijos = session.scalars(select(FixedExpense).where(*filtros).order_by(FixedExpense.id)).all()
+
+    generadores = [
+        _ocurrencias_fijo(f, max(f.fecha_inicio, desde) if anclar_en_desde and desde else f.fecha_inicio, desde, hasta)
+        for f in fijos
+    ]
+    # los fijos van primero para que, a igual clave, conserven su prioridad
+    return merge(*generadores, _stream_puntuales(session, cuenta_id, desde, hasta),
+                 key=lambda m: (m["fecha"], TIPO_ORDEN[m["tipo"]]))
+
+
+def iter_movimientos(session, cuenta_id: int, desde: date | None, hasta: date,
+                     saldo_inicial: float | Decimal | None = None) -> Iterator[dict]:
+    """
+    Recorre en orden cronológico los movimientos de la cuenta entre `desde` y `hasta`
+    (inclusive; desde=None = desde el principio) con el saldo acumulado de cada uno,
+    sin construir la lista completa: memoria acotada aunque el rango sea de décadas.
+
+    Cada elemento es un dict con fecha, descripcion, monto, saldo y tipo
+    ("fixed_expense", "adjustment" o "transaction"). El saldo de partida es el de
+    la víspera de `desde` (mismo criterio que calcular_detalle_cuenta) salvo que se
+    pase `saldo_inicial`. Ojo: saldo_apertura ancla los fijos en 2024-01-01 como
+    calcular_balance_cuenta, no en su fecha_inicio real como estas filas.
+
+    Mientras se consume hay un cursor abierto en la sesión: no lanzar otras
+    consultas con ella hasta terminar de recorrerlo.
+    """
+    cuenta = session.get(Account, cuenta_id)
+    if not cuenta:
+        raise ValueError(f"Cuenta {cuenta_id} no encontrada")
+
+    if saldo_inicial is not None:
+        saldo = a_centimos(saldo_inicial)
+    elif desde is None:
+        saldo = a_centimos(cuenta.saldo_inicial)
+    else:
+        saldo = a_centimos(calcular_balances_en_fechas(session, cuenta_id, [desde - timedelta(days=1)])[0])
+
+    for m in _movimientos_ordenados(session, cuenta_id, desde, hasta):
+        centimos = m.pop("centimos")
+        saldo += centimos
+        m["monto"] = a_decimal(centimos)
+        m["saldo"] = a_decimal(saldo)
+        yield m
+
+
+def saldo_apertura(session, cuenta_id: int, desde: date) -> float:
+    """
+    Saldo al cierre de la víspera de `desde` sin recorrer el histórico: parte del
+    checkpoint más cercano y suma el resto con SUM() en la BD y el nº de ocurrencias
+    de cada fijo (calcular_balance_cuenta), así que cuesta O(reglas) y no O(movimientos).
+    """
+    return calcular_balance_cuenta(session, cuenta_id, desde - timedelta(days=1))
+
+
+def auditar_rango(session, cuenta_id: int, desde: date, hasta: date,
+                  orden_tipos: Dict[int, int] | None = None) -> Dict:
+    """
+    Auditoría de [desde, hasta] con coste proporcional a la ventana, no a la antigüedad
+    de la cuenta: saldo de apertura con saldo_apertura() y solo los movimientos del rango
+    cargados en un Ledger columnar (los fijos, anclados en su fecha_inicio real, saltan
+    directamente a su primera ocurrencia dentro del rango).
+
+    Devuelve {'saldo_inicial', 'ledger', 'saldo_final'} (saldos en euros; 'ledger' lleva
+    el saldo acumulado de cada movimiento). `orden_tipos` fija la prioridad en los empates
+    de fecha, como en cargar_ledger.
+    """
+    from utils.ledger import cargar_ledger
+
+    if hasta < desde:
+        desde, hasta = hasta, desde
+    ledger = cargar_ledger(
+        session, cuenta_id, desde, hasta,
+        saldo_inicial=saldo_apertura(session, cuenta_id, desde),
+        orden_tipos=orden_tipos,
+    )
+    return {
+        "saldo_inicial": a_euros(ledger.saldo_inicial),
+        "ledger": ledger,
+        "saldo_final": a_euros(ledger.saldo_final),
+    }
+
+
 def calcular_detalle_acumulado(session, cuenta_id: int, fecha_inicio: date, fecha_fin: date) -> Dict:
     """
     Devuelve el detalle de movimientos entre fecha_inicio y fecha_fin (inclusive)
@@ -109,111 +345,25 @@ def calcular_detalle_acumulado(session, cuenta_id: int, fecha_inicio: date, fech
         fecha_inicio, fecha_fin = fecha_fin, fecha_inicio
 
     movimientos: List[dict] = []
-    ingresos = Decimal("0")
-    gastos = Decimal("0")
-
-    # --- Ajustes en rango ---
-    ajustes = session.scalars(
-        select(Adjustment)
-        .where(
-            Adjustment.cuenta_id == cuenta_id,
-            Adjustment.fecha >= fecha_inicio,
-            Adjustment.fecha <= fecha_fin
-        )
-    ).all()
-    for adj in ajustes:
-        monto = Decimal(str(adj.monto_ajuste))
-        movimientos.append({
-            "fecha": adj.fecha,
-            "descripcion": adj.descripcion or "Ajuste",
-            "monto": monto,
-            "tipo": "adjustment"
-        })
-        if monto >= 0:
-            ingresos += monto
-        else:
-            gastos += monto
-
-    # --- Transacciones puntuales en rango ---
-    transacciones = session.scalars(
-        select(Transaction)
-        .where(
-            Transaction.cuenta_id == cuenta_id,
-            Transaction.fecha >= fecha_inicio,
-            Transaction.fecha <= fecha_fin
-        )
-    ).all()
-    for t in transacciones:
-        monto = Decimal(str(t.monto))
-        movimientos.append({
-            "fecha": t.fecha,
-            "descripcion": t.descripcion or "",
-            "monto": monto,
-            "tipo": "transaction"
-        })
-        if monto >= 0:
-            ingresos += monto
+    ingresos = 0  # céntimos
+    gastos = 0
+
+    # ajustes, transacciones y ocurrencias de fijos del rango, ya ordenados por fecha y tipo
+    for m in _movimientos_ordenados(session, cuenta_id, fecha_inicio, fecha_fin, anclar_en_desde=True):
+        centimos = m.pop("centimos")
+        m["monto"] = a_decimal(centimos)
+        movimientos.append(m)
+        if centimos >= 0:
+            ingresos += centimos
         else:
-            gastos += monto
-
-    # --- Gastos/ingresos fijos: generar ocurrencias dentro del rango ---
-    fijos = session.scalars(
-        select(FixedExpense)
-        .where(
-            FixedExpense.cuenta_id == cuenta_id,
-            FixedExpense.fecha_inicio <= fecha_fin,
-            or_(
-                FixedExpense.fecha_fin == None,
-                FixedExpense.fecha_fin >= fecha_inicio
-            )
-        )
-    ).all()
-
-    for f in fijos:
-        # determinar intervalo efectivo del fijo limitado al rango pedido
-        inicio = max(f.fecha_inicio, fecha_inicio)
-        fin = f.fecha_fin if f.fecha_fin is not None else fecha_fin
-        fin = min(fin, fecha_fin)
-
-        ocurrencia = inicio
-        while ocurrencia <= fin:
-            monto = Decimal(str(f.monto))
-            movimientos.append({
-                "fecha": ocurrencia,
-                "descripcion": f.descripcion or "Gasto/Recurso Fijo",
-                "monto": monto,
-                "tipo": "fixed_expense"
-            })
-            if monto >= 0:
-                ingresos += monto
-            else:
-                gastos += monto
-
-            # avanzar según frecuencia
-            if f.frecuencia == "semanal":
-                ocurrencia += timedelta(weeks=1)
-            elif f.frecuencia == "mensual":
-                ocurrencia += relativedelta(months=1)
-            elif f.frecuencia == "trimestral":
-                ocurrencia += relativedelta(months=3)
-            elif f.frecuencia == "semestral":
-                ocurrencia += relativedelta(months=6)
-            elif f.frecuencia == "anual":
-                ocurrencia += relativedelta(years=1)
-            else:
-                # si frecuencia desconocida, evitar loop infinito
-                break
-
-    # --- ordenar por fecha y tipo (opcional: mantener mismo criterio que calcular_detalle_cuenta) ---
-    tipo_orden = {"fixed_expense": 1, "adjustment": 2, "transaction": 3}
-    movimientos.sort(key=lambda m: (m["fecha"], tipo_orden.get(m["tipo"], 99)))
+            gastos += centimos
 
     neto = ingresos + gastos  # recuerda: gastos es negativo
     return {
         "detalle": movimientos,
-        "ingresos": ingresos,
-        "gastos": gastos,
-        "neto": neto,
+        "ingresos": a_decimal(ingresos),
+        "gastos": a_decimal(gastos),
+        "neto": a_decimal(neto),
         "cantidad_movimientos": len(movimientos)
     }
 
@@ -231,59 +381,76 @@ def calcular_detalle_cuenta(session, cuenta_id: int, fecha_objetivo: date):
         raise ValueError(f"Cuenta {cuenta_id} no encontrada")
 
     movimientos = []
-    saldo = Decimal(cuenta.saldo_inicial or 0)
+    saldo_actual = a_decimal(a_centimos(cuenta.saldo_inicial))
 
-    # 1. Agregar saldo inicial
-    fecha_inicio = date(2024, 1, 1)  # usamos fecha de inicio por defecto 01/01/2024
-    movimientos.append({
-        "fecha": fecha_inicio,
+    # Fila de saldo inicial (usamos fecha de inicio por defecto 01/01/2024): va antes
+    # que cualquier movimiento de ese mismo día y su saldo es el inicial de la cuenta
+    inicio = {
+        "fecha": date(2024, 1, 1),
         "descripcion": "Inicio",
         "monto": Decimal(0),
-        "saldo": saldo,
+        "saldo": saldo_actual,
         "tipo": "account"
-    })
+    }
 
-    # 2. Obtener ajustes
-    ajustes = session.scalars(
-        select(Adjustment)
-        .where(
-            Adjustment.cuenta_id == cuenta_id,
-            Adjustment.fecha <= fecha_objetivo
-        )
-    ).all()
+    # Ajustes, transacciones y fijos ya ordenados, con su saldo acumulado
+    for m in iter_movimientos(session, cuenta_id, None, fecha_objetivo):
+        if inicio is not None and m["fecha"] >= inicio["fecha"]:
+            movimientos.append(inicio)
+            inicio = None
+        movimientos.append(m)
+        saldo_actual = m["saldo"]
+    if inicio is not None:
+        movimientos.append(inicio)
 
-    for adj in ajustes:
-        movimientos.append({
-            "fecha": adj.fecha,
-            "descripcion": adj.descripcion or "Ajuste",
-            "monto": Decimal(adj.monto_ajuste),
-            "saldo": None,
-            "tipo": "adjustment"
-        })
-
-    # 3. Obtener transacciones puntuales
-    transacciones = session.scalars(
-        select(Transaction)
-        .where(
-            Transaction.cuenta_id == cuenta_id,
-            Transaction.fecha <= fecha_objetivo
-        )
-    ).all()
+    return movimientos, float(saldo_actual)
+def calcular_balances_en_fechas(session, cuenta_id: int, fechas: List[date]) -> List[float]:
+    """
+    Saldo de la cuenta en cada una de `fechas` (mismo criterio que el saldo final de
+    calcular_detalle_cuenta), con una sola pasada sobre el histórico:
+    - el ledger de la cuenta (movimientos expandidos, ordenados y acumulados) se
+      carga una vez y queda en memoria hasta que la cuenta cambie (utils/ledger.py)
+    - cada fecha se resuelve con búsqueda binaria sobre el saldo acumulado
 
-    for t in transacciones:
-        movimientos.append({
-            "fecha": t.fecha,
-            "descripcion": t.descripcion,
-            "monto": Decimal(t.monto),
-            "saldo": None,
-            "tipo": "transaction"
-        })
+    Devuelve una lista de float alineada con `fechas`.
+    """
+    if not fechas:
+        return []
 
-    # 4. Calcular gastos/ingresos fijos
-    fijos = session.scalars(
-        select(FixedExpense)
+    from utils.ledger import obtener_ledger
+    ledger = obtener_ledger(session, cuenta_id, max(fechas))
+    return [a_euros(int(c)) for c in ledger.saldos_en(fechas)]
+
+def calcular_saldos_todas_cuentas(session, fecha_objetivo: date) -> Dict[int, float]:
+    """
+    Saldo de todas las cuentas a `fecha_objetivo` (mismo criterio que el saldo final de
+    calcular_detalle_cuenta) con un número fijo de consultas, sin importar cuántas
+    cuentas haya: saldos iniciales, un GROUP BY cuenta_id para transacciones, otro
+    para ajustes y una única lectura de todos los fijos.
+
+    Devuelve {cuenta_id: saldo}.
+    """
+    saldos = {
+        cuenta_id: a_centimos(saldo_inicial)
+        for cuenta_id, saldo_inicial in session.execute(select(Account.id, Account.saldo_inicial)).all()
+    }
+
+    # 1. Transacciones y ajustes agrupados por cuenta
+    for modelo, columna in ((Transaction, Transaction.monto), (Adjustment, _monto_ajuste_redondeado())):
+        filas = session.execute(
+            select(modelo.cuenta_id, func.sum(columna))
+            .where(modelo.fecha <= fecha_objetivo)
+            .group_by(modelo.cuenta_id)
+        ).all()
+        for cuenta_id, total in filas:
+            if cuenta_id in saldos:
+                saldos[cuenta_id] += a_centimos(total)
+
+    # 2. Fijos de todas las cuentas, contados aritméticamente
+    fijos = session.execute(
+        select(FixedExpense.cuenta_id, FixedExpense.frecuencia, FixedExpense.fecha_inicio,
+               FixedExpense.fecha_fin, FixedExpense.monto)
         .where(
-            FixedExpense.cuenta_id == cuenta_id,
             FixedExpense.fecha_inicio <= fecha_objetivo,
             or_(
                 FixedExpense.fecha_fin == None,
@@ -291,47 +458,16 @@ def calcular_detalle_cuenta(session, cuenta_id: int, fecha_objetivo: date):
             )
         )
     ).all()
+    for cuenta_id, frecuencia, inicio, fin, monto in fijos:
+        if cuenta_id not in saldos:
+            continue
+        hasta = min(fin, fecha_objetivo) if fin else fecha_objetivo
+        n = contar_ocurrencias(frecuencia, inicio, inicio, hasta)
+        if n:
+            saldos[cuenta_id] += a_centimos(monto) * n
 
-    for f in fijos:
-        ocurrencia = f.fecha_inicio
-        fin = f.fecha_fin or fecha_objetivo
-
-        while ocurrencia <= fecha_objetivo and ocurrencia <= fin:
-            movimientos.append({
-                "fecha": ocurrencia,
-                "descripcion": f.descripcion,
-                "monto": Decimal(f.monto),
-                "saldo": None,
-                "tipo": "fixed_expense"
-            })
-
-            # Avanzar según frecuencia
-            if f.frecuencia == "semanal":
-                ocurrencia += timedelta(weeks=1)
-            elif f.frecuencia == "mensual":
-                ocurrencia += relativedelta(months=1)
-            elif f.frecuencia == "trimestral":
-                ocurrencia += relativedelta(months=3)
-            elif f.frecuencia == "semestral":
-                ocurrencia += relativedelta(months=6)
-            elif f.frecuencia == "anual":
-                ocurrencia += relativedelta(years=1)
-            else:
-                break
-
-    # 5. Ordenar movimientos por fecha y tipo
-    #    Fijo primero, luego ajuste, luego transacción para fechas iguales
-    tipo_orden = {"account": 0, "fixed_expense": 1, "adjustment": 2, "transaction": 3}
-    movimientos.sort(key=lambda m: (m["fecha"], tipo_orden.get(m["tipo"], 99)))
-
-    # 6. Calcular saldo acumulado
-    saldo_actual = saldo
-    for m in movimientos:
-        if m["tipo"] != "account":  # el saldo inicial ya está fijado
-            saldo_actual += Decimal(m["monto"])
-            m["saldo"] = saldo_actual
+    return {cuenta_id: a_euros(saldo) for cuenta_id, saldo in saldos.items()}
 
-    return movimientos, float(saldo_actual)
 def reconciliar_cuenta(session, cuenta_id: int, fecha_reconciliacion: date, saldo_objetivo: float, descripcion: str = "Reconciliación"):
     """
     Crea un ajuste de reconciliación para que la cuenta tenga el saldo indicado en la fecha.
@@ -350,10 +486,10 @@ def reconciliar_cuenta(session, cuenta_id: int, fecha_reconciliacion: date, sald
         raise ValueError(f"Cuenta {cuenta_id} no encontrada")
 
     from utils.reconciler import calcular_balance_cuenta
-    saldo_actual = Decimal(str(calcular_balance_cuenta(session, cuenta_id, fecha_reconciliacion)))
+    saldo_actual = a_centimos(calcular_balance_cuenta(session, cuenta_id, fecha_reconciliacion))
 
-    # Diferencia que hay que ajustar
-    monto_ajuste = Decimal(str(saldo_objetivo)) - saldo_actual
+    # Diferencia que hay que ajustar (en céntimos exactos)
+    monto_ajuste = a_decimal(a_centimos(saldo_objetivo) - saldo_actual)
 
     # Crear el ajuste
     ajuste = Adjustment(
@@ -385,9 +521,9 @@ def obtener_gastos_top(session, cuenta_id: int | None = None, meses: int = 6, li
     else:
         cuentas = [cuenta_id]
 
-    # Acumuladores globales (usamos Decimal para evitar mezclas)
-    gastos_puntuales_global = defaultdict(Decimal)
-    gastos_fijos_global = defaultdict(Decimal)
+    # Acumuladores globales (en céntimos)
+    gastos_puntuales_global = defaultdict(int)
+    gastos_fijos_global = defaultdict(int)
 
     for cid in cuentas:
         # ------------------------
@@ -408,7 +544,7 @@ def obtener_gastos_top(session, cuenta_id: int | None = None, meses: int = 6, li
         for desc, total in transacciones:
             if total is None:
                 continue
-            gastos_puntuales_global[desc] += Decimal(str(total))
+            gastos_puntuales_global[desc] += a_centimos(total)
 
         # ------------------------
         # 2️⃣ Gastos fijos recurrentes (excluyendo transferencias)
@@ -427,31 +563,18 @@ def obtener_gastos_top(session, cuenta_id: int | None = None, meses: int = 6, li
         ).all()
 
         for f in fijos:
-            ocurrencia = max(f.fecha_inicio, fecha_inicio)
-            fin = f.fecha_fin or hoy
-
-            while ocurrencia <= hoy and ocurrencia <= fin:
-                monto = Decimal(str(f.monto))
-                if monto < 0:
-                    gastos_fijos_global[f.descripcion] += monto
-
-                # avanzar según frecuencia
-                if f.frecuencia == "semanal":
-                    ocurrencia += timedelta(weeks=1)
-                elif f.frecuencia == "mensual":
-                    ocurrencia += relativedelta(months=1)
-                elif f.frecuencia == "trimestral":
-                    ocurrencia += relativedelta(months=3)
-                elif f.frecuencia == "semestral":
-                    ocurrencia += relativedelta(months=6)
-                elif f.frecuencia == "anual":
-                    ocurrencia += relativedelta(years=1)
-                else:
-                    break
+            monto = a_centimos(f.monto)
+            if monto >= 0:
+                continue
+            inicio = max(f.fecha_inicio, fecha_inicio)
+            fin = min(f.fecha_fin or hoy, hoy)
+            n = contar_ocurrencias(f.frecuencia, inicio, inicio, fin)
+            if n:
+                gastos_fijos_global[f.descripcion] += monto * n
 
     # Combinar resultados
-    gastos_puntuales_lista = [(d, float(v), "puntual") for d, v in gastos_puntuales_global.items()]
-    gastos_fijos_lista = [(d, float(v), "fijo") for d, v in gastos_fijos_global.items()]
+    gastos_puntuales_lista = [(d, a_euros(v), "puntual") for d, v in gastos_puntuales_global.items()]
+    gastos_fijos_lista = [(d, a_euros(v), "fijo") for d, v in gastos_fijos_global.items()]
 
     todos = gastos_puntuales_lista + gastos_fijos_lista
     todos.sort(key=lambda x: x[1])  # más negativos primero (más gasto)
@@ -0,0 +1,93 @@
+# utils/recurrence.py
+"""
+Aritmética de recurrencias (FixedExpense, SimulationVariable).
+
+Sustituye a los bucles `ocurrencia += relativedelta(...)`: en lugar de avanzar
+ocurrencia a ocurrencia, calcula directamente cuántas veces se dispara una regla
+en un rango o cuál es su k-ésima fecha.
+
+Reproduce exactamente el avance acumulado que usaba el reconciler: cuando un mes
+corto recorta el día (31 -> 30 -> 28), el recorte se mantiene en las ocurrencias
+siguientes (31/01 -> 28/02 -> 28/03 ...), igual que al sumar relativedelta paso a paso.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+
+# Meses que avanza cada frecuencia mensual ("semanal" se trata aparte)
+PASOS_MESES = {"mensual": 1, "trimestral": 3, "semestral": 6, "anual": 12}
+
+
+def _indice_mes(fecha: date) -> int:
+    return fecha.year * 12 + fecha.month - 1
+
+
+@lru_cache(maxsize=4096)
+def _dias_efectivos(ancla: date, paso: int) -> tuple:
+    """
+    Día del mes de las primeras ocurrencias de una regla mensual anclada en `ancla`.
+    Pasados 4 años ya se ha visitado un febrero no bisiesto (si la regla pasa por
+    febrero) y todos los meses posibles, así que el día ya no cambia: el último
+    valor de la tupla vale para todas las ocurrencias posteriores.
+    """
+    dia = ancla.day
+    if dia <= 28:
+        return (dia,)
+    dias = [dia]
+    mes = _indice_mes(ancla)
+    for _ in range(48 // paso):
+        mes += paso
+        dia = min(dia, monthrange(mes // 12, mes % 12 + 1)[1])
+        dias.append(dia)
+    return tuple(dias)
+
+
+def _dia_ocurrencia(ancla: date, paso: int, k: int) -> int:
+    dias = _dias_efectivos(ancla, paso)
+    return dias[min(k, len(dias) - 1)]
+
+
+def ocurrencia_n(frecuencia: str, ancla: date, k: int) -> date:
+    """Devuelve la k-ésima ocurrencia (k=0 es `ancla`) de una regla."""
+    if frecuencia == "semanal":
+        return ancla + timedelta(weeks=k)
+    paso = PASOS_MESES.get(frecuencia)
+    if paso is None:
+        if k != 0:
+            raise ValueError(f"Frecuencia desconocida '{frecuencia}': solo existe la ocurrencia 0")
+        return ancla
+    mes = _indice_mes(ancla) + k * paso
+    return date(mes // 12, mes % 12 + 1, _dia_ocurrencia(ancla, paso, k))
+
+
+def contar_hasta(frecuencia: str, ancla: date, fecha: date) -> int:
+    """Número de ocurrencias de la regla en [ancla, fecha]."""
+    if fecha < ancla:
+        return 0
+    if frecuencia == "semanal":
+        return (fecha - ancla).days // 7 + 1
+    paso = PASOS_MESES.get(frecuencia)
+    if paso is None:
+        # frecuencia desconocida: los bucles antiguos solo contaban la primera
+        return 1
+    delta = _indice_mes(fecha) - _indice_mes(ancla)
+    # ocurrencias en meses anteriores al de `fecha`
+    n = -(-delta // paso)
+    # ocurrencia dentro del mismo mes que `fecha`, si cae en o antes de ese día
+    k, resto = divmod(delta, paso)
+    if resto == 0 and _dia_ocurrencia(ancla, paso, k) <= fecha.day:
+        n += 1
+    return n
+
+
+def contar_ocurrencias(frecuencia: str, ancla: date, desde: date, hasta: date) -> int:
+    """
+    Número de ocurrencias de una regla anclada en `ancla` dentro de [desde, hasta].
+    Coste constante, independiente de cuántas ocurrencias haya.
+    """
+    if hasta < desde or hasta < ancla:
+        return 0
+    total = contar_hasta(frecuencia, ancla, hasta)
+    if desde > ancla:
+        total -= contar_hasta(frecuencia, ancla, desde - timedelta(days=1))
+    return total
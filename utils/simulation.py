@@ -0,0 +1,140 @@
+# utils/simulation.py
+"""
+Simulación de saldos futuros de varias cuentas con las variables de simulación
+(ingresos/gastos hipotéticos). No depende de Qt: la usan SimulationWindow y la
+línea de comandos (python -m finanzas simulate).
+
+Barrido único (sweep line) por cuenta: el saldo de apertura se calcula una vez
+(saldo_apertura, con checkpoints) y los eventos del rango (transacciones y ajustes
+sumados por día, ocurrencias de los fijos y de las variables) se ordenan por fecha,
+se acumulan con np.cumsum y se muestrean en las fechas del intervalo con searchsorted.
+"""
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import select, or_, func
+
+from models.transaction import Transaction
+from models.adjustment import Adjustment
+from models.fixed_expense import FixedExpense
+from utils.ledger import fechas_regla
+from utils.reconciler import saldo_apertura
+from utils.money import a_centimos, centimos_array
+
+
+def fechas_simulacion(fecha_inicio: date, fecha_fin: date, intervalo: int) -> np.ndarray:
+    """Fechas muestreadas: fecha_inicio, fecha_inicio + intervalo, ... hasta fecha_fin (datetime64[D])."""
+    if fecha_fin < fecha_inicio:
+        return np.empty(0, dtype="datetime64[D]")
+    return np.arange(np.datetime64(fecha_inicio, "D"), np.datetime64(fecha_fin, "D") + 1, intervalo)
+
+
+def fechas_variable(variable, fecha_inicio: date, fecha_fin: date) -> np.ndarray:
+    """
+    Ocurrencias de una variable de simulación en el rango (datetime64[D]): desde su
+    fecha_inicio, o desde fecha_inicio de la simulación si es anterior o no tiene.
+    """
+    ancla = max(variable.fecha_inicio or fecha_inicio, fecha_inicio)
+    return fechas_regla(variable.frecuencia, ancla, None, fecha_fin)
+
+
+def _eventos_cuentas(session, cuentas, fecha_inicio: date, fecha_fin: date, variables) -> Dict[int, List[Tuple]]:
+    """
+    Eventos de cada cuenta en [fecha_inicio, fecha_fin] como bloques (fechas datetime64[D],
+    céntimos int64), con el mismo criterio que calcular_balance_cuenta:
+    - transacciones y ajustes (redondeados al céntimo) sumados por (cuenta, día) en la BD
+    - fijos anclados en max(fecha_inicio del fijo, inicio de la cuenta) y cortados en su fecha_fin
+    - variables ancladas en max(fecha_inicio de la variable, fecha_inicio de la simulación)
+    """
+    cuenta_ids = [c.id for c in cuentas]
+    bloques = {cuenta_id: [] for cuenta_id in cuenta_ids}
+
+    # 1. Transacciones y ajustes del rango: una consulta agrupada por tabla para todas las cuentas
+    for modelo, columna in ((Transaction, Transaction.monto),
+                            (Adjustment, func.round(Adjustment.monto_ajuste, 2))):
+        filas = session.execute(
+            select(modelo.cuenta_id, modelo.fecha, func.sum(columna))
+            .where(modelo.cuenta_id.in_(cuenta_ids), modelo.fecha >= fecha_inicio, modelo.fecha <= fecha_fin)
+            .group_by(modelo.cuenta_id, modelo.fecha)
+        ).all()
+        por_cuenta = {}
+        for cuenta_id, fecha, total in filas:
+            fechas, importes = por_cuenta.setdefault(cuenta_id, ([], []))
+            fechas.append(fecha)
+            importes.append(float(total or 0))
+        for cuenta_id, (fechas, importes) in por_cuenta.items():
+            bloques[cuenta_id].append((np.array(fechas, dtype="datetime64[D]"), centimos_array(importes)))
+
+    # 2. Fijos: ocurrencias de cada regla dentro del rango
+    inicio_cuenta = {c.id: getattr(c, "fecha_inicio", date(2024, 1, 1)) for c in cuentas}
+    fijos = session.scalars(
+        select(FixedExpense).where(
+            FixedExpense.cuenta_id.in_(cuenta_ids),
+            FixedExpense.fecha_inicio <= fecha_fin,
+            or_(FixedExpense.fecha_fin == None, FixedExpense.fecha_fin >= fecha_inicio)
+        )
+    ).all()
+    for f in fijos:
+        ancla = max(f.fecha_inicio, inicio_cuenta[f.cuenta_id])
+        fin = min(f.fecha_fin, fecha_fin) if f.fecha_fin else fecha_fin
+        fechas = fechas_regla(f.frecuencia, ancla, fecha_inicio, fin)
+        if len(fechas):
+            bloques[f.cuenta_id].append((fechas, np.full(len(fechas), a_centimos(f.monto), dtype=np.int64)))
+
+    # 3. Variables de simulación
+    for variable in variables:
+        if variable.cuenta_id not in bloques:
+            continue
+        fechas = fechas_variable(variable, fecha_inicio, fecha_fin)
+        if len(fechas):
+            bloques[variable.cuenta_id].append((fechas, np.full(len(fechas), a_centimos(variable.importe), dtype=np.int64)))
+
+    return bloques
+
+
+def simular_matriz(session, fecha_inicio: date, fecha_fin: date, intervalo: int,
+                   cuentas, variables) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Núcleo de la simulación: devuelve (fechas datetime64[D], matriz int64 de céntimos
+    de forma (len(cuentas), len(fechas))) con el saldo de cada cuenta al final de cada fecha.
+    """
+    muestras = fechas_simulacion(fecha_inicio, fecha_fin, intervalo)
+    matriz = np.zeros((len(cuentas), len(muestras)), dtype=np.int64)
+    if not len(muestras) or not cuentas:
+        return muestras, matriz
+
+    bloques = _eventos_cuentas(session, cuentas, fecha_inicio, fecha_fin, variables)
+    for i, cuenta in enumerate(cuentas):
+        matriz[i] = a_centimos(saldo_apertura(session, cuenta.id, fecha_inicio))
+        if not bloques[cuenta.id]:
+            continue
+        fechas = np.concatenate([b[0] for b in bloques[cuenta.id]])
+        centimos = np.concatenate([b[1] for b in bloques[cuenta.id]])
+        orden = np.argsort(fechas, kind="stable")
+        acumulado = np.concatenate(([0], np.cumsum(centimos[orden], dtype=np.int64)))
+        matriz[i] += acumulado[np.searchsorted(fechas[orden], muestras, side="right")]
+    return muestras, matriz
+
+
+def simular_saldos(session, fecha_inicio: date, fecha_fin: date, intervalo: int, cuentas, variables) -> List[dict]:
+    """
+    Calcular la simulación de saldos
+
+    Args:
+        fecha_inicio: datetime.date
+        fecha_fin: datetime.date
+        intervalo: int (días)
+        cuentas: List[Account]
+        variables: List[SimulationVariable]
+
+    Returns:
+        List[dict] con estructura: {'fecha': date, 'saldos': {cuenta_id: float}}
+    """
+    muestras, matriz = simular_matriz(session, fecha_inicio, fecha_fin, intervalo, cuentas, variables)
+    ids = [c.id for c in cuentas]
+    euros = (matriz / 100).T.tolist()
+    return [
+        {'fecha': fecha, 'saldos': dict(zip(ids, fila))}
+        for fecha, fila in zip(muestras.tolist(), euros)
+    ]
@@ -0,0 +1,76 @@
+# utils/startup_timing.py
+"""
+Informe de tiempos del arranque en frío.
+
+main.py y ui/main_window.py envuelven cada grupo de imports y cada fase de inicialización en
+`with fase("..."):`; al terminar el arranque (ventana pintada y gráfico creado)
+se imprime una tabla con lo que ha costado cada fase. Los módulos que se cargan
+más tarde, en su primer uso (dashboard, admin, simulaciones...), se miden con
+primer_import() y se informan en una línea cada uno.
+
+Se activa con la variable de entorno FINANZAS_STARTUP_REPORT=1 o con el argumento
+--startup-report. Solo usa la biblioteca estándar para poder importarse lo primero.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+_INICIO = time.perf_counter()
+_fases = []  # [(nombre, segundos)]
+_informe_impreso = False
+
+ACTIVO = (
+    os.environ.get("FINANZAS_STARTUP_REPORT", "").strip() not in ("", "0")
+    or "--startup-report" in sys.argv
+)
+
+
+@contextmanager
+def fase(nombre: str):
+    """Mide el bloque. Tras el informe de arranque, cada fase se imprime al terminar."""
+    ini = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - ini
+        _fases.append((nombre, segundos))
+        if ACTIVO and _informe_impreso:
+            print(f"DEBUG arranque: {nombre}: {segundos * 1000:.1f} ms", file=sys.stderr)
+
+
+@contextmanager
+def primer_import(nombre_modulo: str):
+    """
+    Para imports diferidos escritos dentro de funciones (PyInstaller los sigue detectando):
+        with primer_import("ui.admin_ui"):
+            from ui.admin_ui import AdminWindow
+    Solo se mide la primera vez; las siguientes el módulo ya está en sys.modules.
+    """
+    if nombre_modulo in sys.modules:
+        yield
+        return
+    with fase(f"import {nombre_modulo} (primer uso)"):
+        yield
+
+
+def informe() -> str:
+    """Tabla de fases medidas hasta ahora y tiempo total desde el primer import."""
+    ancho = max([len(n) for n, _ in _fases] + [20])
+    lineas = ["Arranque — tiempos por fase", "-" * (ancho + 12)]
+    for nombre, segundos in _fases:
+        lineas.append(f"{nombre:<{ancho}} {segundos * 1000:>9.1f} ms")
+    lineas.append("-" * (ancho + 12))
+    total = time.perf_counter() - _INICIO
+    lineas.append(f"{'total hasta ahora':<{ancho}} {total * 1000:>9.1f} ms")
+    return "\n".join(lineas)
+
+
+def imprimir_informe():
+    """Imprime el informe una sola vez (en stderr) si está activado."""
+    global _informe_impreso
+    if _informe_impreso:
+        return
+    _informe_impreso = True
+    if ACTIVO:
+        print(informe(), file=sys.stderr)